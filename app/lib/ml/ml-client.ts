@@ -19,6 +19,38 @@ export interface UserFeatures {
   account_age_days?: number;
 }
 
+export type UserFeatureColumns = { user_id: string[] } & {
+  [K in Exclude<keyof UserFeatures, 'user_id'>]?: number[];
+};
+
+export interface CohortFilter {
+  class_id?: string;
+  grade?: number;
+  min_level?: number;
+  max_level?: number;
+  min_days_inactive?: number;
+  max_days_inactive?: number;
+}
+
+export interface ScoringJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'cancelling' | 'cancelled' | 'completed' | 'failed';
+  total: number | null;
+  processed: number;
+  missing: number;
+  progress: number;
+  available: number;
+  offset: number;
+  limit: number;
+  error?: string;
+  results: Array<{
+    user_id: string;
+    cluster: ClusterResult;
+    churn: ChurnPrediction;
+    anomaly: AnomalyDetection;
+  }>;
+}
+
 export interface ClusterResult {
   cluster_id: number;
   cluster_name: string;
@@ -76,6 +108,12 @@ export interface ModelsStatus {
   };
 }
 
+export interface UserIdsResult<T> {
+  total_users: number;
+  predictions: Array<T & { user_id: string }>;
+  missing: string[];
+}
+
 export class MLServiceClient {
   private baseUrl: string;
   private apiKey: string;
@@ -186,6 +224,144 @@ export class MLServiceClient {
     });
   }
 
+  /**
+   * Run all predictions for a columnar batch (one array per feature)
+   */
+  async batchPredictionsColumnar(columns: UserFeatureColumns): Promise<{
+    total_users: number;
+    predictions: Array<{
+      user_id: string;
+      cluster: ClusterResult;
+      churn: ChurnPrediction;
+      anomaly: AnomalyDetection;
+    }>;
+  }> {
+    return this.request('/api/ml/batch-predictions', {
+      method: 'POST',
+      body: JSON.stringify(columns),
+    });
+  }
+
+  /**
+   * Stream predictions for a large batch as NDJSON, one result per student
+   */
+  async *streamBatchPredictions(columns: UserFeatureColumns): AsyncGenerator<{
+    user_id: string;
+    cluster: ClusterResult;
+    churn: ChurnPrediction;
+    anomaly: AnomalyDetection;
+  }> {
+    const response = await fetch(`${this.baseUrl}/api/ml/batch-predictions`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'application/x-ndjson',
+        'X-API-Key': this.apiKey,
+      },
+      body: JSON.stringify(columns),
+    });
+
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({ error: 'Unknown error' }));
+      throw new Error(error.error || `ML Service error: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+      for (const line of lines) {
+        if (!line) continue;
+        const record = JSON.parse(line);
+        if (record.error) throw new Error(record.error);
+        yield record;
+      }
+    }
+  }
+
+  /**
+   * Get cluster predictions by user id (features are loaded by the ML service)
+   */
+  async clusterUsers(userIds: string[]): Promise<UserIdsResult<ClusterResult>> {
+    return this.request('/api/ml/users/cluster', {
+      method: 'POST',
+      body: JSON.stringify({ user_ids: userIds }),
+    });
+  }
+
+  /**
+   * Predict churn by user id
+   */
+  async predictChurnForUsers(userIds: string[]): Promise<UserIdsResult<ChurnPrediction>> {
+    return this.request('/api/ml/users/predict-churn', {
+      method: 'POST',
+      body: JSON.stringify({ user_ids: userIds }),
+    });
+  }
+
+  /**
+   * Detect anomalies by user id
+   */
+  async detectAnomaliesForUsers(userIds: string[]): Promise<UserIdsResult<AnomalyDetection>> {
+    return this.request('/api/ml/users/detect-anomalies', {
+      method: 'POST',
+      body: JSON.stringify({ user_ids: userIds }),
+    });
+  }
+
+  /**
+   * Get batch predictions by user id
+   */
+  async batchPredictionsForUsers(userIds: string[]): Promise<{
+    total_users: number;
+    predictions: Array<{
+      user_id: string;
+      cluster: ClusterResult;
+      churn: ChurnPrediction;
+      anomaly: AnomalyDetection;
+    }>;
+    missing: string[];
+  }> {
+    return this.request('/api/ml/users/batch-predictions', {
+      method: 'POST',
+      body: JSON.stringify({ user_ids: userIds }),
+    });
+  }
+
+  /**
+   * Submit an asynchronous scoring job for a cohort (ids or filter)
+   */
+  async submitScoringJob(cohort: { user_ids?: string[]; filter?: CohortFilter }): Promise<{
+    job_id: string;
+    status: string;
+  }> {
+    return this.request('/api/ml/jobs', {
+      method: 'POST',
+      body: JSON.stringify(cohort),
+    });
+  }
+
+  /**
+   * Get job progress and one page of results
+   */
+  async getScoringJob(jobId: string, offset: number = 0, limit: number = 1000): Promise<ScoringJob> {
+    return this.request<ScoringJob>(`/api/ml/jobs/${jobId}?offset=${offset}&limit=${limit}`);
+  }
+
+  /**
+   * Cancel a queued or running scoring job
+   */
+  async cancelScoringJob(jobId: string): Promise<{ job_id: string; status: string }> {
+    return this.request(`/api/ml/jobs/${jobId}`, { method: 'DELETE' });
+  }
+
   /**
    * Check health status of ML service
    */
@@ -0,0 +1,123 @@
+"""Compare churn backends: AUC, training time, artifact size and inference latency"""
+import sys
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+from typing import Dict, List
+from app.benchmarks.bench_models import best_seconds, call_latencies
+from app.benchmarks.synthetic import generate_students
+from app.models.churn import BACKENDS, ChurnPredictionModel
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+logging.getLogger("app.models.churn").setLevel(logging.WARNING)
+
+
+REPORT_PATH = Path(__file__).parent / "baselines" / "churn_backends.json"
+
+BATCH_SIZES = [1000, 10000]
+
+
+def bench_backend(backend: str, students, scoring, n_calls: int, repeat: int) -> Dict:
+    """Train one backend on ``students`` and time its inference on ``scoring``"""
+    model = ChurnPredictionModel()
+    start = time.perf_counter()
+    metrics = model.train(students, backend=backend)
+    train_seconds = time.perf_counter() - start
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        model.save(tmp)
+        artifact_mb = (Path(tmp) / "model.pkl").stat().st_size / 1e6
+        load_seconds = best_seconds(lambda: ChurnPredictionModel().load(tmp), repeat, min_seconds=0.2)
+    
+    rows = scoring.head(256).to_dict('records')
+    latencies = call_latencies(lambda i: model.predict(rows[i % len(rows)]), n_calls, repeat)
+    
+    result = {
+        'roc_auc': metrics['roc_auc'],
+        'f1_score': metrics['f1_score'],
+        'train_seconds': train_seconds,
+        'artifact_mb': artifact_mb,
+        'load_ms': load_seconds * 1000,
+        'predict_p50_us': float(np.percentile(latencies, 50)),
+        'predict_p95_us': float(np.percentile(latencies, 95))
+    }
+    if 'n_iterations' in metrics:
+        result['n_iterations'] = metrics['n_iterations']
+    for batch_size in BATCH_SIZES:
+        batch = scoring.head(batch_size)
+        seconds = best_seconds(lambda: model.predict_records(batch), repeat)
+        result[f'batch_{batch_size}_rows_per_s'] = batch_size / seconds
+    
+    return result
+
+
+def run_benchmark(sizes: List[int], backends: List[str], n_calls: int = 200, repeat: int = 5) -> Dict:
+    """
+    Train every backend at every size and measure it
+    
+    AUC and F1 are those train() reports on its stratified 20% hold-out.
+    Latency and throughput are measured on students the model has not
+    seen, with the same harness as bench_models.
+    
+    Returns:
+        Results keyed by student count, then backend
+    """
+    scoring = generate_students(max(BATCH_SIZES), seed=1234)
+    results = {}
+    
+    for n_students in sizes:
+        logger.info(f"{n_students} students:")
+        students = generate_students(n_students)
+        results[str(n_students)] = {}
+        
+        for backend in backends:
+            r = bench_backend(backend, students, scoring, n_calls, repeat)
+            results[str(n_students)][backend] = r
+            logger.info(
+                f"  {backend:<24} AUC {r['roc_auc']:.4f}  train {r['train_seconds']:7.2f} s  "
+                f"artifact {r['artifact_mb']:7.2f} MB  predict p50 {r['predict_p50_us']:8.1f} us  "
+                f"batch {r[f'batch_{BATCH_SIZES[-1]}_rows_per_s']:10.0f} rows/s"
+            )
+    
+    return results
+
+
+if __name__ == "__main__":
+    all_backends = list(BACKENDS.values())
+    
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--backends', nargs='+', choices=all_backends, default=all_backends)
+    parser.add_argument('--calls', type=int, default=200, help="Timed single-row calls per round")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--update-report', action='store_true',
+                        help=f"Write the results to {REPORT_PATH.name} next to the baselines")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.backends, args.calls, args.repeat)
+    
+    report = {
+        'machine': {'cpus': os.cpu_count(), 'platform': sys.platform},
+        'results': results
+    }
+    if args.update_report:
+        REPORT_PATH.write_text(json.dumps(report, indent=2) + "\n")
+        logger.info(f"✓ Report updated: {REPORT_PATH}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        logger.info(f"✓ Results written to {args.output}")
@@ -0,0 +1,143 @@
+"""Measure request-path cost of access and error logging"""
+import sys
+import argparse
+import asyncio
+import json
+import queue
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from logging.handlers import QueueListener
+from typing import Dict
+from app.utils.log_config import (
+    AccessLogMiddleware, BoundedQueueHandler, JsonFormatter, RateLimitFilter
+)
+
+
+class SlowStream:
+    """Write target that takes a fixed time per write, like a congested stderr pipe"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+    
+    def write(self, text: str):
+        self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def flush(self):
+        pass
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def time_requests(app, n_requests: int) -> float:
+    """Seconds per request through an ASGI app"""
+    scope = {"type": "http", "method": "POST", "path": "/api/ml/predict-churn", "headers": []}
+    
+    async def receive():
+        return {"type": "http.request", "body": b""}
+    
+    async def send(message):
+        pass
+    
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / n_requests
+
+
+def configure(mode: str, stream: SlowStream):
+    """Install the old synchronous handler or the queue-based one on the root logger"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+    
+    if mode == "sync":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root.addHandler(handler)
+        return None
+    
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=10000))
+    queue_handler.addFilter(RateLimitFilter(burst=5, window=60.0))
+    root.addHandler(queue_handler)
+    
+    listener = QueueListener(queue_handler.queue, handler)
+    listener.start()
+    return listener
+
+
+def run_benchmark(n_requests: int = 20000, sink_latency_ms: float = 0.0) -> Dict:
+    """
+    Time per-request logging overhead with each handler setup
+    
+    Args:
+        n_requests: Requests (and error records) per measurement
+        sink_latency_ms: Simulated time per write to stderr
+        
+    Returns:
+        Microseconds added per request by the access log and per error
+        record on the caller's side, per mode
+    """
+    results = {}
+    
+    for mode in ("sync", "queue"):
+        stream = SlowStream(sink_latency_ms / 1000)
+        listener = configure(mode, stream)
+        
+        loop = asyncio.new_event_loop()
+        bare = loop.run_until_complete(time_requests(bare_app, n_requests))
+        logged = loop.run_until_complete(time_requests(AccessLogMiddleware(bare_app), n_requests))
+        loop.close()
+        
+        error_logger = logging.getLogger("bench.errors")
+        start = time.perf_counter()
+        for i in range(n_requests):
+            error_logger.error("Cache get error: %s", f"Timeout reading from socket ({i})")
+        error = (time.perf_counter() - start) / n_requests
+        
+        if listener is not None:
+            listener.stop()
+        
+        results[mode] = {
+            'access_log_us': (logged - bare) * 1e6,
+            'error_log_us': error * 1e6,
+            'writes': stream.writes
+        }
+        print(
+            f"  {mode:<6} access log {results[mode]['access_log_us']:8.2f} us/request  "
+            f"error log {results[mode]['error_log_us']:8.2f} us/record  "
+            f"({stream.writes} writes)",
+            file=sys.__stderr__
+        )
+    
+    return {'requests': n_requests, 'sink_latency_ms': sink_latency_ms, 'modes': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--sink-latency-ms', type=float, nargs='+', default=[0.0, 0.1])
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    report = []
+    for latency in args.sink_latency_ms:
+        print(f"Sink latency {latency} ms:", file=sys.__stderr__)
+        report.append(run_benchmark(args.requests, latency))
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"✓ Results written to {args.output}", file=sys.__stderr__)
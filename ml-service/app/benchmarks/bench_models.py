@@ -0,0 +1,406 @@
+"""Per-model micro-benchmarks on seeded synthetic fixtures with stored baselines"""
+import sys
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+import sklearn
+from typing import Callable, Dict, List, Optional
+from app.benchmarks.synthetic import generate_dataset, generate_students
+from app.models.clustering import StudentClusteringModel
+from app.models.recommendation import QuestRecommendationModel
+from app.models.churn import ChurnPredictionModel
+from app.models.anomaly import AnomalyDetectionModel
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+FIXTURES_PATH = Path(__file__).parent / "fixtures" / "models"
+MANIFEST_PATH = FIXTURES_PATH / "manifest.json"
+BASELINE_PATH = Path(__file__).parent / "baselines" / "models.json"
+
+# Fixture recipe; fixtures are built from it on demand (not checked in), and
+# changing it requires --rebuild-fixtures and a new baseline
+FIXTURE_SEED = 7
+FIXTURE_STUDENTS = 2000
+CATALOGUE_USERS = 300
+CATALOGUE_SIZES = [50, 200, 800]
+
+ROW_MODELS = {
+    'clustering': StudentClusteringModel,
+    'churn': ChurnPredictionModel,
+    'anomaly': AnomalyDetectionModel
+}
+
+BATCH_SIZES = [1, 100, 1000, 10000]
+
+# Differences below these are timer noise, whatever the relative change
+MIN_DELTAS = {'us': 5.0, 'ms': 0.5, 'rows_per_s': 0.0}
+
+
+def sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fixture_recipe() -> Dict:
+    """What the fixtures are built from, recorded with the baseline"""
+    return {
+        'seed': FIXTURE_SEED,
+        'students': FIXTURE_STUDENTS,
+        'catalogue_users': CATALOGUE_USERS,
+        'catalogue_sizes': CATALOGUE_SIZES,
+        'versions': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__
+        }
+    }
+
+
+def build_fixtures() -> Dict:
+    """
+    Train every model on a small synthetic school and save it under FIXTURES_PATH
+    
+    The recommendation model is trained once per catalogue size with the
+    same number of users, so recommend latency can be compared across
+    catalogues.
+    
+    Returns:
+        The manifest written next to the fixtures
+    """
+    shutil.rmtree(FIXTURES_PATH, ignore_errors=True)
+    fixtures = {}
+    
+    students, _, _ = generate_dataset(FIXTURE_STUDENTS, seed=FIXTURE_SEED)
+    for name, model_class in ROW_MODELS.items():
+        model = model_class()
+        model.train(students.copy())
+        model.save(FIXTURES_PATH / name)
+        fixtures[name] = {}
+    
+    for n_quests in CATALOGUE_SIZES:
+        _, quests, interactions = generate_dataset(CATALOGUE_USERS, n_quests, seed=FIXTURE_SEED)
+        model = QuestRecommendationModel()
+        model.train(interactions, quests)
+        model.save(FIXTURES_PATH / f"recommendation_{n_quests}")
+        # Quests nobody started are not in the model
+        fixtures[f"recommendation_{n_quests}"] = {
+            'n_users': len(model.user_ids),
+            'n_quests': len(model.quest_ids)
+        }
+    
+    for name, info in fixtures.items():
+        info['files'] = {
+            str(f.relative_to(FIXTURES_PATH / name)): sha256(f)
+            for f in sorted((FIXTURES_PATH / name).rglob("*")) if f.is_file()
+        }
+    
+    manifest = {**fixture_recipe(), 'fixtures': fixtures}
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+def check_fixtures() -> Dict:
+    """
+    Load the manifest and verify the fixture files against it
+    
+    Raises:
+        RuntimeError: If fixtures are missing or were changed without
+            rebuilding the manifest
+    """
+    if not MANIFEST_PATH.exists():
+        raise RuntimeError(f"No fixtures at {FIXTURES_PATH}; run with --rebuild-fixtures")
+    
+    manifest = json.loads(MANIFEST_PATH.read_text())
+    for name, info in manifest['fixtures'].items():
+        for file, digest in info['files'].items():
+            path = FIXTURES_PATH / name / file
+            if not path.exists() or sha256(path) != digest:
+                raise RuntimeError(f"Fixture {name}/{file} does not match the manifest; run with --rebuild-fixtures")
+    
+    if manifest['versions']['sklearn'] != sklearn.__version__:
+        logger.warning(
+            f"Fixtures were pickled with scikit-learn {manifest['versions']['sklearn']}, "
+            f"running {sklearn.__version__}; rebuild them if loading fails"
+        )
+    return manifest
+
+
+def call_latencies(call: Callable[[int], object], n_calls: int, repeat: int, warmup: int = 20) -> np.ndarray:
+    """
+    Wall time in microseconds of each of n_calls calls, from the quietest of ``repeat`` rounds
+    
+    As with timeit, the garbage collector is off while timing and the
+    round with the lowest median is kept: slower rounds measure other
+    load on the machine, not the code.
+    """
+    for i in range(warmup):
+        call(i)
+    
+    best = None
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            timings = np.empty(n_calls)
+            for i in range(n_calls):
+                start = time.perf_counter()
+                call(i)
+                timings[i] = time.perf_counter() - start
+            if best is None or np.median(timings) < np.median(best):
+                best = timings
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best * 1e6
+
+
+def best_seconds(run: Callable[[], object], repeat: int, min_seconds: float = 0.05) -> float:
+    """Best per-run time over ``repeat`` rounds, each looping for at least min_seconds"""
+    run()
+    best = float('inf')
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            loops = 0
+            start = time.perf_counter()
+            while True:
+                run()
+                loops += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_seconds:
+                    break
+            best = min(best, elapsed / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def bench_row_model(name: str, n_calls: int, repeat: int) -> Dict[str, float]:
+    """predict latency, predict_records throughput per batch size and load time"""
+    model_class = ROW_MODELS[name]
+    path = FIXTURES_PATH / name
+    
+    load_seconds = best_seconds(lambda: model_class().load(path), repeat, min_seconds=0.2)
+    model = model_class()
+    model.load(path)
+    
+    students = generate_students(max(BATCH_SIZES), seed=FIXTURE_SEED + 100)
+    rows = students.head(256).to_dict('records')
+    latencies = call_latencies(lambda i: model.predict(rows[i % len(rows)]), n_calls, repeat)
+    
+    results = {
+        'predict_p50_us': float(np.percentile(latencies, 50)),
+        'predict_p95_us': float(np.percentile(latencies, 95)),
+        'load_ms': load_seconds * 1000
+    }
+    for batch_size in BATCH_SIZES:
+        batch = students.head(batch_size)
+        seconds = best_seconds(lambda: model.predict_records(batch), repeat)
+        results[f'batch_{batch_size}_rows_per_s'] = batch_size / seconds
+    
+    return results
+
+
+def bench_recommendation(n_calls: int, repeat: int, manifest: Dict) -> Dict[str, float]:
+    """recommend latency and load time per catalogue size"""
+    results = {}
+    
+    for n_quests in CATALOGUE_SIZES:
+        name = f"recommendation_{n_quests}"
+        path = FIXTURES_PATH / name
+        
+        load_seconds = best_seconds(lambda: QuestRecommendationModel().load(path), repeat, min_seconds=0.2)
+        model = QuestRecommendationModel()
+        model.load(path)
+        
+        # The first call builds the cached quest similarity, the warm-up absorbs it
+        user_ids = model.user_ids
+        latencies = call_latencies(lambda i: model.recommend(user_ids[i % len(user_ids)]), n_calls, repeat)
+        
+        results[f'recommend_{n_quests}_p50_us'] = float(np.percentile(latencies, 50))
+        results[f'recommend_{n_quests}_p95_us'] = float(np.percentile(latencies, 95))
+        results[f'load_{n_quests}_ms'] = load_seconds * 1000
+        logger.info(
+            f"  {name:<22} {manifest['fixtures'][name]['n_quests']:5d} quests  "
+            f"recommend p50 {results[f'recommend_{n_quests}_p50_us']:9.1f} us  "
+            f"load {load_seconds * 1000:7.2f} ms"
+        )
+    
+    return results
+
+
+def run_benchmark(models: List[str], n_calls: int = 200, repeat: int = 5) -> Dict:
+    """
+    Run the micro-benchmarks of the given models against the fixtures
+    
+    Returns:
+        Metrics keyed by model, then metric name; the unit is the suffix
+    """
+    manifest = check_fixtures()
+    results = {}
+    
+    for name in models:
+        if name == 'recommendation':
+            results[name] = bench_recommendation(n_calls, repeat, manifest)
+            continue
+        
+        results[name] = bench_row_model(name, n_calls, repeat)
+        logger.info(
+            f"  {name:<22} predict p50 {results[name]['predict_p50_us']:9.1f} us  "
+            f"batch_{max(BATCH_SIZES)} {results[name][f'batch_{max(BATCH_SIZES)}_rows_per_s']:12.0f} rows/s  "
+            f"load {results[name]['load_ms']:7.2f} ms"
+        )
+    
+    return results
+
+
+def check(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    Compare each gated metric with the baseline
+    
+    Latencies and load times fail when more than ``threshold`` slower;
+    throughputs fail when more than ``threshold`` lower. p95 latencies
+    are reported but not gated, they are too noisy for a pass/fail.
+    """
+    checks = []
+    
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            unit = 'rows_per_s' if metric.endswith('rows_per_s') else metric.rsplit('_', 1)[-1]
+            base = baseline.get(name, {}).get(metric)
+            
+            if base is None:
+                status = 'NEW'
+            elif '_p95_' in metric:
+                status = 'INFO'
+            elif unit == 'rows_per_s':
+                status = 'FAIL' if value < base * (1 - threshold) else 'PASS'
+            else:
+                regressed = value > base * (1 + threshold) and value - base > MIN_DELTAS[unit]
+                status = 'FAIL' if regressed else 'PASS'
+            
+            checks.append({
+                'model': name,
+                'metric': metric,
+                'value': value,
+                'baseline': base,
+                'change': value / base - 1 if base else None,
+                'status': status
+            })
+    
+    return checks
+
+
+def merge_best(results: Dict, rerun: Dict) -> Dict:
+    """Keep the better value of each metric from two runs"""
+    merged = {name: dict(metrics) for name, metrics in results.items()}
+    for name, metrics in rerun.items():
+        for metric, value in metrics.items():
+            pick = max if metric.endswith('rows_per_s') else min
+            merged[name][metric] = pick(merged[name][metric], value)
+    return merged
+
+
+def load_baseline(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())['results']
+
+
+if __name__ == "__main__":
+    all_models = list(ROW_MODELS) + ['recommendation']
+    
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--models', nargs='+', choices=all_models, default=all_models)
+    parser.add_argument('--calls', type=int, default=200, help="Timed single-row calls per round")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.3,
+                        help="Allowed relative slowdown before a metric fails")
+    parser.add_argument('--retries', type=int, default=2,
+                        help="Re-measure failing models this many times before reporting a failure")
+    parser.add_argument('--rebuild-fixtures', action='store_true',
+                        help="Retrain the fixtures from the synthetic generator (built automatically when missing)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Merge these results into the baseline file instead of checking")
+    parser.add_argument('--output', help="Write the report as JSON to this path")
+    args = parser.parse_args()
+    
+    if args.rebuild_fixtures or not MANIFEST_PATH.exists():
+        logger.info(f"Building fixtures in {FIXTURES_PATH}...")
+        build_fixtures()
+    
+    results = run_benchmark(args.models, args.calls, args.repeat)
+    
+    if args.update_baseline:
+        merged = load_baseline(args.baseline) or {}
+        merged.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'machine': {'cpus': os.cpu_count(), 'platform': sys.platform},
+            'fixtures': fixture_recipe(),
+            'results': merged
+        }, indent=2) + "\n")
+        logger.info(f"✓ Baseline updated: {args.baseline}")
+        sys.exit(0)
+    
+    baseline = load_baseline(args.baseline) or {}
+    if not baseline:
+        logger.warning(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+    elif json.loads(args.baseline.read_text()).get('fixtures') != fixture_recipe():
+        logger.warning("Baseline was recorded on a different fixture recipe or library versions; comparisons may not be meaningful")
+    
+    checks = check(results, baseline, args.threshold)
+    
+    # A real regression reproduces; a noisy neighbour usually does not
+    for attempt in range(args.retries):
+        suspects = sorted({c['model'] for c in checks if c['status'] == 'FAIL'})
+        if not suspects:
+            break
+        logger.info(f"Re-measuring {', '.join(suspects)} to confirm ({attempt + 1}/{args.retries})...")
+        results = merge_best(results, run_benchmark(suspects, args.calls, args.repeat))
+        checks = check(results, baseline, args.threshold)
+    for c in checks:
+        change = f"{c['change']:+7.1%}" if c['change'] is not None else "       "
+        base = f"{c['baseline']:14.2f}" if c['baseline'] is not None else " " * 14
+        line = f"  {c['status']:<4} {c['model']:<15} {c['metric']:<28} {c['value']:14.2f} {base} {change}"
+        (logger.error if c['status'] == 'FAIL' else logger.info)(line)
+    
+    failed = [c for c in checks if c['status'] == 'FAIL']
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            'passed': not failed,
+            'threshold': args.threshold,
+            'results': results,
+            'checks': checks
+        }, indent=2))
+        logger.info(f"✓ Report written to {args.output}")
+    
+    if failed:
+        logger.error(f"✗ {len(failed)} metric(s) regressed beyond {args.threshold:.0%}")
+        sys.exit(1)
+    
+    logger.info(f"✓ All gated metrics within {args.threshold:.0%} of the baseline")
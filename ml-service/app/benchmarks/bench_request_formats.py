@@ -0,0 +1,124 @@
+"""Compare parse cost of bulk scoring request formats"""
+import sys
+import argparse
+import json
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+from typing import Callable, Dict
+from app.main import ClusterRequest
+from app.models.features import FeatureFrame, RAW_FEATURES
+from app.utils import columnar
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_columns(n_rows: int, seed: int = 42) -> Dict[str, np.ndarray]:
+    """Random integer-valued feature columns"""
+    rng = np.random.default_rng(seed)
+    columns = {'user_id': [f"user-{i}" for i in range(n_rows)]}
+    for name in RAW_FEATURES:
+        columns[name] = rng.integers(0, 5000, n_rows).astype(np.float32)
+    return columns
+
+
+def encode_bodies(columns: Dict) -> Dict[str, bytes]:
+    """Encode the same users in every supported request format"""
+    user_ids = columns['user_id']
+    bodies = {
+        'json-rows': json.dumps({'users': [
+            {'user_id': user_id, **{name: int(columns[name][i]) for name in RAW_FEATURES}}
+            for i, user_id in enumerate(user_ids)
+        ]}).encode(),
+        'json-columns': json.dumps({
+            'user_id': user_ids,
+            **{name: columns[name].astype(int).tolist() for name in RAW_FEATURES}
+        }).encode()
+    }
+    
+    if columnar.pa is not None:
+        table = columnar.pa.table(columns)
+        sink = columnar.pa.BufferOutputStream()
+        with columnar.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        bodies['arrow'] = sink.getvalue().to_pybytes()
+    
+    if columnar.msgpack is not None:
+        bodies['msgpack'] = columnar.msgpack.packb({
+            'user_id': user_ids,
+            **{name: columns[name].astype('<f4').tobytes() for name in RAW_FEATURES}
+        })
+    
+    return bodies
+
+
+PARSERS: Dict[str, Callable[[bytes], FeatureFrame]] = {
+    'json-rows': lambda body: FeatureFrame.from_rows(ClusterRequest.model_validate_json(body).users),
+    'json-columns': lambda body: FeatureFrame(columnar.parse_json_columns(json.loads(body))[1]),
+    'arrow': lambda body: FeatureFrame(columnar.parse_arrow(body)[1]),
+    'msgpack': lambda body: FeatureFrame(columnar.parse_msgpack(body)[1])
+}
+
+
+def run_benchmark(n_rows: int = 10000, repeat: int = 5) -> Dict:
+    """
+    Time decode, validation and feature frame construction per format
+    
+    Args:
+        n_rows: Users per request body
+        repeat: Timed runs per format; the best run is reported
+        
+    Returns:
+        Body size and best parse time per format
+    """
+    bodies = encode_bodies(make_columns(n_rows))
+    results = {}
+    
+    for name, body in bodies.items():
+        parse = PARSERS[name]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            frame = parse(body)
+            timings.append(time.perf_counter() - start)
+        
+        assert len(frame) == n_rows
+        results[name] = {
+            'bytes': len(body),
+            'best_ms': min(timings) * 1000,
+            'median_ms': float(np.median(timings)) * 1000
+        }
+        logger.info(
+            f"  {name:<13} {len(body) / 1e6:8.2f} MB  "
+            f"best {results[name]['best_ms']:8.2f} ms  "
+            f"median {results[name]['median_ms']:8.2f} ms"
+        )
+    
+    return {'rows': n_rows, 'repeat': repeat, 'formats': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    report = []
+    for n_rows in args.rows:
+        logger.info(f"Parsing {n_rows} users:")
+        report.append(run_benchmark(n_rows, args.repeat))
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        logger.info(f"✓ Results written to {args.output}")
@@ -0,0 +1,99 @@
+"""Scaling benchmark for sharded batch inference"""
+import sys
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+from typing import Dict, List
+from app.models.clustering import StudentClusteringModel
+from app.models.churn import ChurnPredictionModel
+from app.models.anomaly import AnomalyDetectionModel
+from app.models.features import FeatureFrame, RAW_FEATURES
+from app.utils.parallel import ShardedScorer
+from app.utils.scoring import predict_all
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def make_frame(n_rows: int, seed: int = 42) -> FeatureFrame:
+    """Random integer-valued features for n_rows students"""
+    rng = np.random.default_rng(seed)
+    return FeatureFrame({
+        name: rng.integers(0, 5000, n_rows).astype(np.float32)
+        for name in RAW_FEATURES
+    })
+
+
+def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(n_rows: int = 200000, workers: List[int] = (1, 2, 4, 8), repeat: int = 3) -> Dict:
+    """
+    Time JSON-serialised predict_all in-process and sharded across 1..N workers
+    
+    Both sides produce the JSON array the API returns. Pool start-up is
+    excluded; each configuration gets one warm-up run.
+    
+    Returns:
+        Best wall time and speedup over in-process scoring per configuration
+    """
+    models = (StudentClusteringModel(), ChurnPredictionModel(), AnomalyDetectionModel())
+    for model in models:
+        model.load()
+    
+    frame = make_frame(n_rows)
+    user_ids = [f"user-{i}" for i in range(n_rows)]
+    
+    baseline = best_of(repeat, lambda: json.dumps(predict_all(user_ids, frame, *models)))
+    logger.info(f"  in-process   {baseline:8.2f} s")
+    results = {'in_process': {'seconds': baseline, 'speedup': 1.0}}
+    
+    for n_workers in workers:
+        scorer = ShardedScorer(workers=n_workers, min_shard_rows=1)
+        scorer.start(*models)
+        try:
+            run = lambda: asyncio.run(scorer.predict_json(user_ids, frame))
+            run()
+            seconds = best_of(repeat, run)
+        finally:
+            scorer.shutdown()
+        
+        results[f"workers_{n_workers}"] = {'seconds': seconds, 'speedup': baseline / seconds}
+        logger.info(f"  {n_workers} workers    {seconds:8.2f} s  speedup {baseline / seconds:5.2f}x")
+    
+    return {'rows': n_rows, 'cpus': os.cpu_count(), 'repeat': repeat, 'results': results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    logger.info(f"Scoring {args.rows} users on {os.cpu_count()} CPUs:")
+    report = run_benchmark(args.rows, args.workers, args.repeat)
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        logger.info(f"✓ Results written to {args.output}")
@@ -0,0 +1,238 @@
+"""End-to-end training benchmark on synthetic data with stored baselines"""
+import sys
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import tempfile
+import threading
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from app.benchmarks.synthetic import generate_dataset
+from app.models.clustering import StudentClusteringModel
+from app.models.recommendation import QuestRecommendationModel
+from app.models.churn import ChurnPredictionModel
+from app.models.anomaly import AnomalyDetectionModel
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "training.json"
+
+# name -> (model class, train call on (model, students, quests, interactions))
+MODELS: Dict[str, tuple] = {
+    'clustering': (StudentClusteringModel, lambda m, s, q, i: m.train(s)),
+    'churn': (ChurnPredictionModel, lambda m, s, q, i: m.train(s)),
+    'anomaly': (AnomalyDetectionModel, lambda m, s, q, i: m.train(s)),
+    'recommendation': (QuestRecommendationModel, lambda m, s, q, i: m.train(i, q))
+}
+
+# Differences below these are noise, whatever the relative change
+MIN_DELTAS = {'train_seconds': 0.05, 'peak_memory_mb': 5.0, 'artifact_mb': 0.1}
+
+
+def rss_bytes() -> int:
+    """Current resident set size"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs: fall back to the high-water mark
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakMemory:
+    """Samples RSS in a background thread and reports the peak above the starting level"""
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+    
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_bytes())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        self.start = rss_bytes()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+    
+    @property
+    def used_mb(self) -> float:
+        return (self.peak - self.start) / 1e6
+
+
+def _train_and_measure(name: str, data_path: str) -> Dict:
+    """Train one model on pickled data and record time, peak memory and artifact size"""
+    with open(data_path, "rb") as f:
+        data = pickle.load(f)
+    
+    model_class, train = MODELS[name]
+    model = model_class()
+    
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        train(model, *data)
+        train_seconds = time.perf_counter() - start
+    
+    with tempfile.TemporaryDirectory() as path:
+        model.save(path)
+        artifact_bytes = sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+    
+    return {
+        'train_seconds': train_seconds,
+        'peak_memory_mb': memory.used_mb,
+        'artifact_mb': artifact_bytes / 1e6
+    }
+
+
+def measure(name: str, data_path: str) -> Dict:
+    """
+    Run one measurement in a fresh interpreter
+    
+    The allocator keeps memory freed by an earlier model and hands it out
+    again, which would hide later models' peaks from an RSS sample.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_train_and_measure, name, data_path).result()
+
+
+def run_benchmark(
+    sizes: List[int],
+    models: List[str],
+    n_quests: int = 200,
+    max_recommendation_users: int = 10000
+) -> Dict:
+    """
+    Train every model on synthetic schools of each size
+    
+    The recommendation model keeps a dense user x user similarity matrix,
+    so it is skipped above ``max_recommendation_users``.
+    
+    Returns:
+        Results keyed by student count, then model name
+    """
+    results = {}
+    
+    for n_students in sizes:
+        logger.info(f"Generating {n_students} students, {n_quests} quests...")
+        data_file = tempfile.NamedTemporaryFile(suffix=".pkl", delete=False)
+        with data_file:
+            pickle.dump(generate_dataset(n_students, n_quests), data_file, protocol=pickle.HIGHEST_PROTOCOL)
+        results[str(n_students)] = {}
+        
+        for name in models:
+            if name == 'recommendation' and n_students > max_recommendation_users:
+                logger.info(f"  {name:<15} skipped (dense similarity matrix above {max_recommendation_users} users)")
+                continue
+            
+            result = measure(name, data_file.name)
+            results[str(n_students)][name] = result
+            logger.info(
+                f"  {name:<15} {result['train_seconds']:9.2f} s  "
+                f"{result['peak_memory_mb']:9.1f} MB peak  "
+                f"{result['artifact_mb']:9.2f} MB artifact"
+            )
+        
+        os.unlink(data_file.name)
+    
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Metrics more than ``threshold`` (relative) worse than the baseline"""
+    regressions = []
+    
+    for size, models in results.items():
+        for name, metrics in models.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                continue
+            for metric, value in metrics.items():
+                base = reference.get(metric)
+                if base is None:
+                    continue
+                if value > base * (1 + threshold) and value - base > MIN_DELTAS[metric]:
+                    regressions.append(
+                        f"{name} @ {size} students: {metric} {value:.2f} vs baseline {base:.2f} "
+                        f"(+{(value / base - 1) if base else float('inf'):.0%})"
+                    )
+    
+    return regressions
+
+
+def load_baseline(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())['results']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    parser.add_argument('--quests', type=int, default=200)
+    parser.add_argument('--max-recommendation-users', type=int, default=10000)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed relative slowdown/growth before a metric counts as a regression")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Merge these results into the baseline file instead of comparing")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.models, args.quests, args.max_recommendation_users)
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        logger.info(f"✓ Results written to {args.output}")
+    
+    if args.update_baseline:
+        merged = load_baseline(args.baseline) or {}
+        for size, models in results.items():
+            merged.setdefault(size, {}).update(models)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'machine': {'cpus': os.cpu_count(), 'platform': sys.platform},
+            'quests': args.quests,
+            'results': merged
+        }, indent=2) + "\n")
+        logger.info(f"✓ Baseline updated: {args.baseline}")
+        sys.exit(0)
+    
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        logger.warning(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        sys.exit(0)
+    
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        logger.error(f"✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            logger.error(f"  {regression}")
+        sys.exit(1)
+    
+    logger.info(f"✓ No regressions beyond {args.threshold:.0%}")
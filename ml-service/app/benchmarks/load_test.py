@@ -0,0 +1,355 @@
+"""HTTP load test of the ML service with latency percentiles per route"""
+import sys
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import httpx
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from app.benchmarks.redis_standin import RedisStandIn
+from app.benchmarks.synthetic import generate_students
+from app.models.features import RAW_FEATURES
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+# Request = (method, path, json body)
+Request = Tuple[str, str, Optional[Dict]]
+
+# Routes backed by the feature store need a populated database (see --user-ids)
+DEFAULT_MIX = {
+    'cluster-student': 20,
+    'recommend-quests': 20,
+    'predict-churn': 20,
+    'detect-anomalies': 15,
+    'batch-predictions': 5,
+    'models-status': 2,
+    'debug-timings': 1,
+    'users-cluster': 0,
+    'users-predict-churn': 0,
+    'users-detect-anomalies': 0,
+    'users-batch-predictions': 0,
+    'jobs-submit': 0,
+    'jobs-status': 0,
+    'jobs-cancel': 0,
+    'cache-clear': 0,
+    'admin-profile': 0
+}
+
+
+class Workload:
+    """Builds requests for synthetic students picked with a Zipf-like skew"""
+    
+    def __init__(
+        self,
+        n_users: int,
+        skew: float,
+        batch_size: int,
+        user_ids: Optional[List[str]] = None,
+        seed: int = 42
+    ):
+        """
+        Args:
+            user_ids: Real student ids to use, so by-id routes find stored
+                features; ``n_users`` is ignored when given
+        """
+        if user_ids:
+            n_users = len(user_ids)
+        students = generate_students(n_users, seed)
+        if user_ids:
+            students['user_id'] = user_ids
+        self.user_ids: List[str] = students['user_id'].tolist()
+        self.features = students[['user_id'] + RAW_FEATURES].to_dict('records')
+        
+        # skew 0 is uniform; around 1 a few hot students get most requests, as in a live class
+        weights = 1.0 / np.arange(1, n_users + 1) ** skew
+        self.p = weights / weights.sum()
+        self.batch_size = batch_size
+        self.job_ids: List[str] = []
+    
+    def user(self, rng: np.random.Generator) -> int:
+        return int(rng.choice(len(self.user_ids), p=self.p))
+    
+    def batch(self, rng: np.random.Generator) -> List[int]:
+        return rng.choice(len(self.user_ids), self.batch_size, p=self.p).tolist()
+    
+    def build(self, route: str, rng: np.random.Generator) -> Request:
+        if route == 'cluster-student':
+            return "POST", "/api/ml/cluster-student", self.features[self.user(rng)]
+        if route == 'recommend-quests':
+            return "POST", "/api/ml/recommend-quests", {"user_id": self.user_ids[self.user(rng)]}
+        if route in ('predict-churn', 'detect-anomalies'):
+            i = self.user(rng)
+            return "POST", f"/api/ml/{route}", {"user_id": self.user_ids[i], "user_features": self.features[i]}
+        if route == 'batch-predictions':
+            rows = [self.features[i] for i in self.batch(rng)]
+            body = {name: [row[name] for row in rows] for name in rows[0]}
+            return "POST", "/api/ml/batch-predictions", body
+        if route.startswith('users-'):
+            ids = list(dict.fromkeys(self.user_ids[i] for i in self.batch(rng)))
+            return "POST", "/api/ml/users/" + route[len('users-'):], {"user_ids": ids}
+        if route == 'jobs-submit' or (route in ('jobs-status', 'jobs-cancel') and not self.job_ids):
+            return "POST", "/api/ml/jobs", {"user_ids": [self.user_ids[i] for i in self.batch(rng)]}
+        if route in ('jobs-status', 'jobs-cancel'):
+            job_id = self.job_ids[int(rng.integers(len(self.job_ids)))]
+            return ("GET" if route == 'jobs-status' else "DELETE"), f"/api/ml/jobs/{job_id}", None
+        if route == 'models-status':
+            return "GET", "/api/ml/models/status", None
+        if route == 'debug-timings':
+            return "GET", "/api/ml/debug/timings", None
+        if route == 'cache-clear':
+            return "DELETE", f"/api/ml/cache/clear?pattern=cluster:*:{self.user_ids[self.user(rng)]}", None
+        if route == 'admin-profile':
+            return "POST", "/api/ml/admin/profile?seconds=1", None
+        raise ValueError(f"Unknown route '{route}'")
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    warmup: float
+) -> Tuple[Dict[str, list], float]:
+    """
+    Closed-loop load: each worker sends its next request as soon as the last returns
+    
+    Returns:
+        (latency seconds, status code or exception name) samples per route
+        taken after the warm-up, and the measured duration
+    """
+    routes = [route for route, weight in mix.items() if weight > 0]
+    weights = np.array([mix[route] for route in routes], dtype=float)
+    weights /= weights.sum()
+    
+    samples: Dict[str, list] = {route: [] for route in routes}
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    
+    async def worker(seed: int):
+        rng = np.random.default_rng(seed)
+        while time.perf_counter() < deadline:
+            route = routes[rng.choice(len(routes), p=weights)]
+            method, path, body = workload.build(route, rng)
+            
+            sent = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                outcome = response.status_code
+                if method == "POST" and path == "/api/ml/jobs" and outcome == 202:
+                    workload.job_ids.append(response.json()['job_id'])
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            done = time.perf_counter()
+            
+            if sent >= measure_from:
+                samples[route].append((done - sent, outcome))
+    
+    await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    return samples, time.perf_counter() - measure_from
+
+
+def summarize(samples: List[tuple], duration: float) -> Dict:
+    """Latency percentiles, throughput and error rate of one set of samples"""
+    if not samples:
+        return {'requests': 0}
+    
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    outcomes: Dict[str, int] = {}
+    for _, outcome in samples:
+        outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+    errors = sum(
+        count for outcome, count in outcomes.items()
+        if not outcome.isdigit() or int(outcome) >= 400
+    )
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    
+    return {
+        'requests': len(samples),
+        'throughput_rps': len(samples) / duration,
+        'error_rate': errors / len(samples),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies.max()),
+        'mean_ms': float(latencies.mean()),
+        'outcomes': outcomes
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_service(port: int, redis_url: str, workers: int) -> subprocess.Popen:
+    """Run the API with uvicorn in a child process pointed at the given Redis"""
+    env = dict(os.environ, REDIS_URL=redis_url, ACCESS_LOG_ENABLED="false")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning"
+        ],
+        cwd=Path(__file__).parent.parent.parent,
+        env=env
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Service at {base_url} did not become healthy in {timeout:.0f}s")
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    """``route=weight,route=weight``; routes left out keep their default weight"""
+    mix = dict(DEFAULT_MIX)
+    if text:
+        for item in text.split(","):
+            route, _, weight = item.partition("=")
+            if route not in mix:
+                raise ValueError(f"Unknown route '{route}', expected one of {', '.join(mix)}")
+            mix[route] = float(weight)
+    return mix
+
+
+def compare(report: Dict, previous: Dict):
+    """Log p95 and throughput changes per route against an earlier report"""
+    logger.info(f"Compared with {previous.get('commit') or 'previous run'}:")
+    for route, current in report['routes'].items():
+        before = previous.get('routes', {}).get(route)
+        if not before or not before.get('requests') or not current.get('requests'):
+            continue
+        logger.info(
+            f"  {route:<24} p95 {before['p95_ms']:8.2f} -> {current['p95_ms']:8.2f} ms "
+            f"({current['p95_ms'] / before['p95_ms'] - 1:+.0%})  "
+            f"rps {before['throughput_rps']:8.1f} -> {current['throughput_rps']:8.1f}"
+        )
+
+
+async def main(args) -> Dict:
+    mix = parse_mix(args.mix)
+    user_ids = Path(args.user_ids).read_text().split() if args.user_ids else None
+    workload = Workload(args.users, args.skew, args.batch_size, user_ids)
+    
+    redis = None
+    service = None
+    base_url = args.url
+    if base_url is None:
+        redis_url = args.redis_url
+        if redis_url is None:
+            redis = RedisStandIn().start()
+            redis_url = redis.url
+        service = start_service(args.port, redis_url, args.service_workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+    
+    try:
+        await wait_until_healthy(base_url)
+        logger.info(
+            f"Load testing {base_url}: {args.concurrency} workers, "
+            f"{args.warmup:.0f}s warm-up + {args.duration:.0f}s"
+        )
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-API-Key": args.api_key},
+            limits=httpx.Limits(max_connections=args.concurrency),
+            timeout=args.timeout
+        ) as client:
+            samples, duration = await run_load(
+                client, workload, mix, args.concurrency, args.duration, args.warmup
+            )
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait(timeout=30)
+        if redis is not None:
+            redis.stop()
+    
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'machine': {'cpus': os.cpu_count(), 'python': platform.python_version()},
+        'config': {
+            'target': args.url or 'local',
+            'redis': 'stand-in' if args.url is None and args.redis_url is None else 'external',
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'warmup_seconds': args.warmup,
+            'users': len(workload.user_ids),
+            'skew': args.skew,
+            'batch_size': args.batch_size,
+            'mix': {route: weight for route, weight in mix.items() if weight > 0}
+        },
+        'overall': summarize([s for route in samples.values() for s in route], duration),
+        'routes': {route: summarize(route_samples, duration) for route, route_samples in samples.items()}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help="Test a running service instead of starting one")
+    parser.add_argument('--redis-url', help="Redis for the started service (default: in-process stand-in)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--service-workers', type=int, default=1)
+    parser.add_argument('--api-key', default=os.environ.get('API_KEY', 'development-key'))
+    parser.add_argument('--mix', help="Route weights, e.g. 'predict-churn=10,users-cluster=2'")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=5.0)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--user-ids', help="File with real student ids, one per line, for the by-id routes")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of user popularity, 0 = uniform")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--output', help="Write the report as JSON to this path (default: stdout)")
+    parser.add_argument('--compare', help="Earlier report to compare p95 and throughput with")
+    args = parser.parse_args()
+    
+    report = asyncio.run(main(args))
+    
+    overall = report['overall']
+    logger.info(
+        f"✓ {overall['requests']} requests, {overall['throughput_rps']:.1f} req/s, "
+        f"p50 {overall['p50_ms']:.1f} ms, p95 {overall['p95_ms']:.1f} ms, "
+        f"p99 {overall['p99_ms']:.1f} ms, errors {overall['error_rate']:.2%}"
+    )
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        logger.info(f"✓ Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
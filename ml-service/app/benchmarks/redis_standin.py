@@ -0,0 +1,111 @@
+"""Minimal in-memory Redis stand-in speaking RESP, for load tests without a Redis server"""
+import asyncio
+import fnmatch
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def _bulk(value: Optional[str]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def _array(items: List[bytes]) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+class RedisStandIn:
+    """
+    Single-threaded key-value server covering the commands CacheManager uses
+    
+    PING, GET, MGET, SET, SETEX, DEL, UNLINK and SCAN, with expiry. Every
+    reply is served from one event loop thread, so it behaves like a small
+    real Redis, one command at a time.
+    """
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.store: Dict[str, Tuple[str, Optional[float]]] = {}
+        self.commands = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+    
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+    
+    def _get(self, key: str) -> Optional[str]:
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] < time.monotonic():
+            del self.store[key]
+            return None
+        return entry[0]
+    
+    def execute(self, args: List[str]) -> bytes:
+        self.commands += 1
+        command = args[0].upper()
+        
+        if command == "PING":
+            return b"+PONG\r\n"
+        if command == "GET":
+            return _bulk(self._get(args[1]))
+        if command == "MGET":
+            return _array([_bulk(self._get(key)) for key in args[1:]])
+        if command == "SET":
+            self.store[args[1]] = (args[2], None)
+            return b"+OK\r\n"
+        if command == "SETEX":
+            self.store[args[1]] = (args[3], time.monotonic() + int(args[2]))
+            return b"+OK\r\n"
+        if command in ("DEL", "UNLINK"):
+            removed = sum(self.store.pop(key, None) is not None for key in args[1:])
+            return b":%d\r\n" % removed
+        if command == "SCAN":
+            # Everything in one page: cursor 0 ends the iteration
+            pattern = args[args.index("MATCH") + 1] if "MATCH" in args else "*"
+            keys = [key for key in list(self.store) if fnmatch.fnmatchcase(key, pattern)]
+            return _array([_bulk("0"), _array([_bulk(key) for key in keys])])
+        if command in ("CLIENT", "SELECT", "HELLO"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % command.encode()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(self.execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    def start(self) -> "RedisStandIn":
+        """Serve on a background thread; returns once the port is bound"""
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="redis-standin", daemon=True).start()
+        
+        async def serve():
+            return await asyncio.start_server(self._handle, self.host, self.port)
+        
+        self._server = asyncio.run_coroutine_threadsafe(serve(), self._loop).result()
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+    
+    def stop(self):
+        if self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._server = None
@@ -0,0 +1,272 @@
+"""
+Synthetic EduRPG students, quests and quest interactions for offline training
+
+generate_students only yields per-student aggregates, as the feature store
+holds them. Benchmarks of the extraction and feature-refresh SQL need the
+row-level tables behind those aggregates: generate_activity derives Trade,
+Event and EventParticipant rows whose counts match the students' features.
+"""
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+
+CATEGORIES = ['MATH', 'SCIENCE', 'LANGUAGE', 'HISTORY', 'ART', 'SPORT', 'SOCIAL']
+DIFFICULTIES = ['EASY', 'MEDIUM', 'HARD', 'LEGENDARY']
+XP_BY_DIFFICULTY = {'EASY': 50, 'MEDIUM': 120, 'HARD': 250, 'LEGENDARY': 600}
+
+
+def generate_students(
+    n_students: int,
+    seed: int = 42,
+    churn_rate: float = 0.25,
+    cheater_rate: float = 0.01
+) -> pd.DataFrame:
+    """
+    Generate per-student features in the shape of the feature store
+    
+    A lognormal engagement level per student drives activity, quests,
+    XP and the economy, so features are correlated the way real students'
+    are. About ``churn_rate`` of students have been inactive for more than
+    14 days and ``cheater_rate`` have implausible recent XP.
+    
+    Args:
+        n_students: Number of students
+        seed: Random seed
+        churn_rate: Share of students inactive for over 14 days
+        cheater_rate: Share of students with anomalous XP gains
+        
+    Returns:
+        DataFrame with the columns of FEATURES_SELECT
+    """
+    rng = np.random.default_rng(seed)
+    
+    engagement = rng.lognormal(0.0, 0.8, n_students)
+    account_age_days = rng.uniform(1, 730, n_students)
+    
+    # Most students were active in the last few days, churned ones weeks ago
+    churned = rng.random(n_students) < churn_rate
+    days_inactive = np.where(
+        churned,
+        rng.uniform(15, 120, n_students),
+        rng.exponential(2.5, n_students)
+    )
+    days_inactive = np.minimum(days_inactive, account_age_days)
+    
+    window = np.minimum(account_age_days, 90)
+    activity = engagement / (1 + engagement)
+    active_days = rng.binomial(np.maximum(window - days_inactive, 0).astype(int), 0.6 * activity)
+    
+    quests_completed = rng.poisson(0.35 * active_days * np.sqrt(engagement) + 0.2 * account_age_days / 30)
+    total_xp = quests_completed * rng.gamma(2.0, 60.0, n_students) + rng.poisson(20 * active_days)
+    recent_share = np.where(days_inactive > 30, 0.0, rng.beta(2, 5, n_students))
+    recent_xp_gained = total_xp * recent_share
+    
+    # Cheaters gain implausible XP over very few active days
+    cheaters = rng.random(n_students) < cheater_rate
+    boost = rng.uniform(5000, 50000, n_students)
+    total_xp = np.where(cheaters, total_xp + boost, total_xp)
+    recent_xp_gained = np.where(cheaters, recent_xp_gained + boost, recent_xp_gained)
+    active_days = np.where(cheaters, np.minimum(active_days, rng.integers(1, 4, n_students)), active_days)
+    
+    level = np.floor(np.sqrt(total_xp / 100)).astype(int) + 1
+    events_participated = rng.poisson(1.5 * engagement * window / 90)
+    reputation = rng.poisson(0.2 * quests_completed + 2 * events_participated)
+    achievements_unlocked = rng.binomial(60, 1 - np.exp(-(quests_completed + level) / 60))
+    money = np.round(total_xp * 0.3 * rng.lognormal(0.0, 0.5, n_students), 2)
+    items_owned = rng.poisson(money / 250)
+    
+    # Most students never trade; traders follow a long tail
+    traders = rng.random(n_students) < 0.35
+    trades_made = np.where(traders, rng.negative_binomial(1, 0.15, n_students), 0)
+    
+    now = pd.Timestamp.now().floor('s')
+    account_created = now - pd.to_timedelta(account_age_days, unit='D')
+    last_activity = now - pd.to_timedelta(days_inactive, unit='D')
+    
+    return pd.DataFrame({
+        'user_id': [f"student-{i}" for i in range(n_students)],
+        'total_xp': total_xp.round(),
+        'level': level,
+        'money': money,
+        'reputation': reputation,
+        'quests_completed': quests_completed,
+        'achievements_unlocked': achievements_unlocked,
+        'recent_xp_gained': recent_xp_gained.round(),
+        'active_days': active_days,
+        'items_owned': items_owned,
+        'trades_made': trades_made,
+        'events_participated': events_participated,
+        'last_activity': last_activity,
+        'days_inactive': days_inactive,
+        'account_created': account_created,
+        'account_age_days': account_age_days
+    })
+
+
+def generate_quests(n_quests: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Generate an active quest catalogue
+    
+    Returns:
+        DataFrame shaped like Database.get_quest_data
+    """
+    rng = np.random.default_rng(seed)
+    
+    difficulty = rng.choice(DIFFICULTIES, n_quests, p=[0.4, 0.35, 0.2, 0.05])
+    base_xp = np.array([XP_BY_DIFFICULTY[d] for d in difficulty])
+    xp_reward = np.round(base_xp * rng.uniform(0.8, 1.2, n_quests) / 5) * 5
+    
+    return pd.DataFrame({
+        'quest_id': [f"quest-{j}" for j in range(n_quests)],
+        'title': [f"Quest {j}" for j in range(n_quests)],
+        'category': rng.choice(CATEGORIES, n_quests),
+        'difficulty': difficulty,
+        'xp_reward': xp_reward,
+        'money_reward': np.round(xp_reward * rng.uniform(0.1, 0.4, n_quests)),
+        'completion_count': 0,
+        'avg_completion_hours': rng.gamma(2.0, 3.0, n_quests).round(1)
+    })
+
+
+def generate_interactions(
+    students: pd.DataFrame,
+    quests: pd.DataFrame,
+    seed: int = 42
+) -> pd.DataFrame:
+    """
+    Generate sparse user-quest interactions
+    
+    Each student starts roughly their completed quests plus a few in
+    progress, drawn from a Zipf-like popularity over the catalogue, and
+    each student leans towards two favourite categories.
+    
+    Returns:
+        DataFrame shaped like Database.get_user_quest_interactions
+    """
+    rng = np.random.default_rng(seed)
+    n_students = len(students)
+    n_quests = len(quests)
+    
+    completed = students['quests_completed'].to_numpy()
+    started = np.minimum(completed + rng.poisson(1.0, n_students), n_quests)
+    
+    popularity = 1.0 / np.arange(1, n_quests + 1) ** 0.8
+    popularity = popularity[rng.permutation(n_quests)]
+    category_codes = pd.Categorical(quests['category'], categories=CATEGORIES).codes
+    
+    rows = np.repeat(np.arange(n_students), started)
+    favourites = rng.integers(0, len(CATEGORIES), (n_students, 2))
+    
+    # Half the draws come from one of the student's favourite categories
+    picks = rng.choice(n_quests, len(rows), p=popularity / popularity.sum())
+    favourite = favourites[rows, rng.integers(0, 2, len(rows))]
+    from_favourite = rng.random(len(rows)) < 0.5
+    for c in range(len(CATEGORIES)):
+        members = np.flatnonzero(category_codes == c)
+        if not len(members):
+            continue
+        mask = from_favourite & (favourite == c)
+        weights = popularity[members] / popularity[members].sum()
+        picks[mask] = members[rng.choice(len(members), mask.sum(), p=weights)]
+    
+    interactions = pd.DataFrame({'row': rows, 'quest': picks}).drop_duplicates()
+    
+    # Completed share of each student's started quests
+    completion = (completed / np.maximum(started, 1))[interactions['row'].to_numpy()]
+    rating = np.where(rng.random(len(interactions)) < completion, 1.0, 0.5)
+    
+    user_ids = students['user_id'].to_numpy()
+    quest_ids = quests['quest_id'].to_numpy()
+    return pd.DataFrame({
+        'user_id': user_ids[interactions['row'].to_numpy()],
+        'quest_id': quest_ids[interactions['quest'].to_numpy()],
+        'rating': rating
+    })
+
+
+def generate_activity(
+    students: pd.DataFrame,
+    seed: int = 42,
+    n_events: int = None
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Generate trade and event rows consistent with the students' counts
+    
+    Completed trades pair up the students' trade slots at random, so each
+    student takes part in ``trades_made`` of them (less a rare self-paired
+    slot that is dropped). Each student joins ``events_participated``
+    active events; cancelled trades and finished events add rows the
+    feature queries must skip.
+    
+    Args:
+        students: Output of generate_students
+        seed: Random seed
+        n_events: Events to create (default: enough active events for the
+            busiest student)
+            
+    Returns:
+        Trade, Event and EventParticipant frames with their table's columns
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = students['user_id'].to_numpy()
+    last_activity = students['last_activity'].to_numpy()
+    account_age = pd.to_timedelta(students['account_age_days'].to_numpy(), unit='D')
+    
+    # Trades: shuffle one slot per trade a student made and pair neighbours
+    slots = rng.permutation(np.repeat(np.arange(len(students)), students['trades_made'].to_numpy()))
+    slots = slots[:len(slots) // 2 * 2].reshape(-1, 2)
+    slots = slots[slots[:, 0] != slots[:, 1]]
+    n_cancelled = len(slots) // 10
+    cancelled = rng.integers(0, len(students), (n_cancelled, 2))
+    pairs = np.concatenate([slots, cancelled])
+    # A trade happens while both students are around: before the earlier last activity
+    latest = np.minimum(last_activity[pairs[:, 0]], last_activity[pairs[:, 1]])
+    span = np.minimum(account_age[pairs[:, 0]], account_age[pairs[:, 1]])
+    trades = pd.DataFrame({
+        'id': [f"trade-{i}" for i in range(len(pairs))],
+        'sender_id': user_ids[pairs[:, 0]],
+        'receiver_id': user_ids[pairs[:, 1]],
+        'status': np.where(np.arange(len(pairs)) < len(slots), 'COMPLETED', 'CANCELLED'),
+        'updated_at': latest - span * rng.random(len(pairs))
+    })
+    
+    # Events: participations in active events count, finished ones do not
+    participated = students['events_participated'].to_numpy()
+    n_active = max(int(participated.max(initial=0)), 1)
+    n_events = max(n_events or 2 * n_active, n_active)
+    now = pd.Timestamp.now().floor('s')
+    events = pd.DataFrame({
+        'id': [f"event-{j}" for j in range(n_events)],
+        'status': np.where(np.arange(n_events) < n_active, 'ACTIVE', 'COMPLETED'),
+        'updated_at': now - pd.to_timedelta(rng.uniform(0, 90, n_events), unit='D')
+    })
+    
+    rows = np.repeat(np.arange(len(students)), participated)
+    # Distinct active events per student: offsets into a per-student rotation
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(participated) - participated, participated)
+    active = (rng.integers(0, n_active, len(students))[rows] + offsets) % n_active
+    finished_rows = rng.integers(0, len(students), len(rows) // 5)
+    finished = rng.integers(n_active, n_events, len(finished_rows)) if n_events > n_active else active[:0]
+    rows = np.concatenate([rows, finished_rows[:len(finished)]])
+    event_index = np.concatenate([active, finished])
+    participants = pd.DataFrame({
+        'id': [f"participant-{i}" for i in range(len(rows))],
+        'user_id': user_ids[rows],
+        'event_id': events['id'].to_numpy()[event_index],
+        'created_at': last_activity[rows] - account_age[rows] * rng.random(len(rows))
+    })
+    
+    return trades, events, participants
+
+
+def generate_dataset(
+    n_students: int,
+    n_quests: int = 200,
+    seed: int = 42
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Students, quests and interactions for one synthetic school"""
+    students = generate_students(n_students, seed)
+    quests = generate_quests(n_quests, seed + 1)
+    interactions = generate_interactions(students, quests, seed + 2)
+    return students, quests, interactions
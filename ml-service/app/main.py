@@ -1,10 +1,15 @@
 """FastAPI main application"""
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field, ValidationError
+from typing import AsyncIterator, List, Optional, Dict, Tuple
+import json
 import logging
+import numpy as np
 from pathlib import Path
 
 from app.config import settings
@@ -12,13 +17,20 @@ from app.models.clustering import StudentClusteringModel
 from app.models.recommendation import QuestRecommendationModel
 from app.models.churn import ChurnPredictionModel
 from app.models.anomaly import AnomalyDetectionModel
-from app.utils.cache import cache
+from app.models.features import FeatureFrame
+from app.utils.cache import cache, prediction_key, recommendation_key
+from app.utils import columnar, scoring
+from app.utils.admission import AdmissionMiddleware
+from app.utils.feature_store import feature_store
+from app.utils.jobs import jobs
+from app.utils.log_config import AccessLogMiddleware, setup_logging
+from app.utils.parallel import sharded_scorer
+from app.utils.predictions import artifact_version
+from app.utils.profiler import ProfilerBusy, profiler
+from app.utils.timing import TimedRoute, TimingMiddleware, stage, timing_stats
 
 # Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -27,6 +39,15 @@ app = FastAPI(
     description="Machine Learning API for EduRPG gamification platform",
     version="1.0.0"
 )
+app.router.route_class = TimedRoute
+
+# Shed load before it queues up; added first so CORS headers still wrap rejections
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
+# Outside admission control so queue wait shows up as a stage
+if settings.timing_enabled:
+    app.add_middleware(TimingMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,12 +58,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.access_log_enabled:
+    app.add_middleware(AccessLogMiddleware)
+
 # Load models at startup
 clustering_model = StudentClusteringModel()
 recommendation_model = QuestRecommendationModel()
 churn_model = ChurnPredictionModel()
 anomaly_model = AnomalyDetectionModel()
 
+# Artifact version of each model as loaded; part of its cache keys
+model_versions: Dict[str, str] = {}
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -53,33 +80,48 @@ async def startup_event():
     
     try:
         if (models_path / "clustering").exists():
+            model_versions["clustering"] = artifact_version(("clustering",))
             clustering_model.load()
             logger.info("✓ Clustering model loaded")
         else:
             logger.warning("✗ Clustering model not found")
         
         if (models_path / "recommendation").exists():
+            model_versions["recommendation"] = artifact_version(("recommendation",))
             recommendation_model.load()
             logger.info("✓ Recommendation model loaded")
         else:
             logger.warning("✗ Recommendation model not found")
         
         if (models_path / "churn").exists():
+            model_versions["churn"] = artifact_version(("churn",))
             churn_model.load()
             logger.info("✓ Churn model loaded")
         else:
             logger.warning("✗ Churn model not found")
         
         if (models_path / "anomaly").exists():
+            model_versions["anomaly"] = artifact_version(("anomaly",))
             anomaly_model.load()
             logger.info("✓ Anomaly model loaded")
         else:
             logger.warning("✗ Anomaly model not found")
         
+        models = (clustering_model, churn_model, anomaly_model)
+        if settings.inference_workers > 1 and all(m.model is not None for m in models):
+            sharded_scorer.start(*models)
+        
         logger.info("ML service ready!")
         
     except Exception as e:
-        logger.error(f"Error loading models: {e}")
+        logger.error("Error loading models: %s", e)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop job and inference worker processes"""
+    jobs.shutdown()
+    sharded_scorer.shutdown()
 
 
 # Authentication dependency
@@ -128,6 +170,171 @@ class AnomalyRequest(BaseModel):
     user_features: UserFeatures
 
 
+class UserIdsRequest(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=settings.max_user_ids_per_request)
+
+
+class CohortFilter(BaseModel):
+    class_id: Optional[str] = None
+    grade: Optional[int] = None
+    min_level: Optional[int] = None
+    max_level: Optional[int] = None
+    min_days_inactive: Optional[float] = None
+    max_days_inactive: Optional[float] = None
+
+
+class JobRequest(BaseModel):
+    user_ids: Optional[List[str]] = Field(None, min_length=1)
+    filter: Optional[CohortFilter] = None
+
+
+async def load_user_features(user_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Load stored features for many users with a single batched query
+    
+    Runs on the threadpool so the pooled database connection does not
+    block the event loop. Users missing from the feature store are absent
+    from the result.
+    """
+    df = await run_in_threadpool(feature_store.get_features, user_ids)
+    fields = list(UserFeatures.model_fields)
+    
+    return {
+        str(record['user_id']): {f: record[f] for f in fields if f in record}
+        for record in df.to_dict('records')
+    }
+
+
+def columns_frame(user_ids: List[str], columns: Dict[str, np.ndarray]) -> FeatureFrame:
+    """Build a frame from parsed columns, filling absent ones with UserFeatures defaults"""
+    for name, field in UserFeatures.model_fields.items():
+        if name != "user_id" and name not in columns:
+            columns[name] = np.full(len(user_ids), field.default, dtype=np.float32)
+    return FeatureFrame(columns)
+
+
+async def read_batch_request(request: Request) -> Tuple[List[str], FeatureFrame]:
+    """
+    Parse a bulk scoring body into user ids and a shared feature frame
+    
+    Dispatches on Content-Type: Arrow IPC, MessagePack, or JSON. JSON is
+    either the ``{"users": [...]}`` row format or an object of
+    equal-length column arrays.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    
+    if content_type in columnar.ARROW_CONTENT_TYPES:
+        user_ids, columns = columnar.parse_arrow(body)
+        return user_ids, columns_frame(user_ids, columns)
+    
+    if content_type in columnar.MSGPACK_CONTENT_TYPES:
+        user_ids, columns = columnar.parse_msgpack(body)
+        return user_ids, columns_frame(user_ids, columns)
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise columnar.ColumnarPayloadError("Request body is not valid JSON")
+    
+    if isinstance(payload, dict) and "users" in payload:
+        try:
+            users = ClusterRequest.model_validate(payload).users
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        return [user.user_id for user in users], FeatureFrame.from_rows(users)
+    
+    user_ids, columns = columnar.parse_json_columns(payload)
+    return user_ids, columns_frame(user_ids, columns)
+
+
+def predict_all(user_ids: List[str], frame: FeatureFrame) -> List[Dict]:
+    """Run cluster, churn and anomaly predictions over one shared feature frame"""
+    return scoring.predict_all(user_ids, frame, clustering_model, churn_model, anomaly_model)
+
+
+async def score_batch(user_ids: List[str], frame: FeatureFrame):
+    """
+    Batch prediction response, sharded across the inference pool for large batches
+    
+    Unsharded batches are scored on the threadpool, off the event loop.
+    Sharded results arrive as JSON text from the workers and are spliced
+    into the body directly instead of being decoded and re-encoded.
+    """
+    if sharded_scorer.active and len(user_ids) >= 2 * settings.inference_min_shard_rows:
+        predictions = await sharded_scorer.predict_json(user_ids, frame)
+        return Response(
+            content=f'{{"total_users": {len(user_ids)}, "predictions": {predictions}}}',
+            media_type="application/json"
+        )
+    
+    return {
+        "total_users": len(user_ids),
+        "predictions": await run_in_threadpool(predict_all, user_ids, frame)
+    }
+
+
+async def stream_predictions(user_ids: List[str], frame: FeatureFrame) -> AsyncIterator[str]:
+    """
+    Score a frame chunk by chunk and yield each chunk as NDJSON lines
+    
+    Chunks are scored on the threadpool only when the previous one has been
+    sent, so a slow client throttles scoring and memory stays bounded by
+    the chunk size.
+    """
+    chunk_size = settings.stream_chunk_size
+    
+    for start in range(0, len(user_ids), chunk_size):
+        stop = start + chunk_size
+        try:
+            results = await run_in_threadpool(predict_all, user_ids[start:stop], frame.slice(start, stop))
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error("Streaming batch prediction error at row %d: %s", start, e)
+            yield json.dumps({"error": "Batch prediction failed", "offset": start}) + "\n"
+            return
+        
+        yield "".join(json.dumps(result) + "\n" for result in results)
+
+
+async def score_user_ids(user_ids: List[str], prefix: str, model_name: str, model, ttl: int) -> Dict:
+    """
+    Score users by id, reading and filling the per-user prediction cache
+    
+    Cached results are fetched with one MGET and features for the misses
+    with one database query. Keys carry the loaded version of
+    ``model_name``.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    version = model_versions.get(model_name, "unknown")
+    cached = cache.get_many([prediction_key(prefix, version, user_id) for user_id in user_ids])
+    results = {user_id: hit for user_id, hit in zip(user_ids, cached) if hit}
+    
+    misses = [user_id for user_id in user_ids if user_id not in results]
+    missing = []
+    
+    if misses:
+        features = await load_user_features(misses)
+        found = [user_id for user_id in misses if user_id in features]
+        missing = [user_id for user_id in misses if user_id not in features]
+        
+        if found:
+            frame = FeatureFrame.from_rows([features[user_id] for user_id in found])
+            for user_id, result in zip(found, model.predict_records(frame)):
+                result['user_id'] = user_id
+                cache.set(prediction_key(prefix, version, user_id), result, ttl)
+                results[user_id] = result
+    
+    return {
+        "total_users": len(user_ids) - len(missing),
+        "predictions": [
+            {**results[user_id], "user_id": user_id}
+            for user_id in user_ids if user_id in results
+        ],
+        "missing": missing
+    }
+
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -146,13 +353,20 @@ async def health():
         "status": "healthy",
         "models_loaded": {
             "clustering": clustering_model.model is not None,
-            "recommendation": recommendation_model.model is not None,
+            "recommendation": recommendation_model.user_similarity_matrix is not None,
             "churn": churn_model.model is not None,
             "anomaly": anomaly_model.model is not None
-        }
+        },
+        "cache": cache.status()
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.post("/api/ml/cluster-student")
 async def cluster_student(
     features: UserFeatures,
@@ -165,7 +379,7 @@ async def cluster_student(
     """
     try:
         # Check cache
-        cache_key = f"cluster:{features.user_id}"
+        cache_key = prediction_key("cluster", model_versions.get("clustering", "unknown"), features.user_id)
         cached = cache.get(cache_key)
         if cached:
             return cached
@@ -182,7 +396,7 @@ async def cluster_student(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Clustering error: {e}")
+        logger.error("Clustering error: %s", e)
         raise HTTPException(status_code=500, detail="Clustering failed")
 
 
@@ -198,7 +412,12 @@ async def recommend_quests(
     """
     try:
         # Check cache
-        cache_key = f"recommendations:{request.user_id}:{request.n_recommendations}"
+        cache_key = recommendation_key(
+            model_versions.get("recommendation", "unknown"),
+            request.user_id,
+            request.n_recommendations,
+            request.exclude_completed
+        )
         cached = cache.get(cache_key)
         if cached:
             return cached
@@ -223,7 +442,7 @@ async def recommend_quests(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Recommendation error: {e}")
+        logger.error("Recommendation error: %s", e)
         raise HTTPException(status_code=500, detail="Recommendation failed")
 
 
@@ -239,7 +458,7 @@ async def predict_churn(
     """
     try:
         # Check cache
-        cache_key = f"churn:{request.user_id}"
+        cache_key = prediction_key("churn", model_versions.get("churn", "unknown"), request.user_id)
         cached = cache.get(cache_key)
         if cached:
             return cached
@@ -257,7 +476,7 @@ async def predict_churn(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Churn prediction error: {e}")
+        logger.error("Churn prediction error: %s", e)
         raise HTTPException(status_code=500, detail="Churn prediction failed")
 
 
@@ -273,7 +492,7 @@ async def detect_anomalies(
     """
     try:
         # Check cache
-        cache_key = f"anomaly:{request.user_id}"
+        cache_key = prediction_key("anomaly", model_versions.get("anomaly", "unknown"), request.user_id)
         cached = cache.get(cache_key)
         if cached:
             return cached
@@ -291,49 +510,205 @@ async def detect_anomalies(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Anomaly detection error: {e}")
+        logger.error("Anomaly detection error: %s", e)
         raise HTTPException(status_code=500, detail="Anomaly detection failed")
 
 
 @app.post("/api/ml/batch-predictions")
 async def batch_predictions(
-    request: ClusterRequest,
+    request: Request,
     api_key: str = Depends(verify_api_key)
 ):
     """
     Run all predictions for multiple students in batch
     
+    Accepts the ``{"users": [...]}`` row format or a columnar body (JSON
+    object of arrays, Arrow IPC, MessagePack); see read_batch_request.
+    With ``Accept: application/x-ndjson`` results are streamed one line
+    per student as each chunk is scored.
     Returns comprehensive ML insights for all students
     """
     try:
-        results = []
-        
-        for user_features in request.users:
-            user_dict = user_features.dict()
-            user_id = user_features.user_id
-            
-            # Run all predictions
-            cluster = clustering_model.predict(user_dict)
-            churn = churn_model.predict(user_dict)
-            anomaly = anomaly_model.predict(user_dict)
-            
-            results.append({
-                "user_id": user_id,
-                "cluster": cluster,
-                "churn": churn,
-                "anomaly": anomaly
-            })
+        with stage("validate"):
+            user_ids, frame = await read_batch_request(request)
+    except columnar.ColumnarPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if len(user_ids) > settings.max_batch_rows:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(user_ids)} rows exceeds the limit of {settings.max_batch_rows}"
+        )
+    
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_predictions(user_ids, frame),
+            media_type="application/x-ndjson"
+        )
+    
+    try:
+        return await score_batch(user_ids, frame)
+        
+    except Exception as e:
+        logger.error("Batch prediction error: %s", e)
+        raise HTTPException(status_code=500, detail="Batch prediction failed")
+
+
+@app.post("/api/ml/users/cluster")
+async def cluster_users(
+    request: UserIdsRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Predict clusters for students by id
+    
+    Features are read from the feature store, so callers only send ids
+    """
+    try:
+        return await score_user_ids(
+            request.user_ids, "cluster", "clustering", clustering_model, settings.cache_ttl_clustering
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Clustering error: %s", e)
+        raise HTTPException(status_code=500, detail="Clustering failed")
+
+
+@app.post("/api/ml/users/predict-churn")
+async def predict_churn_users(
+    request: UserIdsRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """Predict churn for students by id"""
+    try:
+        return await score_user_ids(
+            request.user_ids, "churn", "churn", churn_model, settings.cache_ttl_prediction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Churn prediction error: %s", e)
+        raise HTTPException(status_code=500, detail="Churn prediction failed")
+
+
+@app.post("/api/ml/users/detect-anomalies")
+async def detect_anomalies_users(
+    request: UserIdsRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """Detect anomalous behavior for students by id"""
+    try:
+        return await score_user_ids(
+            request.user_ids, "anomaly", "anomaly", anomaly_model, settings.cache_ttl_prediction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Anomaly detection error: %s", e)
+        raise HTTPException(status_code=500, detail="Anomaly detection failed")
+
+
+@app.post("/api/ml/users/batch-predictions")
+async def batch_predictions_users(
+    request: UserIdsRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Run all predictions for students by id
+    
+    Same response as /api/ml/batch-predictions plus the ids that have no
+    stored features
+    """
+    try:
+        user_ids = list(dict.fromkeys(request.user_ids))
+        features = await load_user_features(user_ids)
+        found = [user_id for user_id in user_ids if user_id in features]
+        
+        frame = FeatureFrame.from_rows([features[user_id] for user_id in found])
+        results = await run_in_threadpool(predict_all, found, frame)
         
         return {
             "total_users": len(results),
-            "predictions": results
+            "predictions": results,
+            "missing": [user_id for user_id in user_ids if user_id not in features]
         }
         
     except Exception as e:
-        logger.error(f"Batch prediction error: {e}")
+        logger.error("Batch prediction error: %s", e)
         raise HTTPException(status_code=500, detail="Batch prediction failed")
 
 
+@app.post("/api/ml/jobs", status_code=202)
+async def submit_job(
+    request: JobRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Submit a cohort scoring job
+    
+    The cohort is a list of ids or a filter (an empty filter selects all
+    students). Scoring runs in worker processes; poll GET /api/ml/jobs/{id}
+    """
+    try:
+        if request.user_ids is None and request.filter is None:
+            raise ValueError("Provide user_ids or filter")
+        
+        filters = request.filter.model_dump(exclude_none=True) if request.filter else None
+        status = await run_in_threadpool(jobs.submit, request.user_ids, filters)
+        
+        return {"job_id": status["job_id"], "status": status["status"]}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Job submit error: %s", e)
+        raise HTTPException(status_code=500, detail="Job submission failed")
+
+
+@app.get("/api/ml/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=settings.max_user_ids_per_request),
+    api_key: str = Depends(verify_api_key)
+):
+    """Job progress plus one page of finished predictions"""
+    status = await run_in_threadpool(jobs.status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    try:
+        results = await run_in_threadpool(jobs.results, job_id, offset, limit)
+        available = sum(status.pop("parts"))
+        
+        return {
+            **status,
+            "progress": status["processed"] / status["total"] if status["total"] else 0.0,
+            "available": available,
+            "offset": offset,
+            "limit": limit,
+            "results": results
+        }
+        
+    except Exception as e:
+        logger.error("Job status error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to read job")
+
+
+@app.delete("/api/ml/jobs/{job_id}")
+async def cancel_job(
+    job_id: str,
+    api_key: str = Depends(verify_api_key)
+):
+    """Cancel a queued or running job"""
+    status = await run_in_threadpool(jobs.cancel, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"job_id": job_id, "status": status["status"]}
+
+
 @app.delete("/api/ml/cache/clear")
 async def clear_cache(
     pattern: Optional[str] = "*",
@@ -341,10 +716,10 @@ async def clear_cache(
 ):
     """Clear cached predictions"""
     try:
-        cache.clear_pattern(pattern)
+        await run_in_threadpool(cache.clear_pattern, pattern)
         return {"message": f"Cache cleared for pattern: {pattern}"}
     except Exception as e:
-        logger.error(f"Cache clear error: {e}")
+        logger.error("Cache clear error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to clear cache")
 
 
@@ -357,21 +732,75 @@ async def models_status(api_key: str = Depends(verify_api_key)):
             "n_clusters": settings.clustering_n_clusters if clustering_model.model else None
         },
         "recommendation": {
-            "loaded": recommendation_model.model is not None,
+            "loaded": recommendation_model.user_similarity_matrix is not None,
             "n_users": len(recommendation_model.user_ids) if recommendation_model.user_ids else 0,
             "n_quests": len(recommendation_model.quest_ids) if recommendation_model.quest_ids else 0
         },
         "churn": {
             "loaded": churn_model.model is not None,
+            "backend": churn_model.backend,
             "threshold": settings.churn_threshold
         },
         "anomaly": {
             "loaded": anomaly_model.model is not None,
-            "contamination": settings.anomaly_contamination
+            "contamination": anomaly_model.model.contamination if anomaly_model.model else settings.anomaly_contamination
         }
     }
 
 
+@app.get("/api/ml/debug/timings")
+async def debug_timings(
+    reset: bool = Query(False),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Per-stage latency percentiles of recent requests
+    
+    Milliseconds per route and stage, from a bounded uniform sample of
+    each. ``reset=true`` clears the samples after reading them.
+    """
+    snapshot = {
+        "reservoir_size": timing_stats.reservoir_size,
+        "routes": timing_stats.snapshot()
+    }
+    if reset:
+        timing_stats.reset()
+    return snapshot
+
+
+@app.post("/api/ml/admin/profile")
+async def profile_service(
+    seconds: float = Query(10, gt=0, le=settings.profiler_max_seconds),
+    interval_ms: float = Query(10, ge=settings.profiler_min_interval_ms),
+    include_idle: bool = Query(False),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Sample the stacks of the serving process for a number of seconds
+    
+    Returns collapsed stacks (``frame;frame;... count`` per line) ready for
+    flamegraph.pl or speedscope. Only one profile runs at a time.
+    """
+    try:
+        result = await run_in_threadpool(
+            profiler.profile, seconds, interval_ms / 1000, include_idle
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(
+        "Profile finished: %d samples in %.1fs, %.2f%% sampling overhead",
+        result['samples'], result['duration_seconds'], result['overhead'] * 100
+    )
+    return PlainTextResponse(
+        profiler.collapsed(result["stacks"]),
+        headers={
+            "X-Profile-Samples": str(result["samples"]),
+            "X-Profile-Overhead": f"{result['overhead']:.4f}"
+        }
+    )
+
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -383,7 +812,7 @@ async def http_exception_handler(request, exc):
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"error": "Internal server error"}
@@ -1,17 +1,103 @@
 """Anomaly detection model for identifying suspicious activities"""
 import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import f1_score
 import joblib
+import json
 import logging
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List
 from app.config import settings
+from app.models.features import FeatureFrame, FeaturePipeline, get_column
+from app.models.tuning import halving_search
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
 
+# Derived feature -> value above which _analyze_anomalies reports it
+RULE_THRESHOLDS = {
+    'xp_per_day': 5000,  # based on game balance
+    'quests_per_day': 10,
+    'trade_frequency': 5,
+    'activity_variance': 0.8,
+    'session_length_avg': 10000
+}
+
+# Hyperparameters searched when tuning is enabled
+SEARCH_SPACE = {
+    'n_estimators': [100, 200, 300],
+    'max_samples': [128, 256, 512, 1024],
+    'max_features': [0.5, 0.75, 1.0],
+    'contamination': [0.01, 0.02, 0.05, 0.1]
+}
+
+# scikit-learn releases whose private IsolationForest attributes _replace_oldest_trees knows
+TREE_SWAP_SKLEARN = ("1.3", "1.4")
+
+
+def rule_labels(data: Any) -> np.ndarray:
+    """
+    Weak anomaly labels: 1 where any rule of _analyze_anomalies fires
+    
+    There is no ground truth for cheating, so tuning scores candidates
+    by how well their flags agree with the explainable rules.
+    """
+    frame = FeatureFrame(data)
+    hits = np.zeros(frame.n_rows, dtype=bool)
+    for name, threshold in RULE_THRESHOLDS.items():
+        hits |= frame.column(name) > threshold
+    return hits.astype(int)
+
+
+def _replace_oldest_trees(forest: IsolationForest, fresh: IsolationForest, n_trees: int):
+    """
+    Swap the n oldest trees of a fitted forest for all trees of ``fresh``
+    
+    Trees stay ordered oldest first, so the next refresh again replaces the
+    longest-serving ones. Both forests must share max_samples_, which
+    normalises the path lengths of every tree.
+    
+    Raises:
+        RuntimeError: On a scikit-learn release outside TREE_SWAP_SKLEARN,
+            whose private forest attributes may differ
+        ValueError: If the forests differ in n_features_in_ or max_samples_
+    """
+    version = ".".join(sklearn.__version__.split(".")[:2])
+    if version not in TREE_SWAP_SKLEARN:
+        raise RuntimeError(
+            f"Replacing trees is only verified on scikit-learn {', '.join(TREE_SWAP_SKLEARN)}, "
+            f"running {sklearn.__version__}; retrain the model instead"
+        )
+    for name in ('n_features_in_', 'max_samples_'):
+        if getattr(fresh, name) != getattr(forest, name):
+            raise ValueError(f"Fresh trees have {name}={getattr(fresh, name)}, the forest {getattr(forest, name)}")
+    
+    forest.estimators_ = forest.estimators_[n_trees:] + fresh.estimators_
+    forest.estimators_features_ = forest.estimators_features_[n_trees:] + fresh.estimators_features_
+    forest._seeds = np.concatenate([forest._seeds[n_trees:], fresh._seeds])
+    
+    # Per-tree path lengths cached at fit time by scikit-learn >= 1.3
+    for name in ('_average_path_length_per_tree', '_decision_path_lengths'):
+        if hasattr(forest, name):
+            setattr(forest, name, tuple(getattr(forest, name)[n_trees:]) + tuple(getattr(fresh, name)))
+
+
+def recent_rows(data: Any, n: int) -> np.ndarray:
+    """Indices of the n most recently active rows (lowest days_inactive), least recent first"""
+    n_rows = len(data)
+    days_inactive = get_column(data, 'days_inactive', n_rows)
+    return np.argsort(-days_inactive, kind='stable')[n_rows - min(n, n_rows):]
+
+
+def rule_f1(estimator: IsolationForest, X: np.ndarray, y: np.ndarray) -> float:
+    """Scorer: F1 of the estimator's anomaly flags against rule_labels"""
+    return f1_score(y, (estimator.predict(X) == -1).astype(int), zero_division=0)
+
+
 class AnomalyDetectionModel:
     """
     Detects anomalous behavior patterns that may indicate:
@@ -23,7 +109,6 @@ class AnomalyDetectionModel:
     
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
         self.feature_names = [
             'xp_per_day',
             'quests_per_day',
@@ -33,49 +118,35 @@ class AnomalyDetectionModel:
             'activity_variance',
             'session_length_avg'
         ]
+        self.pipeline = FeaturePipeline(self.feature_names)
+        self.metadata = {}
+        # Scaled rows of recent students, oldest first, for recalibrating offset_
+        self.reservoir = None
     
-    def prepare_features(self, df: pd.DataFrame) -> np.ndarray:
+    def prepare_features(self, df: pd.DataFrame, fit: bool = False) -> np.ndarray:
         """Calculate derived features for anomaly detection"""
-        df = df.copy()
-        
-        # Calculate rates and ratios
-        df['xp_per_day'] = df['recent_xp_gained'] / (df['active_days'] + 1)
-        df['quests_per_day'] = df['quests_completed'] / (df['account_age_days'] + 1)
-        df['money_earned_rate'] = df['money'] / (df['account_age_days'] + 1)
-        df['achievement_rate'] = df['achievements_unlocked'] / (df['account_age_days'] + 1)
-        df['trade_frequency'] = df['trades_made'] / (df['account_age_days'] + 1)
-        
-        # Activity variance (indicator of suspicious patterns)
-        df['activity_variance'] = df['recent_xp_gained'] / (df['total_xp'] + 1)
-        
-        # Session length (estimate from activity patterns)
-        df['session_length_avg'] = df['total_xp'] / (df['active_days'] + 1)
-        
-        # Fill missing values
-        df = df.fillna(0)
-        
-        # Replace infinities
-        df = df.replace([np.inf, -np.inf], 0)
-        
-        X = df[self.feature_names].values
-        X_scaled = self.scaler.fit_transform(X)
-        
-        return X_scaled
+        # Derived rates are defined once in the shared pipeline; only
+        # training fits the scaling statistics
+        if fit:
+            return self.pipeline.fit_transform(df)
+        return self.pipeline.transform(df)
     
-    def train(self, df: pd.DataFrame) -> Dict:
+    def train(self, df: pd.DataFrame, tune: bool = None) -> Dict:
         """
         Train anomaly detection model
         
         Args:
             df: Training data with user features
-            
+            tune: Search hyperparameters against rule_labels first
+                (default settings.tuning_enabled)
+                
         Returns:
             Training metrics
         """
         logger.info("Training anomaly detection model...")
         
         # Prepare features
-        X = self.prepare_features(df)
+        X = self.prepare_features(df, fit=True)
         
         # Train Isolation Forest
         self.model = IsolationForest(
@@ -85,72 +156,190 @@ class AnomalyDetectionModel:
             max_samples='auto'
         )
         
+        tune = settings.tuning_enabled if tune is None else tune
+        tuning = None
+        if tune:
+            y = rule_labels(df)
+            if y.sum() < settings.tuning_cv_folds:
+                logger.warning("Too few rule-flagged users to score candidates, skipping tuning")
+            else:
+                params, tuning = halving_search(self.model, SEARCH_SPACE, X, y, scoring=rule_f1)
+                self.model.set_params(**params)
+        
         predictions = self.model.fit_predict(X)
         
+        # The reservoir starts from the most recently active students, like a refresh window
+        self.reservoir = X[recent_rows(df, settings.anomaly_reservoir_size)].astype(np.float32)
+        
         # Calculate metrics
         n_anomalies = (predictions == -1).sum()
         anomaly_rate = n_anomalies / len(predictions)
         
         logger.info(f"Anomaly detection trained. Found {n_anomalies} anomalies ({anomaly_rate:.2%})")
         
-        return {
+        params = self.model.get_params()
+        self.metadata = {
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'n_samples': len(df),
+            'params': {name: params[name] for name in SEARCH_SPACE},
+            'tuning': tuning
+        }
+        
+        metrics = {
             'n_samples': len(df),
             'n_anomalies': int(n_anomalies),
             'anomaly_rate': float(anomaly_rate),
-            'contamination': settings.anomaly_contamination
+            'contamination': self.model.contamination
         }
+        if tuning:
+            metrics['tuning'] = tuning
+        return metrics
     
-    def predict(self, user_features: Dict) -> Dict:
+    def refresh(self, df: pd.DataFrame, fraction: float = None) -> Dict:
         """
-        Check if user activity is anomalous
+        Refit the oldest trees on a window of recent students
+        
+        The oldest ``fraction`` of trees is replaced by as many new trees
+        fitted on ``df``, and the same share of the score reservoir by its
+        most recently active rows. The anomaly threshold (offset_) is then recomputed
+        from the reservoir. Scaling statistics are kept, so the remaining
+        trees stay valid. Cost depends on the window and reservoir sizes,
+        not on the full history.
         
         Args:
-            user_features: Dictionary with user feature values
+            df: Features of recently active students
+            fraction: Share of trees to replace (default settings.anomaly_refresh_fraction)
             
         Returns:
-            Anomaly detection result with score and details
+            Rows used, trees replaced, old and new offset and the mean
+            score change on the reservoir
+            
+        Raises:
+            ValueError: If the model is not trained, the fraction is not in
+                (0, 1] or the window has fewer rows than each tree samples
+            RuntimeError: On an unsupported scikit-learn release (see
+                _replace_oldest_trees)
         """
         if not self.model:
             raise ValueError("Model not trained. Call train() first.")
         
-        # Calculate derived features
-        active_days = max(user_features.get('active_days', 1), 1)
-        account_age = max(user_features.get('account_age_days', 1), 1)
-        
-        features = {
-            'xp_per_day': user_features.get('recent_xp_gained', 0) / active_days,
-            'quests_per_day': user_features.get('quests_completed', 0) / account_age,
-            'money_earned_rate': user_features.get('money', 0) / account_age,
-            'achievement_rate': user_features.get('achievements_unlocked', 0) / account_age,
-            'trade_frequency': user_features.get('trades_made', 0) / account_age,
-            'activity_variance': user_features.get('recent_xp_gained', 0) / max(user_features.get('total_xp', 1), 1),
-            'session_length_avg': user_features.get('total_xp', 0) / active_days
-        }
+        if fraction is None:
+            fraction = settings.anomaly_refresh_fraction
+        if not 0 < fraction <= 1:
+            raise ValueError(f"Refresh fraction must be in (0, 1], got {fraction}")
+        n_refreshes = self.metadata.get('n_refreshes', 0) + 1
+        rng = np.random.default_rng(42 + n_refreshes)
         
-        # Prepare features
-        feature_values = [features[f] for f in self.feature_names]
-        X = np.array(feature_values).reshape(1, -1)
+        if len(df) > settings.anomaly_window_size:
+            df = df.iloc[np.sort(rng.choice(len(df), settings.anomaly_window_size, replace=False))]
+        X = self.prepare_features(df)
         
-        # Replace infinities
-        X = np.nan_to_num(X, nan=0, posinf=0, neginf=0)
+        max_samples = self.model.max_samples_
+        if len(X) < max_samples:
+            raise ValueError(f"Refresh window has {len(X)} rows, fewer than the {max_samples} each tree samples")
+        
+        n_trees = len(self.model.estimators_)
+        n_replace = min(n_trees, max(1, round(fraction * n_trees)))
+        
+        # Old artifacts have no reservoir: start it from this window
+        reservoir = self.reservoir if self.reservoir is not None else np.empty((0, X.shape[1]), dtype=np.float32)
+        scores_before = self.model.score_samples(reservoir) if len(reservoir) else None
+        offset_before = float(self.model.offset_)
+        
+        fresh = IsolationForest(
+            n_estimators=n_replace,
+            max_samples=max_samples,
+            max_features=self.model.max_features,
+            contamination=self.model.contamination,
+            random_state=42 + n_refreshes
+        ).fit(X)
+        _replace_oldest_trees(self.model, fresh, n_replace)
+        
+        # Slide the reservoir as far as the forest: drop the oldest rows, add new ones
+        size = settings.anomaly_reservoir_size
+        n_new = min(len(X), max(size - len(reservoir), round(fraction * size)))
+        sample = X[recent_rows(df, n_new)].astype(np.float32)
+        self.reservoir = np.concatenate([reservoir, sample])[-size:]
+        
+        scores = self.model.score_samples(self.reservoir)
+        if self.model.contamination != 'auto':
+            self.model.offset_ = np.percentile(scores, 100.0 * self.model.contamination)
+        
+        # Rows still in the reservoir from before the refresh, scored by both forests
+        n_kept = min(len(reservoir), len(self.reservoir) - len(sample))
+        score_shift = (
+            float(np.abs(scores[:n_kept] - scores_before[len(reservoir) - n_kept:]).mean())
+            if n_kept else None
+        )
+        
+        stats = {
+            'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+            'n_samples': len(X),
+            'trees_replaced': n_replace,
+            'reservoir_size': len(self.reservoir),
+            'offset_before': offset_before,
+            'offset_after': float(self.model.offset_),
+            'mean_score_shift': score_shift
+        }
+        self.metadata['n_refreshes'] = n_refreshes
+        self.metadata['last_refresh'] = stats
         
-        X_scaled = self.scaler.transform(X)
+        logger.info(
+            f"Anomaly model refreshed on {len(X)} rows: {n_replace}/{n_trees} trees replaced, "
+            f"offset {offset_before:.4f} -> {stats['offset_after']:.4f}"
+        )
+        return stats
+    
+    def predict(self, user_features: Dict) -> Dict:
+        """
+        Check if user activity is anomalous
         
-        # Predict
-        prediction = self.model.predict(X_scaled)[0]
-        score = self.model.score_samples(X_scaled)[0]
+        Args:
+            user_features: Dictionary with user feature values
+            
+        Returns:
+            Anomaly detection result with score and details
+        """
+        return self.predict_records(user_features)[0]
+    
+    def predict_records(self, data: Any) -> List[Dict]:
+        """
+        Check one or many users for anomalous activity
         
-        is_anomaly = prediction == -1
+        Args:
+            data: FeatureFrame, DataFrame, dict of columns or single-row dict
+            
+        Returns:
+            One result dict per row, as returned by predict()
+        """
+        if not self.model:
+            raise ValueError("Model not trained. Call train() first.")
         
-        # Analyze specific anomalies
-        anomalies = self._analyze_anomalies(features, is_anomaly)
+        # Calculate derived features (same code path as training)
+        X_scaled = self.pipeline.transform(data)
+        
+        # One scoring pass; predict() is score_samples - offset_ < 0
+        with stage("inference"):
+            scores = self.model.score_samples(X_scaled)
+        is_anomaly = scores - self.model.offset_ < 0
+        
+        results = []
+        for i, score in enumerate(scores):
+            anomalies = []
+            if is_anomaly[i]:
+                # Undo scaling for this row only to report raw rates
+                raw = X_scaled[i] * self.pipeline.scale_ + self.pipeline.mean_
+                features = dict(zip(self.feature_names, raw.tolist()))
+                anomalies = self._analyze_anomalies(features, True)
+            
+            results.append({
+                'is_anomaly': bool(is_anomaly[i]),
+                'anomaly_score': float(score),
+                'confidence': float(abs(score)),
+                'anomalies_detected': anomalies
+            })
         
-        return {
-            'is_anomaly': bool(is_anomaly),
-            'anomaly_score': float(score),
-            'confidence': float(abs(score)),
-            'anomalies_detected': anomalies
-        }
+        return results
     
     def _analyze_anomalies(self, features: Dict, is_anomaly: bool) -> List[Dict]:
         """Identify specific types of anomalies"""
@@ -160,7 +349,7 @@ class AnomalyDetectionModel:
             return anomalies
         
         # Check for unusual XP gain
-        if features['xp_per_day'] > 5000:  # Threshold based on game balance
+        if features['xp_per_day'] > RULE_THRESHOLDS['xp_per_day']:
             anomalies.append({
                 'type': 'UNUSUAL_XP_GAIN',
                 'severity': 'HIGH',
@@ -169,7 +358,7 @@ class AnomalyDetectionModel:
             })
         
         # Check for excessive quest completion
-        if features['quests_per_day'] > 10:
+        if features['quests_per_day'] > RULE_THRESHOLDS['quests_per_day']:
             anomalies.append({
                 'type': 'EXCESSIVE_QUEST_COMPLETION',
                 'severity': 'MEDIUM',
@@ -178,7 +367,7 @@ class AnomalyDetectionModel:
             })
         
         # Check for unusual trading activity
-        if features['trade_frequency'] > 5:
+        if features['trade_frequency'] > RULE_THRESHOLDS['trade_frequency']:
             anomalies.append({
                 'type': 'UNUSUAL_TRADING',
                 'severity': 'MEDIUM',
@@ -187,7 +376,7 @@ class AnomalyDetectionModel:
             })
         
         # Check for sudden activity spike
-        if features['activity_variance'] > 0.8:
+        if features['activity_variance'] > RULE_THRESHOLDS['activity_variance']:
             anomalies.append({
                 'type': 'SUDDEN_ACTIVITY_SPIKE',
                 'severity': 'LOW',
@@ -196,7 +385,7 @@ class AnomalyDetectionModel:
             })
         
         # Check for extreme session length
-        if features['session_length_avg'] > 10000:
+        if features['session_length_avg'] > RULE_THRESHOLDS['session_length_avg']:
             anomalies.append({
                 'type': 'EXTREME_SESSION_LENGTH',
                 'severity': 'MEDIUM',
@@ -206,22 +395,8 @@ class AnomalyDetectionModel:
         
         return anomalies
     
-    def predict_batch(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Detect anomalies for multiple users"""
-        if not self.model:
-            raise ValueError("Model not trained. Call train() first.")
-        
-        X = self.prepare_features(df)
-        predictions = self.model.predict(X)
-        scores = self.model.score_samples(X)
-        
-        df['is_anomaly'] = predictions == -1
-        df['anomaly_score'] = scores
-        
-        return df
-    
     def save(self, path: str = None):
-        """Save model and scaler to disk"""
+        """Save model and feature pipeline to disk"""
         if not path:
             path = Path(settings.model_path) / "anomaly"
         else:
@@ -230,18 +405,34 @@ class AnomalyDetectionModel:
         path.mkdir(parents=True, exist_ok=True)
         
         joblib.dump(self.model, path / "model.pkl")
-        joblib.dump(self.scaler, path / "scaler.pkl")
+        joblib.dump(self.pipeline, path / "pipeline.pkl")
+        if self.reservoir is not None:
+            joblib.dump(self.reservoir, path / "reservoir.pkl")
+        (path / "metadata.json").write_text(json.dumps(self.metadata, indent=2))
         
         logger.info(f"Model saved to {path}")
     
     def load(self, path: str = None):
-        """Load model and scaler from disk"""
+        """Load model and feature pipeline from disk"""
         if not path:
-            path = Path(settings.model_path) / "churn"
+            path = Path(settings.model_path) / "anomaly"
         else:
             path = Path(path)
         
         self.model = joblib.load(path / "model.pkl")
-        self.scaler = joblib.load(path / "scaler.pkl")
+        
+        if (path / "pipeline.pkl").exists():
+            self.pipeline = joblib.load(path / "pipeline.pkl")
+        else:
+            # Artifacts saved before the shared pipeline only have a scaler
+            self.pipeline = FeaturePipeline.from_scaler(
+                self.feature_names,
+                joblib.load(path / "scaler.pkl")
+            )
+        
+        # Artifacts saved before metadata and the reservoir were recorded have neither
+        metadata_path = path / "metadata.json"
+        self.metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+        self.reservoir = joblib.load(path / "reservoir.pkl") if (path / "reservoir.pkl").exists() else None
         
         logger.info(f"Model loaded from {path}")
@@ -1,19 +1,91 @@
 """Churn prediction model to identify students at risk of dropping out"""
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+from scipy.stats import loguniform
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from threadpoolctl import threadpool_limits
 import joblib
+import json
 import logging
+from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List
 from app.config import settings
+from app.models.features import FeaturePipeline, get_column
+from app.models.tuning import halving_search
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
 
+# Estimator class -> settings.churn_backend name
+BACKENDS = {
+    RandomForestClassifier: "random_forest",
+    HistGradientBoostingClassifier: "hist_gradient_boosting"
+}
+
+# Backend -> hyperparameters searched when tuning is enabled
+SEARCH_SPACES = {
+    "random_forest": {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [6, 10, 14, None],
+        'min_samples_leaf': [1, 5, 10, 20],
+        'max_features': ['sqrt', 0.5, 1.0]
+    },
+    "hist_gradient_boosting": {
+        'learning_rate': loguniform(0.02, 0.3),
+        'max_leaf_nodes': [15, 31, 63],
+        'min_samples_leaf': [10, 20, 50, 100],
+        'l2_regularization': loguniform(1e-3, 10.0)
+    }
+}
+
+# Test rows the permutation importance of backends without impurity importances is measured on
+IMPORTANCE_SAMPLE = 5000
+
+
+def make_estimator(backend: str = None):
+    """
+    Churn classifier for a backend
+    
+    Args:
+        backend: "random_forest" for the bagged depth-10 forest or
+            "hist_gradient_boosting" for boosting on binned features, with
+            early stopping on a held-out part of the training split
+            (default settings.churn_backend)
+    """
+    backend = backend or settings.churn_backend
+    
+    if backend == "random_forest":
+        return RandomForestClassifier(
+            n_estimators=100,
+            max_depth=10,
+            min_samples_split=10,
+            min_samples_leaf=5,
+            random_state=42,
+            class_weight='balanced',
+            n_jobs=settings.churn_n_jobs
+        )
+    if backend == "hist_gradient_boosting":
+        return HistGradientBoostingClassifier(
+            learning_rate=0.1,
+            max_iter=settings.churn_max_iter,
+            max_leaf_nodes=31,
+            min_samples_leaf=20,
+            l2_regularization=1.0,
+            early_stopping=settings.churn_early_stopping,
+            validation_fraction=0.1,
+            n_iter_no_change=10,
+            scoring='loss',
+            random_state=42,
+            class_weight='balanced'
+        )
+    raise ValueError(f"Unknown churn backend '{backend}', expected 'random_forest' or 'hist_gradient_boosting'")
+
+
 class ChurnPredictionModel:
     """
     Predicts probability of student churn (becoming inactive)
@@ -27,7 +99,6 @@ class ChurnPredictionModel:
     
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
         self.feature_names = [
             'days_inactive',
             'active_days',
@@ -39,13 +110,22 @@ class ChurnPredictionModel:
             'events_participated',
             'account_age_days'
         ]
+        self.pipeline = FeaturePipeline(self.feature_names)
+        self.metadata = {}
     
-    def prepare_features(self, df: pd.DataFrame) -> np.ndarray:
+    @property
+    def backend(self) -> str:
+        """settings.churn_backend name of the trained estimator"""
+        if self.model is None:
+            return None
+        return BACKENDS.get(type(self.model), type(self.model).__name__)
+    
+    def prepare_features(self, df: pd.DataFrame, fit: bool = False) -> np.ndarray:
         """Prepare features for training/prediction"""
-        df = df.fillna(0)
-        X = df[self.feature_names].values
-        X_scaled = self.scaler.fit_transform(X)
-        return X_scaled
+        # Only fit the scaling statistics at training time
+        if fit:
+            return self.pipeline.fit_transform(df)
+        return self.pipeline.transform(df)
     
     def create_labels(self, df: pd.DataFrame) -> np.ndarray:
         """
@@ -54,12 +134,15 @@ class ChurnPredictionModel:
         """
         return (df['days_inactive'] > 14).astype(int).values
     
-    def train(self, df: pd.DataFrame) -> Dict:
+    def train(self, df: pd.DataFrame, backend: str = None, tune: bool = None) -> Dict:
         """
         Train churn prediction model
         
         Args:
             df: Training data with user features
+            backend: Estimator backend (default settings.churn_backend)
+            tune: Search hyperparameters on the training split first
+                (default settings.tuning_enabled)
             
         Returns:
             Training metrics
@@ -67,7 +150,7 @@ class ChurnPredictionModel:
         logger.info("Training churn prediction model...")
         
         # Prepare features and labels
-        X = self.prepare_features(df)
+        X = self.prepare_features(df, fit=True)
         y = self.create_labels(df)
         
         # Split data
@@ -75,36 +158,57 @@ class ChurnPredictionModel:
             X, y, test_size=0.2, random_state=42, stratify=y
         )
         
-        # Train Random Forest
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=10,
-            min_samples_leaf=5,
-            random_state=42,
-            class_weight='balanced'
-        )
+        backend = backend or settings.churn_backend
+        self.model = make_estimator(backend)
         
-        self.model.fit(X_train, y_train)
+        tune = settings.tuning_enabled if tune is None else tune
+        tuning = None
+        if tune:
+            if np.bincount(y_train, minlength=2).min() < settings.tuning_cv_folds:
+                logger.warning("Too few samples of a class to cross-validate, skipping tuning")
+            else:
+                # Log loss rather than AUC: risk levels are read off the probabilities
+                params, tuning = halving_search(
+                    self.model, SEARCH_SPACES[backend], X_train, y_train, scoring='neg_log_loss'
+                )
+                self.model.set_params(**params)
+        
+        self._fit(X_train, y_train)
         
         # Evaluate
         y_pred = self.model.predict(X_test)
         y_pred_proba = self.model.predict_proba(X_test)[:, 1]
         
         metrics = {
+            'backend': self.backend,
             'accuracy': float(accuracy_score(y_test, y_pred)),
             'precision': float(precision_score(y_test, y_pred, zero_division=0)),
             'recall': float(recall_score(y_test, y_pred, zero_division=0)),
             'f1_score': float(f1_score(y_test, y_pred, zero_division=0)),
+            'roc_auc': float(roc_auc_score(y_test, y_pred_proba)),
             'churn_rate': float(y.mean()),
             'n_churned': int(y.sum()),
             'n_active': int((y == 0).sum())
         }
+        if hasattr(self.model, 'n_iter_'):
+            metrics['n_iterations'] = int(self.model.n_iter_)
+        if tuning:
+            metrics['tuning'] = tuning
+        
+        params = self.model.get_params()
+        self.metadata = {
+            'backend': backend,
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'n_samples': int(len(y)),
+            'params': {name: params[name] for name in SEARCH_SPACES[backend]},
+            'tuning': tuning,
+            'metrics': {name: metrics[name] for name in ('accuracy', 'f1_score', 'roc_auc')}
+        }
         
         # Feature importance
         feature_importance = dict(zip(
             self.feature_names,
-            self.model.feature_importances_
+            self._feature_importance(X_test, y_test)
         ))
         metrics['feature_importance'] = {
             k: float(v) for k, v in sorted(
@@ -114,10 +218,37 @@ class ChurnPredictionModel:
             )
         }
         
-        logger.info(f"Churn model trained. Accuracy: {metrics['accuracy']:.3f}, F1: {metrics['f1_score']:.3f}")
+        logger.info(
+            f"Churn model ({metrics['backend']}) trained. Accuracy: {metrics['accuracy']:.3f}, "
+            f"F1: {metrics['f1_score']:.3f}, AUC: {metrics['roc_auc']:.3f}"
+        )
         
         return metrics
     
+    def _fit(self, X: np.ndarray, y: np.ndarray):
+        """Fit the estimator on settings.churn_n_jobs cores"""
+        # Boosting parallelises with OpenMP threads rather than n_jobs
+        limit = settings.churn_n_jobs if settings.churn_n_jobs > 0 else None
+        with threadpool_limits(limits=limit, user_api='openmp'):
+            self.model.fit(X, y)
+        
+        # Serve single-threaded: a thread pool per request costs more than
+        # it saves on the few rows a request scores
+        if hasattr(self.model, 'n_jobs'):
+            self.model.n_jobs = None
+    
+    def _feature_importance(self, X_test: np.ndarray, y_test: np.ndarray) -> np.ndarray:
+        """Impurity importances, or permutation importances for backends without them"""
+        if hasattr(self.model, 'feature_importances_'):
+            return self.model.feature_importances_
+        
+        n_rows = min(len(y_test), IMPORTANCE_SAMPLE)
+        result = permutation_importance(
+            self.model, X_test[:n_rows], y_test[:n_rows],
+            scoring='roc_auc', n_repeats=3, random_state=42
+        )
+        return result.importances_mean
+    
     def predict(self, user_features: Dict) -> Dict:
         """
         Predict churn probability for a user
@@ -128,33 +259,53 @@ class ChurnPredictionModel:
         Returns:
             Churn prediction with risk level and recommendations
         """
+        return self.predict_records(user_features)[0]
+    
+    def predict_records(self, data: Any) -> List[Dict]:
+        """
+        Predict churn for one or many users
+        
+        Args:
+            data: FeatureFrame, DataFrame, dict of columns or single-row dict
+            
+        Returns:
+            One prediction dict per row, as returned by predict()
+        """
         if not self.model:
             raise ValueError("Model not trained. Call train() first.")
         
         # Prepare features
-        feature_values = [user_features.get(f, 0) for f in self.feature_names]
-        X = np.array(feature_values).reshape(1, -1)
-        X_scaled = self.scaler.transform(X)
+        X_scaled = self.pipeline.transform(data)
         
         # Predict
-        churn_proba = self.model.predict_proba(X_scaled)[0][1]
+        with stage("inference"):
+            probas = self.model.predict_proba(X_scaled)[:, 1]
         
         # Determine risk level
-        if churn_proba < 0.3:
-            risk_level = "LOW"
-        elif churn_proba < 0.6:
-            risk_level = "MEDIUM"
-        else:
-            risk_level = "HIGH"
-        
-        # Generate recommendations
-        recommendations = self._generate_recommendations(user_features, churn_proba)
+        risk_levels = np.select(
+            [probas < 0.3, probas < 0.6],
+            ["LOW", "MEDIUM"],
+            default="HIGH"
+        )
         
-        return {
-            'churn_probability': float(churn_proba),
-            'risk_level': risk_level,
-            'recommendations': recommendations
+        # Raw inputs for the rule-based recommendations
+        n_rows = len(probas)
+        risk_inputs = {
+            name: get_column(data, name, n_rows)
+            for name in ('days_inactive', 'quests_completed', 'events_participated')
         }
+        
+        results = []
+        with stage("reasons"):
+            for i, churn_proba in enumerate(probas):
+                features = {name: values[i] for name, values in risk_inputs.items()}
+                results.append({
+                    'churn_probability': float(churn_proba),
+                    'risk_level': str(risk_levels[i]),
+                    'recommendations': self._generate_recommendations(features, churn_proba)
+                })
+        
+        return results
     
     def _generate_recommendations(self, features: Dict, churn_proba: float) -> list:
         """Generate personalized recommendations to reduce churn risk"""
@@ -200,25 +351,8 @@ class ChurnPredictionModel:
         
         return recommendations
     
-    def predict_batch(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Predict churn for multiple users"""
-        if not self.model:
-            raise ValueError("Model not trained. Call train() first.")
-        
-        X = self.prepare_features(df)
-        probas = self.model.predict_proba(X)[:, 1]
-        
-        df['churn_probability'] = probas
-        df['risk_level'] = pd.cut(
-            probas,
-            bins=[0, 0.3, 0.6, 1.0],
-            labels=['LOW', 'MEDIUM', 'HIGH']
-        )
-        
-        return df
-    
     def save(self, path: str = None):
-        """Save model and scaler to disk"""
+        """Save model and feature pipeline to disk"""
         if not path:
             path = Path(settings.model_path) / "churn"
         else:
@@ -227,18 +361,31 @@ class ChurnPredictionModel:
         path.mkdir(parents=True, exist_ok=True)
         
         joblib.dump(self.model, path / "model.pkl")
-        joblib.dump(self.scaler, path / "scaler.pkl")
+        joblib.dump(self.pipeline, path / "pipeline.pkl")
+        (path / "metadata.json").write_text(json.dumps(self.metadata, indent=2))
         
         logger.info(f"Model saved to {path}")
     
     def load(self, path: str = None):
-        """Load model and scaler from disk"""
+        """Load model and feature pipeline from disk"""
         if not path:
             path = Path(settings.model_path) / "churn"
         else:
             path = Path(path)
         
         self.model = joblib.load(path / "model.pkl")
-        self.scaler = joblib.load(path / "scaler.pkl")
+        
+        if (path / "pipeline.pkl").exists():
+            self.pipeline = joblib.load(path / "pipeline.pkl")
+        else:
+            # Artifacts saved before the shared pipeline only have a scaler
+            self.pipeline = FeaturePipeline.from_scaler(
+                self.feature_names,
+                joblib.load(path / "scaler.pkl")
+            )
+        
+        # Artifacts saved before metadata was recorded have none
+        metadata_path = path / "metadata.json"
+        self.metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
         
         logger.info(f"Model loaded from {path}")
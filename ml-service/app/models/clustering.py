@@ -1,18 +1,218 @@
 """Student clustering model using K-Means"""
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
+from scipy.optimize import linear_sum_assignment
+from scipy.stats import t as t_dist
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_samples
 import joblib
 import logging
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional
 from app.config import settings
+from app.models.features import FeaturePipeline
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
 
+# Cluster statistic -> feature column it averages
+STAT_COLUMNS = {
+    'avg_xp': 'total_xp',
+    'avg_level': 'level',
+    'avg_quests': 'quests_completed',
+    'avg_active_days': 'active_days'
+}
+
+
+def make_estimator(mode: str = None):
+    """
+    K-Means estimator for a clustering mode
+    
+    Args:
+        mode: "kmeans" for full-batch Lloyd iterations or "minibatch" for
+            MiniBatchKMeans, which also supports partial_fit (default
+            settings.clustering_mode)
+    """
+    mode = mode or settings.clustering_mode
+    
+    if mode == "kmeans":
+        return KMeans(
+            n_clusters=settings.clustering_n_clusters,
+            random_state=42,
+            n_init=10,
+            max_iter=300
+        )
+    if mode == "minibatch":
+        return MiniBatchKMeans(
+            n_clusters=settings.clustering_n_clusters,
+            random_state=42,
+            batch_size=settings.clustering_batch_size,
+            n_init=3,
+            max_iter=100
+        )
+    raise ValueError(f"Unknown clustering mode '{mode}', expected 'kmeans' or 'minibatch'")
+
+
+def silhouette_estimate(
+    X: np.ndarray,
+    labels: np.ndarray,
+    sample_size: int,
+    population: Optional[np.ndarray] = None,
+    replicates: int = 10,
+    seed: int = 42
+) -> Dict:
+    """
+    Silhouette score from stratified samples with a 95% confidence interval
+    
+    The rows are split over ``replicates`` independent samples. In each,
+    every cluster contributes rows in proportion to its size (at least
+    two), silhouettes are computed within the sample and averaged per
+    cluster with population weights, so small clusters are neither lost
+    nor overweighted. The score is the mean over replicates and the
+    interval comes from their spread, which covers the randomness of both
+    the scored rows and the rows they are compared with. Cost is
+    O(sample_size² / replicates) instead of O(n²); tables small enough to
+    score exactly at that cost are.
+    
+    Args:
+        X: Scaled feature matrix, the whole table or a uniform sample of it
+        labels: Cluster of each row of X
+        sample_size: Rows to compute silhouettes on, over all replicates
+        population: Per-cluster row counts of the whole table when X is a
+            sample of it
+        replicates: Independent samples
+        seed: Random seed
+        
+    Returns:
+        score, ci_low, ci_high and sample_size
+    """
+    clusters, counts = np.unique(labels, return_counts=True)
+    if len(clusters) < 2:
+        return {'score': 0.0, 'ci_low': 0.0, 'ci_high': 0.0, 'sample_size': 0}
+    
+    # Exact scoring is O(n²); use it while that is no dearer than the replicates
+    if population is None and len(labels) ** 2 <= sample_size ** 2 / replicates:
+        score = float(silhouette_samples(X, labels).mean())
+        return {'score': score, 'ci_low': score, 'ci_high': score, 'sample_size': len(labels)}
+    
+    strata_sizes = counts if population is None else population[clusters]
+    weights = strata_sizes / strata_sizes.sum()
+    per_replicate = max(sample_size // replicates, 2 * len(clusters))
+    allocation = np.round(per_replicate * counts / counts.sum()).astype(int)
+    allocation = np.minimum(np.maximum(allocation, 2), counts)
+    offsets = np.concatenate([[0], np.cumsum(allocation)[:-1]])
+    
+    # Rows grouped by cluster; each replicate draws without replacement from every group
+    rng = np.random.default_rng(seed)
+    groups = np.split(np.argsort(labels, kind='stable'), np.cumsum(counts)[:-1])
+    estimates = np.empty(replicates)
+    
+    for r in range(replicates):
+        rows = np.concatenate([rng.choice(group, n, replace=False) for group, n in zip(groups, allocation)])
+        values = silhouette_samples(X[rows], labels[rows])
+        estimates[r] = weights @ (np.add.reduceat(values, offsets) / allocation)
+    
+    score = float(estimates.mean())
+    half_width = float(t_dist.ppf(0.975, replicates - 1) * estimates.std(ddof=1) / np.sqrt(replicates))
+    return {
+        'score': score,
+        'ci_low': score - half_width,
+        'ci_high': score + half_width,
+        'sample_size': int(allocation.sum() * replicates)
+    }
+
+
+class ClusterTally:
+    """
+    Per-cluster running sums for training diagnostics in O(n)
+    
+    Rows can be added in one go or chunk by chunk. Counts, feature means
+    and inertia (against the model's centroids) come from one pass. The
+    Davies-Bouldin and Calinski-Harabasz indices use the true cluster
+    means, as sklearn's do; Davies-Bouldin also needs the rows' distances
+    to those means, counted by a second pass with add_spread().
+    """
+    
+    def __init__(self, centers: np.ndarray):
+        k = len(centers)
+        self.centers = centers.astype(np.float64)
+        self.counts = np.zeros(k)
+        self.cluster_sums = np.zeros(centers.shape)
+        self.square_sums = np.zeros(k)
+        self.spread_sums: Optional[np.ndarray] = None
+        self.column_sums = {column: np.zeros(k) for column in STAT_COLUMNS.values()}
+        self.inertia = 0.0
+    
+    def add(self, X: np.ndarray, labels: np.ndarray, df: pd.DataFrame):
+        """Count one chunk: scaled features, their clusters and the raw rows"""
+        k = len(self.centers)
+        X = X.astype(np.float64, copy=False)
+        distances = np.sqrt(((X - self.centers[labels]) ** 2).sum(axis=1))
+        
+        self.counts += np.bincount(labels, minlength=k)
+        self.inertia += float(distances @ distances)
+        for j in range(X.shape[1]):
+            self.cluster_sums[:, j] += np.bincount(labels, weights=X[:, j], minlength=k)
+        self.square_sums += np.bincount(labels, weights=(X ** 2).sum(axis=1), minlength=k)
+        for column, sums in self.column_sums.items():
+            sums += np.bincount(labels, weights=df[column].to_numpy(dtype=np.float64), minlength=k)
+    
+    def add_spread(self, X: np.ndarray, labels: np.ndarray):
+        """Second pass over the same rows: distances to their cluster means, for Davies-Bouldin"""
+        if self.spread_sums is None:
+            self.spread_sums = np.zeros(len(self.centers))
+        distances = np.sqrt(((X - self.means()[labels]) ** 2).sum(axis=1))
+        self.spread_sums += np.bincount(labels, weights=distances, minlength=len(self.centers))
+    
+    @property
+    def nonempty(self) -> np.ndarray:
+        return np.flatnonzero(self.counts)
+    
+    def column_means(self) -> Dict[str, np.ndarray]:
+        ids = self.nonempty
+        return {column: sums[ids] / self.counts[ids] for column, sums in self.column_sums.items()}
+    
+    def means(self) -> np.ndarray:
+        """Mean scaled feature vector of every cluster (zeros for empty ones)"""
+        return self.cluster_sums / np.maximum(self.counts, 1)[:, None]
+    
+    def davies_bouldin(self) -> float:
+        """
+        Mean over clusters of the worst (spread_i + spread_j) / mean distance ratio; lower is better
+        
+        Raises:
+            ValueError: If add_spread() has not been run
+        """
+        if self.spread_sums is None:
+            raise ValueError("Davies-Bouldin needs a second pass with add_spread()")
+        
+        ids = self.nonempty
+        if len(ids) < 2:
+            return 0.0
+        
+        spread = self.spread_sums[ids] / self.counts[ids]
+        centers = self.means()[ids]
+        separation = np.sqrt(((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        separation[separation == 0] = np.inf
+        ratios = (spread[:, None] + spread[None, :]) / separation
+        return float(ratios.max(axis=1).mean())
+    
+    def calinski_harabasz(self) -> float:
+        """Between- over within-cluster dispersion, scaled by degrees of freedom; higher is better"""
+        ids = self.nonempty
+        n, k = self.counts.sum(), len(ids)
+        means = self.means()[ids]
+        # Squared distances to the cluster means: sum of ||x||^2 minus n_i * ||mean_i||^2
+        within = float(self.square_sums[ids].sum() - self.counts[ids] @ (means ** 2).sum(axis=1))
+        if k < 2 or within <= 0:
+            return 0.0
+        
+        mean = self.cluster_sums.sum(axis=0) / n
+        between = float(self.counts[ids] @ ((means - mean) ** 2).sum(axis=1))
+        return between * (n - k) / (within * (k - 1))
+
+
 class StudentClusteringModel:
     """
     Clusters students into segments based on behavior and performance.
@@ -27,7 +227,6 @@ class StudentClusteringModel:
     
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
         self.feature_names = [
             'total_xp',
             'level',
@@ -41,6 +240,7 @@ class StudentClusteringModel:
             'days_inactive',
             'account_age_days'
         ]
+        self.pipeline = FeaturePipeline(self.feature_names)
         self.segment_labels = {
             0: "Casual",
             1: "Engaged",
@@ -49,127 +249,311 @@ class StudentClusteringModel:
             4: "Inactive"
         }
     
-    def prepare_features(self, df: pd.DataFrame) -> np.ndarray:
+    def prepare_features(self, df: pd.DataFrame, fit: bool = False) -> np.ndarray:
         """Prepare and scale features for clustering"""
-        # Fill missing values
-        df = df.fillna(0)
-        
-        # Select features
-        X = df[self.feature_names].values
-        
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        return X_scaled
+        # Only fit the scaling statistics at training time
+        if fit:
+            return self.pipeline.fit_transform(df)
+        return self.pipeline.transform(df)
     
     def train(self, df: pd.DataFrame) -> Dict:
         """
         Train clustering model
         
+        When a model is already loaded, the new clusters are renumbered to
+        match its centroids, so cluster ids (and cached cluster names)
+        keep their meaning across retrains.
+        
         Args:
             df: Training data with user features
             
         Returns:
             Training metrics
         """
-        logger.info("Training clustering model...")
+        logger.info(f"Training clustering model ({settings.clustering_mode})...")
+        previous = self._raw_centers()
         
         # Prepare features
-        X = self.prepare_features(df)
+        X = self.prepare_features(df, fit=True)
         
         # Train K-Means
-        self.model = KMeans(
-            n_clusters=settings.clustering_n_clusters,
-            random_state=42,
-            n_init=10,
-            max_iter=300
-        )
-        
+        self.model = make_estimator()
         labels = self.model.fit_predict(X)
+        relabelled = self._match_centers(previous)
+        if relabelled is not None:
+            labels = relabelled[labels]
         
         # Calculate quality metrics
-        silhouette = silhouette_score(X, labels)
+        silhouette = silhouette_estimate(X, labels, settings.clustering_silhouette_sample)
         inertia = self.model.inertia_
         
         # Analyze clusters
         df['cluster'] = labels
-        cluster_stats = self._analyze_clusters(df)
+        tally = ClusterTally(self.model.cluster_centers_)
+        tally.add(X, labels, df)
+        if settings.clustering_extra_metrics:
+            tally.add_spread(X, labels)
         
-        logger.info(f"Clustering complete. Silhouette score: {silhouette:.3f}")
+        logger.info(
+            f"Clustering complete. Silhouette score: {silhouette['score']:.3f} "
+            f"(95% CI {silhouette['ci_low']:.3f}-{silhouette['ci_high']:.3f}, n={silhouette['sample_size']})"
+        )
         
         return {
-            'silhouette_score': float(silhouette),
+            **self._quality_metrics(silhouette, tally),
             'inertia': float(inertia),
             'n_clusters': settings.clustering_n_clusters,
-            'cluster_stats': cluster_stats
+            'mode': settings.clustering_mode,
+            'matched_previous': relabelled is not None,
+            'cluster_stats': self._stats_table(tally)
         }
     
-    def predict(self, user_features: Dict) -> Dict:
+    def train_stream(self, chunks: Callable[[], Iterable[pd.DataFrame]]) -> Dict:
         """
-        Predict cluster for a single user
+        Train a MiniBatchKMeans model over a table that is never fully in memory
+        
+        The first pass over the chunks fits the scaling statistics and draws
+        a uniform sample that MiniBatchKMeans is initialised on, the next
+        ``clustering_stream_epochs`` passes feed shuffled mini-batches to
+        partial_fit and a last pass computes inertia, cluster statistics and
+        the silhouette of a random sample (with ``clustering_extra_metrics``,
+        one more pass measures the spread for Davies-Bouldin). Cluster ids
+        are matched to a loaded model as in train().
         
         Args:
-            user_features: Dictionary with user feature values
-            
+            chunks: Returns a fresh iterator over the training data, e.g.
+                feature_store.iter_training_data
+                
         Returns:
-            Cluster prediction with confidence
+            Training metrics, as from train()
+            
+        Raises:
+            ValueError: If the chunks hold no rows
         """
-        if not self.model:
-            raise ValueError("Model not trained. Call train() first.")
+        logger.info("Training clustering model (streamed minibatch)...")
+        previous = self._raw_centers()
+        batch_size = settings.clustering_batch_size
         
-        # Prepare features
-        feature_values = [user_features.get(f, 0) for f in self.feature_names]
-        X = np.array(feature_values).reshape(1, -1)
-        X_scaled = self.scaler.transform(X)
+        rng = np.random.default_rng(42)
+        
+        # Scaling pass, also drawing a uniform sample (smallest random keys) to initialise on
+        init_size = 3 * batch_size
+        sample = np.empty((0, len(self.feature_names)), dtype=np.float32)
+        keys = np.empty(0)
+        self.pipeline = FeaturePipeline(self.feature_names)
+        for chunk in chunks():
+            self.pipeline.partial_fit(chunk)
+            sample = np.concatenate([sample, self.pipeline.build(chunk)])
+            keys = np.concatenate([keys, rng.random(len(chunk))])
+            if len(keys) > init_size:
+                kept = np.argpartition(keys, init_size)[:init_size]
+                sample, keys = sample[kept], keys[kept]
+        n_samples = self.pipeline.n_samples_seen
+        if n_samples == 0:
+            raise ValueError("No training data")
         
-        # Predict cluster
-        cluster = self.model.predict(X_scaled)[0]
+        self.model = make_estimator("minibatch").fit(self.pipeline.scale(sample))
+        for _ in range(settings.clustering_stream_epochs):
+            for chunk in chunks():
+                # Extracts come out in storage order, which may group similar students
+                X = self.prepare_features(chunk)[rng.permutation(len(chunk))]
+                for start in range(0, len(X), batch_size):
+                    self.model.partial_fit(X[start:start + batch_size])
+        relabelled = self._match_centers(previous)
         
-        # Calculate distance to cluster center (confidence)
-        distances = self.model.transform(X_scaled)[0]
-        confidence = 1 - (distances[cluster] / np.sum(distances))
+        # Last pass: metrics from running sums, silhouette from a uniform sample
+        rng = np.random.default_rng(42)
+        keep = min(1.0, 2 * settings.clustering_silhouette_sample / n_samples)
+        tally = ClusterTally(self.model.cluster_centers_)
+        sample_X, sample_labels = [], []
+        
+        for chunk in chunks():
+            X = self.prepare_features(chunk)
+            labels = self.model.predict(X)
+            tally.add(X, labels, chunk)
+            
+            picked = rng.random(len(X)) < keep
+            sample_X.append(X[picked])
+            sample_labels.append(labels[picked])
+        
+        if settings.clustering_extra_metrics:
+            # Davies-Bouldin needs distances to the cluster means known only now
+            for chunk in chunks():
+                X = self.prepare_features(chunk)
+                tally.add_spread(X, self.model.predict(X))
+        
+        silhouette = silhouette_estimate(
+            np.concatenate(sample_X),
+            np.concatenate(sample_labels),
+            settings.clustering_silhouette_sample,
+            population=tally.counts
+        )
+        
+        logger.info(
+            f"Clustering complete. Silhouette score: {silhouette['score']:.3f} "
+            f"(95% CI {silhouette['ci_low']:.3f}-{silhouette['ci_high']:.3f}, n={silhouette['sample_size']})"
+        )
         
         return {
-            'cluster_id': int(cluster),
-            'cluster_name': self.segment_labels.get(cluster, f"Cluster {cluster}"),
-            'confidence': float(confidence),
-            'characteristics': self._get_cluster_characteristics(cluster)
+            **self._quality_metrics(silhouette, tally),
+            'inertia': tally.inertia,
+            'n_clusters': settings.clustering_n_clusters,
+            'mode': 'stream',
+            'n_samples': n_samples,
+            'matched_previous': relabelled is not None,
+            'cluster_stats': self._stats_table(tally)
         }
     
-    def predict_batch(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Predict clusters for multiple users"""
-        if not self.model:
-            raise ValueError("Model not trained. Call train() first.")
+    def _quality_metrics(self, silhouette: Dict, tally: ClusterTally) -> Dict:
+        metrics = {
+            'silhouette_score': silhouette['score'],
+            'silhouette_ci': [silhouette['ci_low'], silhouette['ci_high']],
+            'silhouette_sample_size': silhouette['sample_size']
+        }
+        if settings.clustering_extra_metrics:
+            metrics['davies_bouldin'] = tally.davies_bouldin()
+            metrics['calinski_harabasz'] = tally.calinski_harabasz()
+        return metrics
+    
+    def partial_fit(self, df: pd.DataFrame) -> Dict:
+        """
+        Fold new or changed students into the current centroids
+        
+        Scaling statistics and cluster ids stay as they are; only the
+        centroids move, weighted by how many students they already hold.
+        
+        Args:
+            df: Features of the new data
+            
+        Returns:
+            Number of rows and the largest centroid shift (in scaled units)
+            
+        Raises:
+            ValueError: If the model was not trained in minibatch mode
+        """
+        if not isinstance(self.model, MiniBatchKMeans):
+            raise ValueError("partial_fit needs a model trained with clustering_mode='minibatch'")
         
         X = self.prepare_features(df)
-        clusters = self.model.predict(X)
+        before = self.model.cluster_centers_.copy()
+        batch_size = settings.clustering_batch_size
         
-        df['cluster'] = clusters
-        df['cluster_name'] = df['cluster'].map(self.segment_labels)
+        # Reassigning small clusters to random points would change what an id means
+        reassignment_ratio = self.model.reassignment_ratio
+        self.model.set_params(reassignment_ratio=0.0)
+        try:
+            for start in range(0, len(X), batch_size):
+                self.model.partial_fit(X[start:start + batch_size])
+        finally:
+            self.model.set_params(reassignment_ratio=reassignment_ratio)
         
-        return df
+        shift = np.linalg.norm(self.model.cluster_centers_ - before, axis=1).max() if len(X) else 0.0
+        return {'n_samples': len(X), 'max_centroid_shift': float(shift)}
     
-    def _analyze_clusters(self, df: pd.DataFrame) -> Dict:
-        """Analyze characteristics of each cluster"""
-        stats = {}
+    def _raw_centers(self) -> Optional[np.ndarray]:
+        """Centroids of the current model in unscaled feature units"""
+        if self.model is None or not self.pipeline.fitted:
+            return None
+        return self.model.cluster_centers_ * self.pipeline.scale_ + self.pipeline.mean_
+    
+    def _match_centers(self, previous: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Renumber the freshly fitted clusters after the closest previous centroids
+        
+        Solves the assignment problem (Hungarian algorithm) on squared
+        distances in the new scaled space and permutes the centroids in
+        place.
+        
+        Returns:
+            Map from fitted cluster index to its new id, or None when there
+            is nothing to match against
+        """
+        centers = self.model.cluster_centers_
+        if previous is None or previous.shape != centers.shape:
+            return None
+        
+        old = (previous - self.pipeline.mean_) / self.pipeline.scale_
+        cost = ((old[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        _, order = linear_sum_assignment(cost)
+        
+        # New id i takes the fitted cluster closest to old centroid i
+        self.model.cluster_centers_ = centers[order]
+        if hasattr(self.model, '_counts'):
+            # MiniBatchKMeans weights partial_fit updates by these per-cluster counts
+            self.model._counts = self.model._counts[order]
         
-        for cluster_id in range(settings.clustering_n_clusters):
-            cluster_df = df[df['cluster'] == cluster_id]
+        relabel = np.empty_like(order)
+        relabel[order] = np.arange(len(order))
+        if hasattr(self.model, 'labels_'):
+            self.model.labels_ = relabel[self.model.labels_]
+        return relabel
+    
+    def predict(self, user_features: Dict) -> Dict:
+        """
+        Predict cluster for a single user
+        
+        Args:
+            user_features: Dictionary with user feature values
             
-            if len(cluster_df) == 0:
-                continue
+        Returns:
+            Cluster prediction with confidence
+        """
+        return self.predict_records(user_features)[0]
+    
+    def predict_records(self, data: Any) -> List[Dict]:
+        """
+        Predict clusters for one or many users
+        
+        Args:
+            data: FeatureFrame, DataFrame, dict of columns or single-row dict
             
-            stats[cluster_id] = {
-                'name': self.segment_labels.get(cluster_id, f"Cluster {cluster_id}"),
-                'count': len(cluster_df),
-                'avg_xp': float(cluster_df['total_xp'].mean()),
-                'avg_level': float(cluster_df['level'].mean()),
-                'avg_quests': float(cluster_df['quests_completed'].mean()),
-                'avg_active_days': float(cluster_df['active_days'].mean()),
-                'characteristics': self._get_cluster_characteristics(cluster_id)
-            }
+        Returns:
+            One prediction dict per row, as returned by predict()
+        """
+        if not self.model:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        # Prepare features
+        X_scaled = self.pipeline.transform(data)
+        
+        # Distances to all centers give both the cluster and the confidence
+        with stage("inference"):
+            distances = self.model.transform(X_scaled)
+        clusters = distances.argmin(axis=1)
+        nearest = distances[np.arange(len(clusters)), clusters]
+        confidences = 1 - nearest / distances.sum(axis=1)
         
-        return stats
+        return [
+            {
+                'cluster_id': int(cluster),
+                'cluster_name': self.segment_labels.get(cluster, f"Cluster {cluster}"),
+                'confidence': float(confidence),
+                'characteristics': self._get_cluster_characteristics(cluster)
+            }
+            for cluster, confidence in zip(clusters, confidences)
+        ]
+    
+    def _stats_table(self, tally: ClusterTally) -> Dict:
+        """Characteristics of each non-empty cluster"""
+        means = tally.column_means()
+        return {
+            int(cluster_id): self._cluster_summary(
+                int(cluster_id),
+                int(tally.counts[cluster_id]),
+                {column: float(values[i]) for column, values in means.items()}
+            )
+            for i, cluster_id in enumerate(tally.nonempty)
+        }
+    
+    def _cluster_summary(self, cluster_id: int, count: int, means: Dict[str, float]) -> Dict:
+        summary = {
+            'name': self.segment_labels.get(cluster_id, f"Cluster {cluster_id}"),
+            'count': count
+        }
+        for key, column in STAT_COLUMNS.items():
+            summary[key] = means[column]
+        summary['characteristics'] = self._get_cluster_characteristics(cluster_id)
+        return summary
     
     def _get_cluster_characteristics(self, cluster_id: int) -> List[str]:
         """Get human-readable characteristics for a cluster"""
@@ -184,7 +568,7 @@ class StudentClusteringModel:
         return characteristics_map.get(cluster_id, ["Unknown pattern"])
     
     def save(self, path: str = None):
-        """Save model and scaler to disk"""
+        """Save model and feature pipeline to disk"""
         if not path:
             path = Path(settings.model_path) / "clustering"
         else:
@@ -193,18 +577,29 @@ class StudentClusteringModel:
         path.mkdir(parents=True, exist_ok=True)
         
         joblib.dump(self.model, path / "model.pkl")
-        joblib.dump(self.scaler, path / "scaler.pkl")
+        joblib.dump(self.pipeline, path / "pipeline.pkl")
         
         logger.info(f"Model saved to {path}")
     
     def load(self, path: str = None):
-        """Load model and scaler from disk"""
+        """Load model and feature pipeline from disk"""
         if not path:
             path = Path(settings.model_path) / "clustering"
         else:
             path = Path(path)
         
         self.model = joblib.load(path / "model.pkl")
-        self.scaler = joblib.load(path / "scaler.pkl")
+        
+        if (path / "pipeline.pkl").exists():
+            self.pipeline = joblib.load(path / "pipeline.pkl")
+        else:
+            # Artifacts saved before the shared pipeline only have a scaler
+            self.pipeline = FeaturePipeline.from_scaler(
+                self.feature_names,
+                joblib.load(path / "scaler.pkl")
+            )
+        
+        # The pipeline emits float32; older models were fitted on float64
+        self.model.cluster_centers_ = self.model.cluster_centers_.astype(np.float32)
         
         logger.info(f"Model loaded from {path}")
@@ -0,0 +1,272 @@
+"""Shared feature pipeline used by all user-level models"""
+import numpy as np
+import pandas as pd
+from typing import Any, List, Optional
+from app.utils.timing import stage
+
+
+# Raw per-user columns accepted from callers and the feature store
+RAW_FEATURES = [
+    'total_xp',
+    'level',
+    'money',
+    'reputation',
+    'quests_completed',
+    'achievements_unlocked',
+    'recent_xp_gained',
+    'active_days',
+    'items_owned',
+    'trades_made',
+    'events_participated',
+    'days_inactive',
+    'account_age_days'
+]
+
+# Derived ratio features: numerator / (denominator + 1)
+DERIVED_FEATURES = {
+    'xp_per_day': ('recent_xp_gained', 'active_days'),
+    'quests_per_day': ('quests_completed', 'account_age_days'),
+    'money_earned_rate': ('money', 'account_age_days'),
+    'achievement_rate': ('achievements_unlocked', 'account_age_days'),
+    'trade_frequency': ('trades_made', 'account_age_days'),
+    'activity_variance': ('recent_xp_gained', 'total_xp'),
+    'session_length_avg': ('total_xp', 'active_days')
+}
+
+
+class FeatureFrame:
+    """
+    Per-request columnar feature store shared by all models
+    
+    Raw columns are validated (NaN and infinities set to 0) and derived
+    columns computed exactly once. Every column is a contiguous row of one
+    float32 buffer, so models read zero-copy views instead of re-extracting
+    their inputs.
+    """
+    
+    def __init__(self, data: Any):
+        n_rows = n_rows_of(data)
+        names = RAW_FEATURES + list(DERIVED_FEATURES)
+        self.n_rows = n_rows
+        self._index = {name: i for i, name in enumerate(names)}
+        self._buffer = np.empty((len(names), n_rows), dtype=np.float32)
+        
+        for name in RAW_FEATURES:
+            self._buffer[self._index[name]] = get_column(data, name, n_rows)
+        np.nan_to_num(self._buffer[:len(RAW_FEATURES)], copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        for name, (numerator, denominator) in DERIVED_FEATURES.items():
+            out = self._buffer[self._index[name]]
+            np.add(self.column(denominator), 1, out=out)
+            np.divide(self.column(numerator), out, out=out)
+        np.nan_to_num(self._buffer[len(RAW_FEATURES):], copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    
+    @classmethod
+    def from_rows(cls, rows: List[Any]) -> "FeatureFrame":
+        """Build a frame from a list of dicts or pydantic models"""
+        n_rows = len(rows)
+        if rows and isinstance(rows[0], dict):
+            read = lambda name: (row.get(name, 0) for row in rows)
+        else:
+            read = lambda name: (getattr(row, name, 0) for row in rows)
+        
+        return cls({
+            name: np.fromiter(read(name), dtype=np.float32, count=n_rows)
+            for name in RAW_FEATURES
+        })
+    
+    def __len__(self) -> int:
+        return self.n_rows
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+    
+    def column(self, name: str) -> np.ndarray:
+        """Zero-copy view of one column"""
+        return self._buffer[self._index[name]]
+    
+    @property
+    def buffer(self) -> np.ndarray:
+        """The underlying (n_columns, n_rows) float32 buffer"""
+        return self._buffer
+    
+    @classmethod
+    def wrap(cls, buffer: np.ndarray) -> "FeatureFrame":
+        """Zero-copy frame over a buffer laid out like ``buffer``"""
+        frame = object.__new__(cls)
+        frame._index = {name: i for i, name in enumerate(RAW_FEATURES + list(DERIVED_FEATURES))}
+        frame._buffer = buffer
+        frame.n_rows = buffer.shape[1]
+        return frame
+    
+    def slice(self, start: int, stop: int) -> "FeatureFrame":
+        """Zero-copy frame over rows [start, stop)"""
+        return FeatureFrame.wrap(self._buffer[:, start:stop])
+
+
+def raw_column(data: Any, name: str, n_rows: int) -> np.ndarray:
+    """One raw column as a new float32 array, NaN and infinities set to 0 as in FeatureFrame"""
+    column = np.array(get_column(data, name, n_rows), dtype=np.float32)
+    return np.nan_to_num(column, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def get_column(data: Any, name: str, n_rows: int) -> np.ndarray:
+    """
+    Read one raw column from any supported input
+    
+    Accepts a FeatureFrame, a DataFrame, a structured NumPy array, a dict of
+    columns or a dict of scalars (a single row). Missing columns read as
+    zeros.
+    """
+    if isinstance(data, FeatureFrame):
+        if name not in data:
+            return np.zeros(n_rows, dtype=np.float32)
+        return data.column(name)
+    
+    if isinstance(data, pd.DataFrame):
+        if name not in data.columns:
+            return np.zeros(n_rows, dtype=np.float32)
+        return data[name].to_numpy()
+    
+    if isinstance(data, np.ndarray):
+        if name not in (data.dtype.names or ()):
+            return np.zeros(n_rows, dtype=np.float32)
+        return data[name]
+    
+    value = data.get(name)
+    if value is None:
+        return np.zeros(n_rows, dtype=np.float32)
+    return np.asarray(value).reshape(-1)
+
+
+def n_rows_of(data: Any) -> int:
+    """Number of rows in a supported input"""
+    if isinstance(data, (FeatureFrame, pd.DataFrame, np.ndarray)):
+        return len(data)
+    
+    for value in data.values():
+        if isinstance(value, (list, tuple, np.ndarray, pd.Series)):
+            return len(value)
+    return 1
+
+
+class FeaturePipeline:
+    """
+    Fitted feature transform shared by training and inference
+    
+    Builds the model's feature columns (raw or derived) straight into a
+    preallocated float32 matrix and standardises it in place. The same code
+    path serves one row or a whole cohort, and scaling statistics are only
+    ever set by ``fit``.
+    """
+    
+    def __init__(self, feature_names: List[str]):
+        self.feature_names = list(feature_names)
+        self.mean_ = None
+        self.scale_ = None
+        self._moments = None
+    
+    @classmethod
+    def from_scaler(cls, feature_names: List[str], scaler) -> "FeaturePipeline":
+        """Wrap a fitted StandardScaler from an older artifact"""
+        pipeline = cls(feature_names)
+        pipeline.mean_ = scaler.mean_.astype(np.float32)
+        pipeline.scale_ = scaler.scale_.astype(np.float32)
+        return pipeline
+    
+    @property
+    def fitted(self) -> bool:
+        return self.mean_ is not None
+    
+    def build(self, data: Any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Assemble the unscaled feature matrix
+        
+        Args:
+            data: DataFrame, structured array, dict of columns or single-row dict
+            out: Optional float32 (n_rows, n_features) buffer to fill
+            
+        Returns:
+            float32 matrix with NaN and infinities replaced by 0
+        """
+        n_rows = n_rows_of(data)
+        if out is None:
+            out = np.empty((n_rows, len(self.feature_names)), dtype=np.float32)
+        
+        # A FeatureFrame already holds validated raw and derived columns
+        shared = isinstance(data, FeatureFrame)
+        
+        for j, name in enumerate(self.feature_names):
+            if name in DERIVED_FEATURES and not shared:
+                # Same order as FeatureFrame: clean the raw inputs, then divide
+                numerator, denominator = DERIVED_FEATURES[name]
+                den = raw_column(data, denominator, n_rows)
+                den += 1
+                np.divide(raw_column(data, numerator, n_rows), den, out=out[:, j])
+            elif shared:
+                out[:, j] = data.column(name)
+            else:
+                out[:, j] = raw_column(data, name, n_rows)
+        
+        if not shared:
+            np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return out
+    
+    def scale(self, X: np.ndarray) -> np.ndarray:
+        """Standardise a built matrix in place"""
+        if not self.fitted:
+            raise ValueError("Feature pipeline not fitted. Call fit() first.")
+        
+        X -= self.mean_
+        X /= self.scale_
+        return X
+    
+    def fit(self, data: Any) -> "FeaturePipeline":
+        """Learn scaling statistics from training data"""
+        self._moments = None
+        return self.partial_fit(data)
+    
+    def partial_fit(self, data: Any) -> "FeaturePipeline":
+        """
+        Update scaling statistics with another chunk of training data
+        
+        Chunk means and variances are merged exactly (Chan et al.), so a
+        table streamed chunk by chunk gets the same statistics as one fit().
+        """
+        X = self.build(data).astype(np.float64)
+        if len(X) == 0:
+            return self
+        
+        n, mean = len(X), X.mean(axis=0)
+        m2 = ((X - mean) ** 2).sum(axis=0)
+        
+        # Pipelines unpickled from older artifacts have no moments to merge into
+        previous = getattr(self, '_moments', None)
+        if previous is not None:
+            n_prev, mean_prev, m2_prev = previous
+            total = n_prev + n
+            delta = mean - mean_prev
+            mean = mean_prev + delta * n / total
+            m2 = m2_prev + m2 + delta ** 2 * n_prev * n / total
+            n = total
+        self._moments = (n, mean, m2)
+        
+        scale = np.sqrt(m2 / n)
+        scale[scale == 0] = 1.0
+        
+        self.mean_ = mean.astype(np.float32)
+        self.scale_ = scale.astype(np.float32)
+        return self
+    
+    @property
+    def n_samples_seen(self) -> int:
+        moments = getattr(self, '_moments', None)
+        return moments[0] if moments is not None else 0
+    
+    def transform(self, data: Any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Build and scale the feature matrix; never refits"""
+        with stage("features"):
+            return self.scale(self.build(data, out))
+    
+    def fit_transform(self, data: Any) -> np.ndarray:
+        return self.fit(data).transform(data)
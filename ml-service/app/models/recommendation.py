@@ -8,6 +8,7 @@ import logging
 from pathlib import Path
 from typing import Dict, List
 from app.config import settings
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,12 @@ class QuestRecommendationModel:
         self.scaler = MinMaxScaler()
         self.user_ids = None
         self.quest_ids = None
+        self._user_index = None
+        self._quest_similarity_cache = None
+        # Dense ratings, their nonzero mask (as 0/1 floats) and popularity scores, set by _prepare_ratings
+        self._ratings = None
+        self._rated = None
+        self._popularity = None
     
     def train(self, interactions_df: pd.DataFrame, quest_df: pd.DataFrame) -> Dict:
         """
@@ -49,6 +56,9 @@ class QuestRecommendationModel:
         
         self.user_ids = self.user_quest_matrix.index.tolist()
         self.quest_ids = self.user_quest_matrix.columns.tolist()
+        self._user_index = None
+        self._quest_similarity_cache = None
+        self._prepare_ratings()
         
         # Calculate user similarity matrix
         self.user_similarity_matrix = cosine_similarity(self.user_quest_matrix)
@@ -68,6 +78,18 @@ class QuestRecommendationModel:
             'avg_interactions_per_user': float((self.user_quest_matrix > 0).sum(axis=1).mean())
         }
     
+    def _prepare_ratings(self):
+        """Derive the per-request inputs of the scorers from user_quest_matrix once"""
+        self._ratings = self.user_quest_matrix.to_numpy(dtype=float)
+        self._rated = (self._ratings > 0).astype(float)
+        
+        quest_popularity = self._ratings.sum(axis=0)
+        max_popularity = quest_popularity.max() if quest_popularity.size else 0
+        if max_popularity > 0:
+            self._popularity = quest_popularity / max_popularity
+        else:
+            self._popularity = np.zeros(len(self.quest_ids))
+    
     def _prepare_quest_features(self, quest_df: pd.DataFrame):
         """Prepare quest features for content-based filtering"""
         # One-hot encode categorical features
@@ -105,131 +127,129 @@ class QuestRecommendationModel:
         Returns:
             List of recommended quests with scores
         """
-        if n_recommendations is None:
-            n_recommendations = settings.recommendation_top_n
-        
-        if exclude_completed is None:
-            exclude_completed = []
-        
-        # Get collaborative filtering scores
-        cf_scores = self._collaborative_filtering_scores(user_id)
-        
-        # Get content-based scores
-        cb_scores = self._content_based_scores(user_id)
+        return self.recommend_many([user_id], n_recommendations, exclude_completed)[0]
+    
+    def recommend_many(
+        self,
+        user_ids: List[str],
+        n_recommendations: int = None,
+        exclude_completed: List[str] = None
+    ) -> List[List[Dict]]:
+        """
+        Generate quest recommendations for many users at once
         
-        # Combine scores (hybrid approach)
-        hybrid_scores = 0.7 * cf_scores + 0.3 * cb_scores
+        Hybrid scores for all users are computed as matrix products over the
+        user-quest matrix rather than per-quest loops.
         
-        # Filter out completed quests
-        for quest_id in exclude_completed:
-            if quest_id in hybrid_scores:
-                hybrid_scores[quest_id] = 0
+        Args:
+            user_ids: Users to generate recommendations for
+            n_recommendations: Number of recommendations (default from settings)
+            exclude_completed: Quest IDs to exclude for every user
+            
+        Returns:
+            One list of recommended quests per user
+        """
+        if n_recommendations is None:
+            n_recommendations = settings.recommendation_top_n
         
-        # Get top N recommendations
-        top_quests = sorted(
-            hybrid_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:n_recommendations]
+        with stage("inference"):
+            # Combine scores (hybrid approach)
+            hybrid_scores = (
+                0.7 * self._collaborative_filtering_scores(user_ids)
+                + 0.3 * self._content_based_scores(user_ids)
+            )
+            
+            # Filter out completed quests
+            if exclude_completed:
+                quest_index = {quest_id: j for j, quest_id in enumerate(self.quest_ids)}
+                excluded = [quest_index[q] for q in exclude_completed if q in quest_index]
+                hybrid_scores[:, excluded] = 0
+            
+            # Stable sort keeps quest order for ties
+            top_quests = np.argsort(-hybrid_scores, axis=1, kind='stable')[:, :n_recommendations]
         
         recommendations = []
-        for quest_id, score in top_quests:
-            if score > 0:
-                recommendations.append({
-                    'quest_id': quest_id,
-                    'score': float(score),
-                    'reason': self._get_recommendation_reason(score)
-                })
+        with stage("reasons"):
+            for scores, top in zip(hybrid_scores, top_quests):
+                recommendations.append([
+                    {
+                        'quest_id': self.quest_ids[j],
+                        'score': float(scores[j]),
+                        'reason': self._get_recommendation_reason(scores[j])
+                    }
+                    for j in top if scores[j] > 0
+                ])
         
         return recommendations
     
-    def _collaborative_filtering_scores(self, user_id: str) -> Dict[str, float]:
-        """Calculate scores using collaborative filtering"""
-        if user_id not in self.user_ids:
-            # New user - return popularity-based scores
-            return self._popularity_scores()
-        
-        user_idx = self.user_ids.index(user_id)
+    def _user_rows(self, user_ids: List[str]):
+        """Matrix rows of known users and a mask of which users are known"""
+        if self._user_index is None:
+            self._user_index = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        
+        rows = np.array([self._user_index.get(user_id, -1) for user_id in user_ids], dtype=int)
+        known = rows >= 0
+        return rows[known], known
+    
+    def _collaborative_filtering_scores(self, user_ids: List[str]) -> np.ndarray:
+        """Calculate scores using collaborative filtering, one row per user"""
+        rows, known = self._user_rows(user_ids)
         
-        # Get similar users
-        user_similarities = self.user_similarity_matrix[user_idx]
+        # New users - popularity-based scores
+        scores = np.tile(self._popularity, (len(user_ids), 1))
         
-        # Calculate weighted scores
-        scores = {}
-        for quest_id in self.quest_ids:
-            quest_idx = self.quest_ids.index(quest_id)
-            
-            # Skip if user already interacted with this quest
-            if self.user_quest_matrix.iloc[user_idx, quest_idx] > 0:
-                scores[quest_id] = 0
-                continue
-            
+        if rows.size:
             # Weighted sum of similar users' ratings
-            ratings = self.user_quest_matrix.iloc[:, quest_idx].values
-            weighted_sum = np.sum(user_similarities * ratings)
-            similarity_sum = np.sum(user_similarities[ratings > 0])
+            similarities = self.user_similarity_matrix[rows]
+            weighted_sum = similarities @ self._ratings
+            similarity_sum = similarities @ self._rated
             
-            if similarity_sum > 0:
-                scores[quest_id] = weighted_sum / similarity_sum
-            else:
-                scores[quest_id] = 0
+            cf_scores = np.divide(
+                weighted_sum, similarity_sum,
+                out=np.zeros_like(weighted_sum),
+                where=similarity_sum > 0
+            )
+            
+            # Skip quests the user already interacted with
+            cf_scores[self._rated[rows] > 0] = 0
+            scores[known] = cf_scores
         
         return scores
     
-    def _content_based_scores(self, user_id: str) -> Dict[str, float]:
-        """Calculate scores using content-based filtering"""
-        scores = {}
-        
-        if user_id not in self.user_ids:
-            # New user - return average scores
-            for quest_id in self.quest_ids:
-                scores[quest_id] = 0.5
-            return scores
+    def _content_based_scores(self, user_ids: List[str]) -> np.ndarray:
+        """Calculate scores using content-based filtering, one row per user"""
+        # New users and users without strong preferences get neutral scores
+        scores = np.full((len(user_ids), len(self.quest_ids)), 0.5)
+        rows, known = self._user_rows(user_ids)
         
-        user_idx = self.user_ids.index(user_id)
+        if not rows.size:
+            return scores
         
-        # Get user's quest preferences
-        user_ratings = self.user_quest_matrix.iloc[user_idx]
-        liked_quests = user_ratings[user_ratings > 0.7].index.tolist()
+        liked = self._ratings[rows] > 0.7
+        has_liked = liked.any(axis=1)
         
-        if not liked_quests:
-            # No strong preferences - return neutral scores
-            for quest_id in self.quest_ids:
-                scores[quest_id] = 0.5
-            return scores
+        # Mean similarity to the liked quests that have features
+        quest_similarity, has_features = self._quest_similarity()
+        liked &= has_features
+        n_liked = liked.sum(axis=1, keepdims=True)
         
-        # Calculate similarity to liked quests
-        for quest_id in self.quest_ids:
-            if quest_id not in self.quest_features.index:
-                scores[quest_id] = 0
-                continue
-            
-            similarities = []
-            for liked_quest in liked_quests:
-                if liked_quest in self.quest_features.index:
-                    sim = cosine_similarity(
-                        self.quest_features.loc[[quest_id]],
-                        self.quest_features.loc[[liked_quest]]
-                    )[0][0]
-                    similarities.append(sim)
-            
-            scores[quest_id] = np.mean(similarities) if similarities else 0
+        cb_scores = np.divide(
+            liked @ quest_similarity, n_liked,
+            out=np.zeros((len(rows), len(self.quest_ids))),
+            where=n_liked > 0
+        )
+        cb_scores[:, ~has_features] = 0
         
+        scores[np.flatnonzero(known)[has_liked]] = cb_scores[has_liked]
         return scores
     
-    def _popularity_scores(self) -> Dict[str, float]:
-        """Calculate popularity-based scores for new users"""
-        quest_popularity = self.user_quest_matrix.sum(axis=0)
-        max_popularity = quest_popularity.max()
-        
-        scores = {}
-        for quest_id in self.quest_ids:
-            if max_popularity > 0:
-                scores[quest_id] = quest_popularity[quest_id] / max_popularity
-            else:
-                scores[quest_id] = 0
-        
-        return scores
+    def _quest_similarity(self):
+        """Cosine similarity between quests in quest_ids order, and which quests have features"""
+        if self._quest_similarity_cache is None:
+            has_features = np.array([q in self.quest_features.index for q in self.quest_ids])
+            features = self.quest_features.reindex(self.quest_ids).fillna(0).to_numpy(dtype=float)
+            self._quest_similarity_cache = (cosine_similarity(features), has_features)
+        return self._quest_similarity_cache
     
     def _get_recommendation_reason(self, score: float) -> str:
         """Generate explanation for recommendation"""
@@ -277,5 +297,8 @@ class QuestRecommendationModel:
         self.scaler = data['scaler']
         self.user_ids = data['user_ids']
         self.quest_ids = data['quest_ids']
+        self._user_index = None
+        self._quest_similarity_cache = None
+        self._prepare_ratings()
         
         logger.info(f"Model loaded from {path}")
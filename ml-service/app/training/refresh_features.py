@@ -0,0 +1,54 @@
+"""Refresh the incremental feature store (run on a schedule)"""
+import sys
+import argparse
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from app.utils.feature_store import feature_store
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def refresh_features(full: bool = False):
+    """
+    Fold new XPAudit rows into the feature store
+    
+    Args:
+        full: Recompute every user, not only those touched since the last refresh
+    """
+    logger.info(f"Refreshing feature store ({'full' if full else 'incremental'})...")
+    
+    try:
+        stats = feature_store.refresh(full)
+        
+        logger.info("Refresh statistics:")
+        logger.info(f"  Watermark: {stats['previous_watermark']} -> {stats['watermark']}")
+        logger.info(f"  Day buckets updated: {stats['buckets_updated']}")
+        logger.info(f"  Day buckets expired: {stats['buckets_expired']}")
+        if stats['touched_users'] is not None:
+            logger.info(f"  Touched users: {stats['touched_users']}")
+        logger.info(f"  Users: {stats['users']}")
+        logger.info(f"  Duration: {stats['duration_seconds']:.2f}s")
+        
+        return stats
+        
+    except Exception as e:
+        logger.error(f"Feature refresh failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the feature store")
+    parser.add_argument('--full', action='store_true',
+                        help="Recompute every user; catches deleted source rows and users")
+    args = parser.parse_args()
+    
+    refresh_features(args.full)
@@ -0,0 +1,72 @@
+"""Score every student and write predictions back to Postgres"""
+import sys
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import pandas as pd
+from app.config import settings
+from app.models.clustering import StudentClusteringModel
+from app.models.churn import ChurnPredictionModel
+from app.models.anomaly import AnomalyDetectionModel
+from app.utils.feature_store import load_training_data
+from app.utils.predictions import artifact_version, prediction_writer
+from app.utils.scoring import score_frame
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def score_all_students():
+    """Score all students with the saved models and store the results"""
+    logger.info("Starting batch scoring of all students...")
+    
+    try:
+        start = time.perf_counter()
+        
+        clustering_model = StudentClusteringModel()
+        churn_model = ChurnPredictionModel()
+        anomaly_model = AnomalyDetectionModel()
+        clustering_model.load()
+        churn_model.load()
+        anomaly_model.load()
+        
+        df = load_training_data()
+        
+        if df.empty:
+            logger.error("No student data available")
+            return
+        
+        chunk_size = settings.scoring_chunk_size
+        scores = pd.concat(
+            [
+                score_frame(df.iloc[i:i + chunk_size], clustering_model, churn_model, anomaly_model)
+                for i in range(0, len(df), chunk_size)
+            ],
+            ignore_index=True
+        )
+        
+        version = artifact_version()
+        written = prediction_writer.write(scores, version)
+        
+        logger.info("Scoring summary:")
+        logger.info(f"  Students scored: {len(scores)}")
+        logger.info(f"  Rows written: {written}")
+        logger.info(f"  Model version: {version}")
+        logger.info(f"  Duration: {time.perf_counter() - start:.2f}s")
+        logger.info("✓ Predictions written to ml_predictions")
+        
+    except Exception as e:
+        logger.error(f"Scoring failed: {e}", exc_info=True)
+        raise
+
+
+if __name__ == "__main__":
+    score_all_students()
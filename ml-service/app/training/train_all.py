@@ -10,6 +10,10 @@ from app.training.train_clustering import train_clustering_model
 from app.training.train_recommendation import train_recommendation_model
 from app.training.train_churn import train_churn_model
 from app.training.train_anomaly import train_anomaly_model
+from app.training.refresh_features import refresh_features
+from app.training.score_all import score_all_students
+from app.training.warm_cache import warm_caches
+from app.config import settings
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +38,12 @@ def train_all_models():
     
     results = {}
     
+    if settings.feature_store_enabled:
+        try:
+            refresh_features()
+        except Exception as e:
+            logger.warning(f"Feature store refresh failed, training from full extract: {e}")
+    
     for name, train_func in models:
         logger.info(f"\n{'=' * 80}")
         logger.info(f"Training {name} Model")
@@ -60,6 +70,20 @@ def train_all_models():
         logger.info("\n✓ ALL MODELS TRAINED SUCCESSFULLY!")
     else:
         logger.warning("\n✗ Some models failed to train. Check logs above.")
+    
+    # Refresh stored predictions for dashboards
+    if all_success and settings.prediction_writeback_enabled:
+        try:
+            score_all_students()
+        except Exception as e:
+            logger.error(f"Prediction write-back failed: {e}")
+    
+    # Replace stale cached predictions before students log in
+    if all_success and settings.cache_warm_enabled:
+        try:
+            warm_caches()
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 """Training script for anomaly detection model"""
 import sys
+import argparse
+from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
@@ -7,7 +9,8 @@ import logging
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.models.anomaly import AnomalyDetectionModel
-from app.utils.database import db
+from app.config import settings
+from app.utils.feature_store import feature_store, load_training_data
 
 # Configure logging
 logging.basicConfig(
@@ -17,14 +20,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def train_anomaly_model():
-    """Train and save anomaly detection model"""
+def train_anomaly_model(tune: bool = None):
+    """
+    Train and save anomaly detection model
+    
+    Args:
+        tune: Run the hyperparameter search first (default settings.tuning_enabled)
+    """
     logger.info("Starting anomaly detection model training...")
     
     try:
         # Load training data
         logger.info("Loading training data...")
-        df = db.get_training_data(days=90)
+        df = load_training_data()
         
         if df.empty:
             logger.error("No training data available")
@@ -34,7 +42,7 @@ def train_anomaly_model():
         
         # Initialize and train model
         model = AnomalyDetectionModel()
-        metrics = model.train(df)
+        metrics = model.train(df, tune=tune)
         
         # Log metrics
         logger.info("Training metrics:")
@@ -43,6 +51,12 @@ def train_anomaly_model():
         logger.info(f"  Anomaly rate: {metrics['anomaly_rate']:.2%}")
         logger.info(f"  Contamination parameter: {metrics['contamination']}")
         
+        if 'tuning' in metrics:
+            tuning = metrics['tuning']
+            logger.info(f"\nTuning ({tuning['n_fits']} fits in {tuning['wall_seconds']:.1f} s):")
+            for name, value in model.metadata['params'].items():
+                logger.info(f"  {name}: {value}")
+        
         # Save model
         model.save()
         logger.info("✓ Anomaly detection model trained and saved successfully")
@@ -52,5 +66,53 @@ def train_anomaly_model():
         raise
 
 
+def refresh_anomaly_model(days: int = None):
+    """
+    Refit the oldest trees of the saved model on recently active students
+    
+    Reads at most settings.anomaly_window_size students, so the cost does
+    not grow with the full history.
+    
+    Args:
+        days: Activity window (default settings.anomaly_window_days)
+    """
+    days = days or settings.anomaly_window_days
+    logger.info(f"Refreshing anomaly detection model on students active in the last {days} days...")
+    
+    try:
+        model = AnomalyDetectionModel()
+        model.load()
+        
+        df = feature_store.get_active_since(datetime.now() - timedelta(days=days), settings.anomaly_window_size)
+        if df.empty:
+            logger.info("No recently active students, model left as is")
+            return
+        
+        stats = model.refresh(df)
+        logger.info(f"  Window rows: {stats['n_samples']}")
+        logger.info(f"  Trees replaced: {stats['trees_replaced']}")
+        logger.info(f"  Offset: {stats['offset_before']:.4f} -> {stats['offset_after']:.4f}")
+        if stats['mean_score_shift'] is not None:
+            logger.info(f"  Mean score shift: {stats['mean_score_shift']:.4f}")
+        
+        model.save()
+        logger.info("✓ Anomaly detection model refreshed and saved successfully")
+        
+    except Exception as e:
+        logger.error(f"Refresh failed: {e}", exc_info=True)
+        raise
+
+
 if __name__ == "__main__":
-    train_anomaly_model()
+    parser = argparse.ArgumentParser(description="Train the anomaly detection model")
+    parser.add_argument('--tune', action='store_true', default=None,
+                        help="Search hyperparameters with successive halving before training")
+    parser.add_argument('--refresh', action='store_true',
+                        help="Replace the oldest trees of the saved model using recently active students")
+    parser.add_argument('--days', type=int, default=None, help="Activity window for --refresh")
+    args = parser.parse_args()
+    
+    if args.refresh:
+        refresh_anomaly_model(args.days)
+    else:
+        train_anomaly_model(args.tune)
@@ -1,5 +1,6 @@
 """Training script for churn prediction model"""
 import sys
+import argparse
 from pathlib import Path
 import logging
 
@@ -7,7 +8,7 @@ import logging
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.models.churn import ChurnPredictionModel
-from app.utils.database import db
+from app.utils.feature_store import load_training_data
 
 # Configure logging
 logging.basicConfig(
@@ -17,14 +18,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def train_churn_model():
-    """Train and save churn prediction model"""
+def train_churn_model(tune: bool = None):
+    """
+    Train and save churn prediction model
+    
+    Args:
+        tune: Run the hyperparameter search first (default settings.tuning_enabled)
+    """
     logger.info("Starting churn prediction model training...")
     
     try:
         # Load training data
         logger.info("Loading training data...")
-        df = db.get_training_data(days=90)
+        df = load_training_data()
         
         if df.empty:
             logger.error("No training data available")
@@ -34,14 +40,17 @@ def train_churn_model():
         
         # Initialize and train model
         model = ChurnPredictionModel()
-        metrics = model.train(df)
+        metrics = model.train(df, tune=tune)
         
         # Log metrics
-        logger.info("Training metrics:")
+        logger.info(f"Training metrics ({metrics['backend']}):")
         logger.info(f"  Accuracy: {metrics['accuracy']:.3f}")
         logger.info(f"  Precision: {metrics['precision']:.3f}")
         logger.info(f"  Recall: {metrics['recall']:.3f}")
         logger.info(f"  F1 Score: {metrics['f1_score']:.3f}")
+        logger.info(f"  ROC AUC: {metrics['roc_auc']:.3f}")
+        if 'n_iterations' in metrics:
+            logger.info(f"  Boosting iterations: {metrics['n_iterations']}")
         logger.info(f"  Churn rate: {metrics['churn_rate']:.2%}")
         logger.info(f"  Churned users: {metrics['n_churned']}")
         logger.info(f"  Active users: {metrics['n_active']}")
@@ -50,6 +59,12 @@ def train_churn_model():
         for feature, importance in list(metrics['feature_importance'].items())[:5]:
             logger.info(f"  {feature}: {importance:.3f}")
         
+        if 'tuning' in metrics:
+            tuning = metrics['tuning']
+            logger.info(f"\nTuning ({tuning['n_fits']} fits in {tuning['wall_seconds']:.1f} s):")
+            for name, value in model.metadata['params'].items():
+                logger.info(f"  {name}: {value}")
+        
         # Save model
         model.save()
         logger.info("✓ Churn prediction model trained and saved successfully")
@@ -60,4 +75,9 @@ def train_churn_model():
 
 
 if __name__ == "__main__":
-    train_churn_model()
+    parser = argparse.ArgumentParser(description="Train the churn prediction model")
+    parser.add_argument('--tune', action='store_true', default=None,
+                        help="Search hyperparameters with successive halving before training")
+    args = parser.parse_args()
+    
+    train_churn_model(args.tune)
@@ -1,13 +1,16 @@
 """Training script for clustering model"""
 import sys
+import argparse
+from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from app.config import settings
 from app.models.clustering import StudentClusteringModel
-from app.utils.database import db
+from app.utils.feature_store import feature_store, load_training_data
 
 # Configure logging
 logging.basicConfig(
@@ -17,30 +20,65 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def load_previous_model() -> StudentClusteringModel:
+    """The saved model, if any, so a retrain can keep its cluster ids"""
+    model = StudentClusteringModel()
+    
+    if (Path(settings.model_path) / "clustering").exists():
+        try:
+            model.load()
+        except Exception as e:
+            logger.warning(f"Previous clustering model unreadable ({e}), cluster ids may change")
+            model = StudentClusteringModel()
+    
+    return model
+
+
 def train_clustering_model():
     """Train and save clustering model"""
     logger.info("Starting clustering model training...")
     
     try:
-        # Load training data
-        logger.info("Loading training data...")
-        df = db.get_training_data(days=90)
-        
-        if df.empty:
-            logger.error("No training data available")
-            return
+        model = load_previous_model()
+        metrics = None
         
-        logger.info(f"Loaded {len(df)} user records")
+        # Minibatch mode streams the feature store instead of loading it whole
+        if settings.clustering_mode == "minibatch" and settings.feature_store_enabled:
+            try:
+                logger.info("Streaming training data from feature store...")
+                metrics = model.train_stream(feature_store.iter_training_data)
+                logger.info(f"Streamed {metrics['n_samples']} user records")
+            except Exception as e:
+                logger.warning(f"Streamed training unavailable ({e}), falling back to full extract")
+                model = load_previous_model()
         
-        # Initialize and train model
-        model = StudentClusteringModel()
-        metrics = model.train(df)
+        if metrics is None:
+            # Load training data
+            logger.info("Loading training data...")
+            df = load_training_data()
+            
+            if df.empty:
+                logger.error("No training data available")
+                return
+            
+            logger.info(f"Loaded {len(df)} user records")
+            
+            metrics = model.train(df)
         
         # Log metrics
         logger.info("Training metrics:")
-        logger.info(f"  Silhouette score: {metrics['silhouette_score']:.3f}")
+        logger.info(f"  Mode: {metrics['mode']}")
+        low, high = metrics['silhouette_ci']
+        logger.info(
+            f"  Silhouette score: {metrics['silhouette_score']:.3f} "
+            f"(95% CI {low:.3f}-{high:.3f}, sample {metrics['silhouette_sample_size']})"
+        )
+        if 'davies_bouldin' in metrics:
+            logger.info(f"  Davies-Bouldin: {metrics['davies_bouldin']:.3f}")
+            logger.info(f"  Calinski-Harabasz: {metrics['calinski_harabasz']:.1f}")
         logger.info(f"  Inertia: {metrics['inertia']:.2f}")
         logger.info(f"  Number of clusters: {metrics['n_clusters']}")
+        logger.info(f"  Cluster ids matched to previous model: {metrics['matched_previous']}")
         
         logger.info("\nCluster statistics:")
         for cluster_id, stats in metrics['cluster_stats'].items():
@@ -58,5 +96,43 @@ def train_clustering_model():
         raise
 
 
+def update_clustering_model(hours: float = 24):
+    """
+    Fold students whose features changed recently into the saved model
+    
+    Needs a model trained in minibatch mode; cluster ids do not change.
+    """
+    logger.info(f"Updating clustering model with changes from the last {hours:g}h...")
+    
+    try:
+        model = StudentClusteringModel()
+        model.load()
+        
+        df = feature_store.get_updated_since(datetime.now() - timedelta(hours=hours))
+        if df.empty:
+            logger.info("No changed students, model left as is")
+            return
+        
+        stats = model.partial_fit(df)
+        logger.info(f"  Students folded in: {stats['n_samples']}")
+        logger.info(f"  Largest centroid shift: {stats['max_centroid_shift']:.4f}")
+        
+        model.save()
+        logger.info("✓ Clustering model updated and saved successfully")
+        
+    except Exception as e:
+        logger.error(f"Update failed: {e}", exc_info=True)
+        raise
+
+
 if __name__ == "__main__":
-    train_clustering_model()
+    parser = argparse.ArgumentParser(description="Train the student clustering model")
+    parser.add_argument('--update', action='store_true',
+                        help="partial_fit the saved minibatch model on recently changed students")
+    parser.add_argument('--hours', type=float, default=24, help="Change window for --update")
+    args = parser.parse_args()
+    
+    if args.update:
+        update_clustering_model(args.hours)
+    else:
+        train_clustering_model()
@@ -0,0 +1,128 @@
+"""Fill prediction caches for recently active students after a retrain"""
+import sys
+import time
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from typing import Dict
+from app.config import settings
+from app.models.clustering import StudentClusteringModel
+from app.models.recommendation import QuestRecommendationModel
+from app.models.churn import ChurnPredictionModel
+from app.models.anomaly import AnomalyDetectionModel
+from app.models.features import FeatureFrame
+from app.utils.cache import cache, prediction_key, recommendation_key
+from app.utils.feature_store import feature_store
+from app.utils.predictions import artifact_version
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def warm_caches(active_days: int = None) -> Dict:
+    """
+    Score recently active students and write their cached predictions
+    
+    Fills the same keys the API endpoints read (cluster, churn, anomaly
+    and default-size recommendations without exclusions) in vectorized
+    chunks, written as pipelined batches paced to ``cache_warm_rate`` keys
+    per second. Keys carry the version of the artifacts loaded here, so
+    they are only read by API processes serving the same models.
+    
+    Returns:
+        Coverage and timing report
+    """
+    active_days = active_days or settings.cache_warm_active_days
+    logger.info(f"Warming caches for students active in the last {active_days} days...")
+    
+    start = time.perf_counter()
+    
+    if not cache.available:
+        logger.warning("Redis unavailable, skipping cache warm-up")
+        return {'skipped': True}
+    
+    versions = {name: artifact_version((name,)) for name in ('clustering', 'churn', 'anomaly', 'recommendation')}
+    clustering_model = StudentClusteringModel()
+    churn_model = ChurnPredictionModel()
+    anomaly_model = AnomalyDetectionModel()
+    recommendation_model = QuestRecommendationModel()
+    clustering_model.load()
+    churn_model.load()
+    anomaly_model.load()
+    recommendation_model.load()
+    
+    user_ids = feature_store.cohort_user_ids({'max_days_inactive': active_days})
+    n_recommendations = settings.recommendation_top_n
+    
+    predictions = [
+        ("cluster", versions['clustering'], clustering_model, settings.cache_ttl_clustering),
+        ("churn", versions['churn'], churn_model, settings.cache_ttl_prediction),
+        ("anomaly", versions['anomaly'], anomaly_model, settings.cache_ttl_prediction)
+    ]
+    
+    warmed = 0
+    written = 0
+    attempted = 0
+    write_start = time.perf_counter()
+    
+    chunk_size = settings.cache_warm_batch_size
+    for i in range(0, len(user_ids), chunk_size):
+        df = feature_store.get_features(user_ids[i:i + chunk_size])
+        found = df['user_id'].astype(str).tolist()
+        frame = FeatureFrame(df)
+        
+        items = []
+        for prefix, version, model, ttl in predictions:
+            for user_id, result in zip(found, model.predict_records(frame)):
+                result['user_id'] = user_id
+                items.append((prediction_key(prefix, version, user_id), result, ttl))
+        
+        recommendations = recommendation_model.recommend_many(found, n_recommendations)
+        for user_id, recommended in zip(found, recommendations):
+            items.append((
+                recommendation_key(versions['recommendation'], user_id, n_recommendations, []),
+                {"user_id": user_id, "recommendations": recommended},
+                settings.cache_ttl_recommendation
+            ))
+        
+        for j in range(0, len(items), settings.cache_warm_batch_size):
+            batch = items[j:j + settings.cache_warm_batch_size]
+            written += cache.set_many(batch)
+            attempted += len(batch)
+            
+            # Pace writes so warm-up never saturates Redis
+            ahead = attempted / settings.cache_warm_rate - (time.perf_counter() - write_start)
+            if ahead > 0:
+                time.sleep(ahead)
+        
+        warmed += len(found)
+    
+    duration = time.perf_counter() - start
+    report = {
+        'active_users': len(user_ids),
+        'warmed_users': warmed,
+        'coverage': warmed / len(user_ids) if user_ids else 1.0,
+        'keys_written': written,
+        'keys_failed': attempted - written,
+        'duration_seconds': duration
+    }
+    
+    logger.info("Cache warm-up summary:")
+    logger.info(f"  Active students: {report['active_users']}")
+    logger.info(f"  Warmed: {report['warmed_users']} ({report['coverage']:.1%})")
+    logger.info(f"  Keys written: {written} ({report['keys_failed']} failed)")
+    logger.info(f"  Duration: {duration:.2f}s")
+    logger.info("✓ Cache warm-up complete")
+    
+    return report
+
+
+if __name__ == "__main__":
+    warm_caches()
@@ -0,0 +1,243 @@
+"""Admission control and load shedding for API routes"""
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from app.config import settings
+from app.utils.timing import add_stage
+
+logger = logging.getLogger(__name__)
+
+
+QUEUE_WAIT = Histogram(
+    "ml_admission_queue_wait_seconds",
+    "Time requests wait for an admission slot",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+REJECTED = Counter(
+    "ml_admission_rejected_total",
+    "Requests shed by admission control",
+    ["route_class", "reason"]
+)
+IN_FLIGHT = Gauge(
+    "ml_admission_in_flight",
+    "Requests currently running",
+    ["route_class"]
+)
+
+# (method, path prefix, route class); first match wins, unmatched routes are not limited
+ROUTES = [
+    ("POST", "/api/ml/batch-predictions", "batch"),
+    ("POST", "/api/ml/users/batch-predictions", "batch"),
+    ("POST", "/api/ml/jobs", "jobs"),
+    ("POST", "/api/ml/users/", "interactive"),
+    ("POST", "/api/ml/cluster-student", "interactive"),
+    ("POST", "/api/ml/recommend-quests", "interactive"),
+    ("POST", "/api/ml/predict-churn", "interactive"),
+    ("POST", "/api/ml/detect-anomalies", "interactive")
+]
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted"""
+    
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClass:
+    """Concurrency limit, wait queue and deadline for one class of routes"""
+    
+    def __init__(self, name: str, priority: int, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = 0.05  # moving average of seconds per request
+    
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from queue depth and service time"""
+        backlog = (self.waiting + 1) * self.service_time / max(self.limit, 1)
+        return min(max(math.ceil(backlog), 1), 60)
+
+
+class AdmissionController:
+    """
+    Per-class concurrency limits with one priority-ordered wait list
+    
+    A request runs when its class and the service as a whole both have a
+    free slot. Otherwise it waits, up to its class deadline, in a bounded
+    queue; freed slots go to the highest priority waiter that fits, so
+    interactive requests overtake batch and job work. All state is touched
+    only from the event loop, so no locking is needed.
+    """
+    
+    def __init__(self, classes: List[RouteClass] = None, max_concurrency: int = None):
+        classes = classes or [
+            RouteClass(
+                "interactive", 0,
+                settings.admission_interactive_limit,
+                settings.admission_interactive_queue,
+                settings.admission_interactive_max_wait
+            ),
+            RouteClass(
+                "batch", 1,
+                settings.admission_batch_limit,
+                settings.admission_batch_queue,
+                settings.admission_batch_max_wait
+            ),
+            RouteClass(
+                "jobs", 2,
+                settings.admission_jobs_limit,
+                settings.admission_jobs_queue,
+                settings.admission_jobs_max_wait
+            )
+        ]
+        self.classes: Dict[str, RouteClass] = {c.name: c for c in classes}
+        self.max_concurrency = max_concurrency or settings.admission_max_concurrency
+        self.in_flight = 0
+        self._waiters: List[list] = []  # [priority, seq, route_class, future, timer], sorted
+        self._seq = itertools.count()
+    
+    @staticmethod
+    def classify(method: str, path: str) -> Optional[str]:
+        for route_method, prefix, name in ROUTES:
+            if method == route_method and path.startswith(prefix):
+                return name
+        return None
+    
+    def _has_slot(self, route_class: RouteClass) -> bool:
+        return route_class.in_flight < route_class.limit and self.in_flight < self.max_concurrency
+    
+    def _grant(self, route_class: RouteClass):
+        route_class.in_flight += 1
+        self.in_flight += 1
+        IN_FLIGHT.labels(route_class.name).inc()
+    
+    def _reject(self, route_class: RouteClass, status_code: int, reason: str) -> Overloaded:
+        REJECTED.labels(route_class.name, reason).inc()
+        return Overloaded(status_code, reason, route_class.retry_after())
+    
+    def _remove(self, entry: list):
+        self._waiters.remove(entry)
+        entry[2].waiting -= 1
+        entry[4].cancel()
+    
+    def _expire(self, entry: list):
+        if entry[3].done():
+            return
+        self._remove(entry)
+        entry[3].set_exception(self._reject(entry[2], 503, "deadline"))
+    
+    async def acquire(self, name: str) -> float:
+        """
+        Wait for a slot in a route class
+        
+        Returns:
+            Seconds spent waiting
+            
+        Raises:
+            Overloaded: Queue full (429) or deadline passed while waiting (503)
+        """
+        route_class = self.classes[name]
+        
+        # Other classes' waiters are blocked on their own limit or the global
+        # one, which _has_slot checks; an empty own queue keeps arrivals FIFO
+        if route_class.waiting == 0 and self._has_slot(route_class):
+            self._grant(route_class)
+            QUEUE_WAIT.labels(name).observe(0.0)
+            return 0.0
+        
+        if route_class.waiting >= route_class.queue_size:
+            raise self._reject(route_class, 429, "queue_full")
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = [route_class.priority, next(self._seq), route_class, future, None]
+        entry[4] = loop.call_later(route_class.max_wait, self._expire, entry)
+        bisect.insort(self._waiters, entry, key=lambda e: (e[0], e[1]))
+        route_class.waiting += 1
+        
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Client went away: give back a slot granted in the meantime
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(name, 0.0)
+            elif entry in self._waiters:
+                self._remove(entry)
+            raise
+        
+        waited = time.perf_counter() - start
+        QUEUE_WAIT.labels(name).observe(waited)
+        return waited
+    
+    def release(self, name: str, service_time: float):
+        """Free a slot and hand it to the best waiting request"""
+        route_class = self.classes[name]
+        route_class.in_flight -= 1
+        self.in_flight -= 1
+        route_class.service_time = 0.9 * route_class.service_time + 0.1 * service_time
+        IN_FLIGHT.labels(name).dec()
+        
+        for entry in list(self._waiters):
+            if self.in_flight >= self.max_concurrency:
+                break
+            if entry[2].in_flight < entry[2].limit:
+                self._remove(entry)
+                self._grant(entry[2])
+                entry[3].set_result(None)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control to classified routes
+    
+    Slots are held until the response has been fully sent, so streamed
+    responses count against the limit for their whole duration.
+    """
+    
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        name = self.controller.classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            add_stage("queue", await self.controller.acquire(name))
+        except Overloaded as e:
+            logger.warning("Shed %s %s (%s: %s)", scope["method"], scope["path"], name, e.reason)
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"error": "Service overloaded, retry later"},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, time.perf_counter() - start)
@@ -1,77 +1,251 @@
 """Redis caching utilities"""
+import hashlib
 import json
 import logging
-from typing import Optional, Any
+import threading
+import time
+from typing import Optional, Any, Callable, List, Tuple
 import redis
 from app.config import settings
+from app.utils.timing import stage
 
 logger = logging.getLogger(__name__)
 
 
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    Closed: calls go through. After ``failure_threshold`` failures in a row
+    it opens and calls are skipped until ``close()`` is called by whoever
+    verified the backend is healthy again.
+    """
+    
+    def __init__(self, failure_threshold: int):
+        self.failure_threshold = failure_threshold
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+    
+    def record_success(self):
+        self.failures = 0
+    
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when this failure opened the breaker"""
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                return True
+        return False
+    
+    def open(self):
+        with self._lock:
+            if self.opened_at is None:
+                self.opened_at = time.monotonic()
+    
+    def close(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+
 class CacheManager:
-    """Manages Redis caching for ML predictions"""
+    """
+    Manages Redis caching for ML predictions
+    
+    Every call runs under tight socket timeouts and a circuit breaker, so
+    a slow or missing Redis costs requests at most a few timeouts before
+    calls are skipped entirely. While the breaker is open a background
+    thread pings Redis and closes it once Redis answers again.
+    
+    Large reads and writes go over a separate bulk connection with a
+    longer timeout. Their failures are logged but do not count against
+    the breaker, so one slow bulk call cannot pause request-path caching.
+    """
     
     def __init__(self):
+        self.redis_client = redis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+            retry_on_timeout=False
+        )
+        self._bulk_client = None
+        self.breaker = CircuitBreaker(settings.redis_failure_threshold)
+        self._probe_thread: Optional[threading.Thread] = None
+        
         try:
-            self.redis_client = redis.from_url(
-                settings.redis_url,
-                decode_responses=True
-            )
             self.redis_client.ping()
             logger.info("Redis connection established")
         except Exception as e:
-            logger.warning(f"Redis connection failed: {e}. Caching disabled.")
-            self.redis_client = None
+            logger.warning("Redis connection failed: %s. Caching paused, reconnecting in background.", e)
+            self.breaker.open()
+            self._start_probe()
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached value"""
-        if not self.redis_client:
-            return None
+    @property
+    def available(self) -> bool:
+        return not self.breaker.is_open
+    
+    def status(self) -> dict:
+        """Breaker state for health reporting"""
+        return {
+            "available": self.available,
+            "consecutive_failures": self.breaker.failures
+        }
+    
+    def _start_probe(self):
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+        self._probe_thread = threading.Thread(target=self._probe, name="redis-probe", daemon=True)
+        self._probe_thread.start()
+    
+    def _probe(self):
+        """Ping Redis until it answers, then close the breaker"""
+        while self.breaker.is_open:
+            time.sleep(settings.redis_probe_interval)
+            try:
+                self.redis_client.ping()
+            except Exception:
+                continue
+            self.breaker.close()
+            logger.info("Redis connection re-established, caching resumed")
+    
+    @property
+    def bulk_client(self) -> redis.Redis:
+        """Connection with the longer bulk timeout, created on first use"""
+        if self._bulk_client is None:
+            self._bulk_client = redis.from_url(
+                settings.redis_url,
+                decode_responses=True,
+                socket_timeout=settings.redis_bulk_timeout,
+                socket_connect_timeout=settings.redis_connect_timeout
+            )
+        return self._bulk_client
+    
+    def _call(self, action: str, fn: Callable[[], Any], default: Any = None, bulk: bool = False) -> Any:
+        """
+        Run a Redis call through the breaker, returning default on any failure
+        
+        Bulk calls are skipped while the breaker is open but neither their
+        successes nor their failures change it.
+        """
+        if self.breaker.is_open:
+            return default
         
         try:
-            value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
+            with stage("cache"):
+                result = fn()
+            if not bulk:
+                self.breaker.record_success()
+            return result
         except Exception as e:
-            logger.error(f"Cache get error: {e}")
+            logger.error("Cache %s error: %s", action, e)
+            if not bulk and self.breaker.record_failure():
+                logger.warning(
+                    "Redis failed %d times in a row. Caching paused, reconnecting in background.",
+                    self.breaker.failures
+                )
+                self._start_probe()
         
-        return None
+        return default
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value"""
+        value = self._call("get", lambda: self.redis_client.get(key))
+        return json.loads(value) if value else None
+    
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Get several cached values in one round trip
+        
+        At least ``redis_bulk_min_keys`` keys are read over the bulk
+        connection, since the request-path timeout only fits small MGETs.
+        """
+        if not keys:
+            return []
+        
+        if len(keys) >= settings.redis_bulk_min_keys:
+            values = self._call("get", lambda: self.bulk_client.mget(keys), [None] * len(keys), bulk=True)
+        else:
+            values = self._call("get", lambda: self.redis_client.mget(keys), [None] * len(keys))
+        return [json.loads(value) if value else None for value in values]
     
     def set(self, key: str, value: Any, ttl: int):
         """Set cached value with TTL"""
-        if not self.redis_client:
-            return
+        self._call("set", lambda: self.redis_client.setex(key, ttl, json.dumps(value)))
+    
+    def set_many(self, items: List[Tuple[str, Any, int]]) -> int:
+        """
+        Set many values with their own TTLs in one pipelined round trip
         
-        try:
-            self.redis_client.setex(
-                key,
-                ttl,
-                json.dumps(value)
-            )
-        except Exception as e:
-            logger.error(f"Cache set error: {e}")
+        Uses the bulk connection, since a large pipeline legitimately takes
+        longer than request-path calls.
+        
+        Args:
+            items: (key, value, ttl) triples
+            
+        Returns:
+            Number of keys written
+        """
+        if not items:
+            return 0
+        
+        def write():
+            pipe = self.bulk_client.pipeline(transaction=False)
+            for key, value, ttl in items:
+                pipe.setex(key, ttl, json.dumps(value))
+            return sum(1 for ok in pipe.execute(raise_on_error=False) if ok is True)
+        
+        return self._call("set", write, 0, bulk=True)
     
     def delete(self, key: str):
         """Delete cached value"""
-        if not self.redis_client:
-            return
-        
-        try:
-            self.redis_client.delete(key)
-        except Exception as e:
-            logger.error(f"Cache delete error: {e}")
+        self._call("delete", lambda: self.redis_client.delete(key))
     
     def clear_pattern(self, pattern: str):
-        """Clear all keys matching pattern"""
-        if not self.redis_client:
-            return
+        """
+        Clear all keys matching pattern
         
-        try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
-        except Exception as e:
-            logger.error(f"Cache clear error: {e}")
+        Runs over the bulk connection: a scan of a large keyspace does not
+        fit the request-path timeout. Blocks, so async callers should run
+        it on the threadpool.
+        """
+        def clear():
+            # SCAN in small steps: KEYS would block Redis for every other client
+            batch = []
+            for key in self.bulk_client.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    self.bulk_client.unlink(*batch)
+                    batch = []
+            if batch:
+                self.bulk_client.unlink(*batch)
+        
+        self._call("clear", clear, bulk=True)
+
+def prediction_key(prefix: str, version: str, *parts: Any) -> str:
+    """
+    Cache key of one prediction, scoped to the version of the model that made it
+    
+    Versioned keys keep a retrain's warm-up from serving new-model
+    results to an API process that still runs the previous model.
+    """
+    return ":".join([prefix, version, *map(str, parts)])
+
+
+def recommendation_key(version: str, user_id: str, n_recommendations: int, exclude_completed: Optional[List[str]]) -> str:
+    """Cache key of one recommendation request, including its excluded quests"""
+    if exclude_completed:
+        excluded = hashlib.sha1(",".join(sorted(set(exclude_completed))).encode()).hexdigest()[:16]
+    else:
+        excluded = "none"
+    return prediction_key("recommendations", version, user_id, n_recommendations, excluded)
 
 
 # Global cache instance
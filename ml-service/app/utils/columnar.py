@@ -0,0 +1,141 @@
+"""Column-wise parsing of bulk scoring payloads"""
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from app.models.features import RAW_FEATURES
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+ARROW_CONTENT_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+
+Columns = Tuple[List[str], Dict[str, np.ndarray]]
+
+
+class ColumnarPayloadError(ValueError):
+    """Raised when a columnar payload is malformed"""
+
+
+def _check_user_ids(user_ids: Any) -> List[str]:
+    if not isinstance(user_ids, list) or not all(isinstance(u, str) for u in user_ids):
+        raise ColumnarPayloadError("'user_id' must be an array of strings")
+    return user_ids
+
+
+def _check_lengths(user_ids: List[str], columns: Dict[str, np.ndarray]) -> Columns:
+    n_rows = len(user_ids)
+    for name, values in columns.items():
+        if len(values) != n_rows:
+            raise ColumnarPayloadError(
+                f"Column '{name}' has {len(values)} values, expected {n_rows}"
+            )
+    return user_ids, columns
+
+
+def parse_json_columns(payload: Any) -> Columns:
+    """
+    Parse a JSON object of equal-length arrays
+    
+    ``{"user_id": [...], "total_xp": [...], ...}``; feature columns may be
+    left out and unknown keys are ignored.
+    """
+    if not isinstance(payload, dict) or 'user_id' not in payload:
+        raise ColumnarPayloadError("Expected an object with a 'user_id' array")
+    
+    user_ids = _check_user_ids(payload['user_id'])
+    columns = {}
+    
+    for name in RAW_FEATURES:
+        if name not in payload:
+            continue
+        try:
+            columns[name] = np.asarray(payload[name], dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ColumnarPayloadError(f"Column '{name}' must be an array of numbers")
+        if columns[name].ndim != 1:
+            raise ColumnarPayloadError(f"Column '{name}' must be a flat array")
+    
+    return _check_lengths(user_ids, columns)
+
+
+def parse_arrow(body: bytes) -> Columns:
+    """Parse an Arrow IPC stream or file with one column per feature"""
+    if pa is None:
+        raise ColumnarPayloadError("Arrow payloads require pyarrow")
+    
+    try:
+        reader = ipc.open_stream(body)
+    except pa.ArrowInvalid:
+        try:
+            reader = ipc.open_file(pa.BufferReader(body))
+        except pa.ArrowInvalid as e:
+            raise ColumnarPayloadError(f"Invalid Arrow payload: {e}")
+    table = reader.read_all()
+    
+    if 'user_id' not in table.column_names:
+        raise ColumnarPayloadError("Arrow payload needs a 'user_id' column")
+    
+    # to_numpy().tolist() is much faster than to_pylist() for string columns
+    user_ids = table.column('user_id').cast(pa.string()).to_numpy(zero_copy_only=False).tolist()
+    columns = {}
+    
+    for name in RAW_FEATURES:
+        if name not in table.column_names:
+            continue
+        try:
+            column = pc.cast(table.column(name), pa.float32())
+        except pa.ArrowInvalid:
+            raise ColumnarPayloadError(f"Column '{name}' must be numeric")
+        columns[name] = column.to_numpy()
+    
+    return _check_lengths(_check_user_ids(user_ids), columns)
+
+
+def parse_msgpack(body: bytes) -> Columns:
+    """
+    Parse a MessagePack map of columns
+    
+    Feature columns are either arrays of numbers or ``bin`` values holding
+    packed little-endian float32, which are read without copying.
+    """
+    if msgpack is None:
+        raise ColumnarPayloadError("MessagePack payloads require msgpack")
+    
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ColumnarPayloadError(f"Invalid MessagePack payload: {e}")
+    
+    if not isinstance(payload, dict) or 'user_id' not in payload:
+        raise ColumnarPayloadError("Expected a map with a 'user_id' array")
+    
+    user_ids = _check_user_ids(payload['user_id'])
+    columns = {}
+    
+    for name in RAW_FEATURES:
+        value = payload.get(name)
+        if value is None:
+            continue
+        if isinstance(value, bytes):
+            if len(value) % 4:
+                raise ColumnarPayloadError(f"Column '{name}' is not packed float32")
+            columns[name] = np.frombuffer(value, dtype='<f4')
+        else:
+            try:
+                columns[name] = np.asarray(value, dtype=np.float32)
+            except (TypeError, ValueError):
+                raise ColumnarPayloadError(f"Column '{name}' must be an array of numbers")
+            if columns[name].ndim != 1:
+                raise ColumnarPayloadError(f"Column '{name}' must be a flat array")
+    
+    return _check_lengths(user_ids, columns)
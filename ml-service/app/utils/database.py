@@ -1,25 +1,209 @@
 """Database utilities for data extraction and connection management"""
+import numpy as np
 import pandas as pd
+from datetime import date
+from decimal import Decimal
 from sqlalchemy import create_engine, text
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Iterator
 import logging
 from app.config import settings
+from app.utils.snapshot import snapshots
 
 logger = logging.getLogger(__name__)
 
 
+def compact_chunk(chunk: pd.DataFrame, id_codes: Dict[str, Dict[str, int]]) -> pd.DataFrame:
+    """
+    Downcast a result chunk to compact dtypes in place
+    
+    Floats become float32, integers int32 and id columns are replaced by
+    int32 codes from ``id_codes``, which is shared across chunks so codes
+    stay consistent for the whole extract.
+    """
+    for col in chunk.columns:
+        values = chunk[col]
+        
+        if col in id_codes:
+            mapping = id_codes[col]
+            for value in pd.unique(values):
+                if value not in mapping:
+                    mapping[value] = len(mapping)
+            chunk[col] = values.map(mapping).astype(np.int32)
+        elif values.dtype == object:
+            # psycopg2 returns NUMERIC results (SUM, EXTRACT) as Decimal
+            first = values.first_valid_index()
+            if first is not None and isinstance(values[first], Decimal):
+                chunk[col] = values.astype(np.float32)
+        elif pd.api.types.is_float_dtype(values):
+            chunk[col] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values):
+            if len(values) == 0 or (
+                values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max
+            ):
+                chunk[col] = values.astype(np.int32)
+    
+    return chunk
+
+
 class DatabaseConnection:
     """Manages database connections and queries"""
     
     def __init__(self):
-        self.engine = create_engine(settings.database_url)
+        self.engine = create_engine(
+            settings.database_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=True
+        )
+    
+    def read_frame(
+        self,
+        query,
+        id_columns: Iterable[str] = (),
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Run a query and return the result as a DataFrame
+        
+        In streaming mode rows are pulled through a server-side cursor in
+        ``chunk_size`` batches and compacted as they arrive, so peak memory
+        is bounded by one raw chunk plus the compact result. Id columns come
+        back as categoricals.
+        """
+        if streaming is None:
+            streaming = settings.db_streaming
+        
+        if not streaming:
+            return pd.read_sql(query, self.engine)
+        
+        id_codes = {col: {} for col in id_columns}
+        chunks = list(self.iter_frames(query, chunk_size, id_codes))
+        
+        if not chunks:
+            return pd.DataFrame()
+        
+        df = pd.concat(chunks, ignore_index=True, copy=False)
+        del chunks
+        
+        for col, mapping in id_codes.items():
+            if col in df.columns:
+                df[col] = pd.Categorical.from_codes(df[col].to_numpy(), categories=list(mapping))
+        
+        return df
     
-    def get_training_data(self, days: int = 90) -> pd.DataFrame:
+    def iter_frames(
+        self,
+        query,
+        chunk_size: Optional[int] = None,
+        id_codes: Optional[Dict[str, Dict[str, int]]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream a query result as compacted chunks through a server-side cursor
+        
+        Args:
+            query: SQL to run
+            chunk_size: Rows per chunk (default settings.db_chunk_size)
+            id_codes: Shared id code mappings, see compact_chunk
+        """
+        chunk_size = chunk_size or settings.db_chunk_size
+        if id_codes is None:
+            id_codes = {}
+        
+        with self.engine.connect().execution_options(
+            stream_results=True,
+            max_row_buffer=chunk_size
+        ) as conn:
+            for chunk in pd.read_sql(query, conn, chunksize=chunk_size):
+                yield compact_chunk(chunk, id_codes)
+    
+    def source_watermark(self, tables: Iterable[str]) -> Dict[str, Any]:
+        """
+        Cheap change marker for a set of source tables
+        
+        Uses the cumulative insert/update/delete counters from
+        pg_stat_user_tables, which avoids scanning the tables themselves.
+        """
+        query = text("""
+            SELECT relname, n_tup_ins, n_tup_upd, n_tup_del
+            FROM pg_stat_user_tables
+            WHERE relname = ANY(:tables)
+            ORDER BY relname
+        """).bindparams(tables=list(tables))
+        
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).fetchall()
+        
+        return {row[0]: [int(row[1]), int(row[2]), int(row[3])] for row in rows}
+    
+    def cached_frame(
+        self,
+        name: str,
+        query,
+        tables: Iterable[str],
+        id_columns: Iterable[str] = (),
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None,
+        daily: bool = False
+    ) -> pd.DataFrame:
+        """
+        Read an extract through the local snapshot cache
+        
+        The snapshot is reused while the source watermark is unchanged.
+        Extracts with NOW()-relative columns pass ``daily=True`` so their
+        snapshots also expire at midnight. When the database is unreachable,
+        or ``settings.snapshot_offline`` is set, the newest snapshot is
+        returned without checking freshness.
+        """
+        if streaming is None:
+            streaming = settings.db_streaming
+        
+        if not snapshots.enabled:
+            return self.read_frame(query, id_columns, streaming, chunk_size)
+        
+        params = dict(query.compile().params)
+        params['streaming'] = streaming
+        key = snapshots.key(name, str(query), params)
+        
+        if settings.snapshot_offline:
+            df = snapshots.load(key)
+            if df is None:
+                raise RuntimeError(f"No {name} snapshot available in offline mode")
+            return df
+        
+        try:
+            watermark = self.source_watermark(tables)
+        except Exception as e:
+            df = snapshots.load(key)
+            if df is None:
+                raise
+            logger.warning(f"Database unavailable ({e}), using latest {name} snapshot")
+            return df
+        
+        if daily:
+            watermark['date'] = date.today().isoformat()
+        
+        df = snapshots.load(key, watermark)
+        if df is not None:
+            return df
+        
+        df = self.read_frame(query, id_columns, streaming, chunk_size)
+        snapshots.save(key, watermark, df)
+        return df
+    
+    def get_training_data(
+        self,
+        days: int = 90,
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None
+    ) -> pd.DataFrame:
         """
         Extract training data for ML models
         
         Args:
             days: Number of days to look back
+            streaming: Use chunked server-side extraction (default from settings)
+            chunk_size: Rows per chunk in streaming mode
             
         Returns:
             DataFrame with user features
@@ -75,14 +259,29 @@ class DatabaseConnection:
         """).bindparams(days=days)
         
         try:
-            df = pd.read_sql(query, self.engine)
+            df = self.cached_frame(
+                'training',
+                query,
+                tables=[
+                    'User', 'QuestCompletion', 'UserAchievement', 'Achievement', 'XPAudit',
+                    'InventoryItem', 'Trade', 'EventParticipant', 'Event'
+                ],
+                id_columns=('user_id',),
+                streaming=streaming,
+                chunk_size=chunk_size,
+                daily=True
+            )
             logger.info(f"Loaded {len(df)} user records for training")
             return df
         except Exception as e:
             logger.error(f"Error loading training data: {e}")
             return pd.DataFrame()
     
-    def get_quest_data(self) -> pd.DataFrame:
+    def get_quest_data(
+        self,
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None
+    ) -> pd.DataFrame:
         """Get quest data for recommendation system"""
         query = text("""
             SELECT 
@@ -103,12 +302,23 @@ class DatabaseConnection:
         """)
         
         try:
-            return pd.read_sql(query, self.engine)
+            return self.cached_frame(
+                'quests',
+                query,
+                tables=['Quest', 'QuestCompletion'],
+                id_columns=('quest_id',),
+                streaming=streaming,
+                chunk_size=chunk_size
+            )
         except Exception as e:
             logger.error(f"Error loading quest data: {e}")
             return pd.DataFrame()
     
-    def get_user_quest_interactions(self) -> pd.DataFrame:
+    def get_user_quest_interactions(
+        self,
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None
+    ) -> pd.DataFrame:
         """Get user-quest interaction matrix for collaborative filtering"""
         query = text("""
             SELECT 
@@ -125,7 +335,14 @@ class DatabaseConnection:
         """)
         
         try:
-            return pd.read_sql(query, self.engine)
+            return self.cached_frame(
+                'interactions',
+                query,
+                tables=['QuestCompletion', 'User'],
+                id_columns=('user_id', 'quest_id'),
+                streaming=streaming,
+                chunk_size=chunk_size
+            )
         except Exception as e:
             logger.error(f"Error loading quest interactions: {e}")
             return pd.DataFrame()
@@ -0,0 +1,448 @@
+"""Incremental per-user feature store backed by Postgres"""
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+import pandas as pd
+from sqlalchemy import text
+from app.config import settings
+from app.utils.database import compact_chunk, db
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS ml_user_xp_daily (
+        user_id TEXT NOT NULL,
+        day DATE NOT NULL,
+        xp_gained DOUBLE PRECISION NOT NULL DEFAULT 0,
+        n_events INTEGER NOT NULL DEFAULT 0,
+        last_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (user_id, day)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ml_user_features (
+        user_id TEXT PRIMARY KEY,
+        total_xp DOUBLE PRECISION NOT NULL DEFAULT 0,
+        level INTEGER NOT NULL DEFAULT 0,
+        money DOUBLE PRECISION NOT NULL DEFAULT 0,
+        reputation INTEGER NOT NULL DEFAULT 0,
+        quests_completed INTEGER NOT NULL DEFAULT 0,
+        achievements_unlocked INTEGER NOT NULL DEFAULT 0,
+        recent_xp_gained DOUBLE PRECISION NOT NULL DEFAULT 0,
+        active_days INTEGER NOT NULL DEFAULT 0,
+        items_owned INTEGER NOT NULL DEFAULT 0,
+        trades_made INTEGER NOT NULL DEFAULT 0,
+        events_participated INTEGER NOT NULL DEFAULT 0,
+        last_activity TIMESTAMP,
+        account_created TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ml_feature_watermark (
+        name TEXT PRIMARY KEY,
+        value TIMESTAMP NOT NULL
+    )
+    """
+]
+
+
+DAYS_INACTIVE = "EXTRACT(EPOCH FROM (NOW() - COALESCE(f.last_activity, f.account_created)))/86400"
+
+
+FEATURES_SELECT = """
+    SELECT
+        user_id,
+        total_xp,
+        level,
+        money,
+        reputation,
+        quests_completed,
+        achievements_unlocked,
+        recent_xp_gained,
+        active_days,
+        items_owned,
+        trades_made,
+        events_participated,
+        COALESCE(last_activity, account_created) AS last_activity,
+        EXTRACT(EPOCH FROM (NOW() - COALESCE(last_activity, account_created)))/86400 AS days_inactive,
+        account_created,
+        EXTRACT(EPOCH FROM (NOW() - account_created))/86400 AS account_age_days
+    FROM ml_user_features
+"""
+
+
+# Users whose features may have changed in (lower, upper]: new audit rows,
+# changed source rows, and day buckets that left the window since ``lower``
+TOUCHED_USERS_SQL = """
+    INSERT INTO ml_touched_users (user_id)
+    SELECT user_id FROM (
+        SELECT user_id FROM "XPAudit"
+        WHERE created_at > :lower AND created_at <= :upper
+        UNION
+        SELECT id FROM "User"
+        WHERE updated_at > :lower AND updated_at <= :upper
+        UNION
+        SELECT user_id FROM "QuestCompletion"
+        WHERE (started_at > :lower AND started_at <= :upper)
+            OR (completed_at > :lower AND completed_at <= :upper)
+        UNION
+        SELECT user_id FROM "UserAchievement"
+        WHERE created_at > :lower AND created_at <= :upper
+        UNION
+        SELECT user_id FROM "InventoryItem"
+        WHERE created_at > :lower AND created_at <= :upper
+        UNION
+        SELECT sender_id FROM "Trade"
+        WHERE updated_at > :lower AND updated_at <= :upper
+        UNION
+        SELECT receiver_id FROM "Trade"
+        WHERE updated_at > :lower AND updated_at <= :upper
+        UNION
+        SELECT user_id FROM "EventParticipant"
+        WHERE created_at > :lower AND created_at <= :upper
+        UNION
+        SELECT ep.user_id FROM "EventParticipant" ep
+        JOIN "Event" e ON e.id = ep.event_id
+        WHERE e.updated_at > :lower AND e.updated_at <= :upper
+        UNION
+        SELECT user_id FROM ml_user_xp_daily
+        WHERE day < CURRENT_DATE - CAST(:window AS INTEGER)
+            AND day >= CAST(:lower AS DATE) - CAST(:window AS INTEGER) - 1
+    ) changed
+    WHERE user_id IS NOT NULL
+"""
+
+
+class FeatureStore:
+    """
+    Persistent per-user model features
+    
+    XPAudit rows past a stored watermark are folded into per-user day
+    buckets, and buckets that fall out of the feature window are dropped,
+    so the window slides without rescanning the audit log. Only users
+    touched since the watermark are then recomputed from the buckets and
+    per-table counts; a full refresh rebuilds every row. Timestamps
+    are stored and the NOW()-relative features (``days_inactive``,
+    ``account_age_days``) are derived at read time.
+    """
+    
+    WATERMARK = 'xp_audit'
+    
+    def __init__(self, window_days: int = None):
+        self.window_days = window_days or settings.feature_window_days
+    
+    def ensure_schema(self, conn):
+        """Create feature store tables if missing"""
+        for statement in SCHEMA_STATEMENTS:
+            conn.execute(text(statement))
+    
+    def refresh(self, full: bool = False) -> Dict:
+        """
+        Fold new audit rows into the store
+        
+        The first refresh backfills from the whole audit log; later ones
+        only read rows created after the stored watermark and up to
+        ``feature_refresh_lag_seconds`` before now. An audit row whose
+        transaction commits within that lag is still picked up next time.
+        
+        Incremental refreshes recompute only users with source rows
+        created or updated in that range. Deleted source rows and removed
+        users leave no such trace, so run a full refresh periodically.
+        
+        Args:
+            full: Recompute every user instead of the touched ones
+            
+        Returns:
+            Refresh statistics
+        """
+        start = time.perf_counter()
+        
+        with db.engine.begin() as conn:
+            self.ensure_schema(conn)
+            
+            watermark = conn.execute(
+                text("SELECT value FROM ml_feature_watermark WHERE name = :name"),
+                {'name': self.WATERMARK}
+            ).scalar()
+            # NOW() is the transaction start: rows stamped before it may still
+            # be uncommitted, so the window stops a safety lag short of it
+            upper = conn.execute(
+                text("SELECT (NOW() - make_interval(secs => :lag))::timestamp"),
+                {'lag': settings.feature_refresh_lag_seconds}
+            ).scalar()
+            if watermark is not None and upper <= watermark:
+                upper = watermark
+            full = full or watermark is None
+            
+            touched = None
+            if not full:
+                conn.execute(text("CREATE TEMP TABLE ml_touched_users (user_id TEXT PRIMARY KEY) ON COMMIT DROP"))
+                touched = conn.execute(
+                    text(TOUCHED_USERS_SQL),
+                    {'lower': watermark, 'upper': upper, 'window': self.window_days}
+                ).rowcount
+            
+            def scope(column: str) -> str:
+                """SQL condition limiting ``column`` to the users being recomputed"""
+                return "TRUE" if full else f"{column} IN (SELECT user_id FROM ml_touched_users)"
+            
+            new_buckets = conn.execute(text("""
+                INSERT INTO ml_user_xp_daily (user_id, day, xp_gained, n_events, last_at)
+                SELECT
+                    xa.user_id,
+                    DATE(xa.created_at),
+                    SUM(xa.amount),
+                    COUNT(*),
+                    MAX(xa.created_at)
+                FROM "XPAudit" xa
+                WHERE (CAST(:lower AS TIMESTAMP) IS NULL OR xa.created_at > CAST(:lower AS TIMESTAMP))
+                    AND xa.created_at <= :upper
+                GROUP BY xa.user_id, DATE(xa.created_at)
+                ON CONFLICT (user_id, day) DO UPDATE SET
+                    xp_gained = ml_user_xp_daily.xp_gained + EXCLUDED.xp_gained,
+                    n_events = ml_user_xp_daily.n_events + EXCLUDED.n_events,
+                    last_at = GREATEST(ml_user_xp_daily.last_at, EXCLUDED.last_at)
+            """), {'lower': watermark, 'upper': upper}).rowcount
+            
+            # Keep the newest bucket per user even outside the window so the
+            # all-time last activity survives the trim
+            expired = conn.execute(text("""
+                DELETE FROM ml_user_xp_daily d
+                WHERE d.day < CURRENT_DATE - CAST(:window AS INTEGER)
+                    AND d.day < (
+                        SELECT MAX(day) FROM ml_user_xp_daily m WHERE m.user_id = d.user_id
+                    )
+            """), {'window': self.window_days}).rowcount
+            
+            users = conn.execute(text(f"""
+                INSERT INTO ml_user_features (
+                    user_id, total_xp, level, money, reputation,
+                    quests_completed, achievements_unlocked, recent_xp_gained, active_days,
+                    items_owned, trades_made, events_participated,
+                    last_activity, account_created, updated_at
+                )
+                SELECT
+                    u.id,
+                    u.xp,
+                    u.level,
+                    u.money,
+                    u.reputation_points,
+                    COALESCE(qc.n, 0),
+                    COALESCE(ach.n, 0),
+                    COALESCE(d.recent_xp, 0),
+                    COALESCE(d.active_days, 0),
+                    COALESCE(ii.n, 0),
+                    COALESCE(t.n, 0),
+                    COALESCE(ev.n, 0),
+                    d.last_at,
+                    u.created_at,
+                    :upper
+                FROM "User" u
+                LEFT JOIN (
+                    SELECT
+                        user_id,
+                        SUM(CASE WHEN day >= CURRENT_DATE - CAST(:window AS INTEGER) THEN xp_gained ELSE 0 END) AS recent_xp,
+                        COUNT(*) FILTER (WHERE day >= CURRENT_DATE - CAST(:window AS INTEGER)) AS active_days,
+                        MAX(last_at) AS last_at
+                    FROM ml_user_xp_daily
+                    WHERE {scope('user_id')}
+                    GROUP BY user_id
+                ) d ON d.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS n FROM "QuestCompletion"
+                    WHERE {scope('user_id')}
+                    GROUP BY user_id
+                ) qc ON qc.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, COUNT(DISTINCT achievement_id) AS n FROM "UserAchievement"
+                    WHERE {scope('user_id')}
+                    GROUP BY user_id
+                ) ach ON ach.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS n FROM "InventoryItem"
+                    WHERE {scope('user_id')}
+                    GROUP BY user_id
+                ) ii ON ii.user_id = u.id
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS n FROM (
+                        SELECT sender_id AS user_id FROM "Trade"
+                        WHERE status = 'COMPLETED' AND {scope('sender_id')}
+                        UNION ALL
+                        SELECT receiver_id FROM "Trade"
+                        WHERE status = 'COMPLETED' AND {scope('receiver_id')}
+                    ) trades
+                    GROUP BY user_id
+                ) t ON t.user_id = u.id
+                LEFT JOIN (
+                    SELECT ep.user_id, COUNT(DISTINCT e.id) AS n
+                    FROM "EventParticipant" ep
+                    JOIN "Event" e ON e.id = ep.event_id AND e.status = 'ACTIVE'
+                    WHERE {scope('ep.user_id')}
+                    GROUP BY ep.user_id
+                ) ev ON ev.user_id = u.id
+                WHERE u.role = 'STUDENT' AND {scope('u.id')}
+                ON CONFLICT (user_id) DO UPDATE SET
+                    total_xp = EXCLUDED.total_xp,
+                    level = EXCLUDED.level,
+                    money = EXCLUDED.money,
+                    reputation = EXCLUDED.reputation,
+                    quests_completed = EXCLUDED.quests_completed,
+                    achievements_unlocked = EXCLUDED.achievements_unlocked,
+                    recent_xp_gained = EXCLUDED.recent_xp_gained,
+                    active_days = EXCLUDED.active_days,
+                    items_owned = EXCLUDED.items_owned,
+                    trades_made = EXCLUDED.trades_made,
+                    events_participated = EXCLUDED.events_participated,
+                    last_activity = GREATEST(ml_user_features.last_activity, EXCLUDED.last_activity),
+                    account_created = EXCLUDED.account_created,
+                    updated_at = EXCLUDED.updated_at
+            """), {'window': self.window_days, 'upper': upper}).rowcount
+            
+            conn.execute(text(f"""
+                DELETE FROM ml_user_features f
+                WHERE {scope('f.user_id')}
+                    AND NOT EXISTS (
+                        SELECT 1 FROM "User" u WHERE u.id = f.user_id AND u.role = 'STUDENT'
+                    )
+            """))
+            
+            conn.execute(text("""
+                INSERT INTO ml_feature_watermark (name, value) VALUES (:name, :value)
+                ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+            """), {'name': self.WATERMARK, 'value': upper})
+        
+        duration = time.perf_counter() - start
+        logger.info(
+            f"Feature store {'fully ' if full else ''}refreshed in {duration:.2f}s "
+            f"({new_buckets} buckets updated, {expired} expired, {users} users)"
+        )
+        
+        return {
+            'mode': 'full' if full else 'incremental',
+            'watermark': upper.isoformat(),
+            'previous_watermark': watermark.isoformat() if watermark else None,
+            'buckets_updated': new_buckets,
+            'buckets_expired': expired,
+            'users': users,
+            'touched_users': touched,
+            'duration_seconds': duration
+        }
+    
+    def get_training_data(
+        self,
+        streaming: Optional[bool] = None,
+        chunk_size: Optional[int] = None
+    ) -> pd.DataFrame:
+        """Read all users from the store in the get_training_data layout"""
+        query = text(FEATURES_SELECT)
+        
+        return db.read_frame(query, ('user_id',), streaming, chunk_size)
+    
+    def iter_training_data(self, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Stream all users from the store in chunks, for models that train incrementally"""
+        return db.iter_frames(text(FEATURES_SELECT), chunk_size)
+    
+    def get_updated_since(self, since: datetime) -> pd.DataFrame:
+        """Users whose stored features changed at or after ``since``"""
+        query = text(FEATURES_SELECT + " WHERE updated_at >= :since").bindparams(since=since)
+        
+        with db.engine.connect() as conn:
+            df = pd.read_sql(query, conn)
+        
+        return compact_chunk(df, {})
+    
+    def get_active_since(self, since: datetime, limit: int) -> pd.DataFrame:
+        """
+        Most recently active users, for models refreshed on a sliding window
+        
+        Args:
+            since: Start of the window (last activity at or after it)
+            limit: Most users to return, latest activity first
+        """
+        query = text(
+            FEATURES_SELECT + " WHERE last_activity >= :since ORDER BY last_activity DESC LIMIT :limit"
+        ).bindparams(since=since, limit=limit)
+        
+        with db.engine.connect() as conn:
+            df = pd.read_sql(query, conn)
+        
+        return compact_chunk(df, {})
+    
+    def get_features(self, user_ids: List[str]) -> pd.DataFrame:
+        """
+        Load features for a set of users in one round trip
+        
+        Args:
+            user_ids: Users to look up; unknown ids are simply absent
+            
+        Returns:
+            DataFrame in the get_training_data layout
+        """
+        query = text(FEATURES_SELECT + " WHERE user_id = ANY(:ids)").bindparams(ids=list(user_ids))
+        
+        with db.engine.connect() as conn:
+            df = pd.read_sql(query, conn)
+        
+        return compact_chunk(df, {})
+    
+    def cohort_user_ids(self, filters: Dict) -> List[str]:
+        """
+        Resolve a cohort filter to stored user ids
+        
+        Args:
+            filters: Any of class_id, grade, min_level, max_level,
+                min_days_inactive, max_days_inactive; empty selects everyone
+                
+        Returns:
+            Matching user ids in a stable order
+        """
+        conditions = {
+            'class_id': "u.class_id = :class_id",
+            'grade': "u.grade = :grade",
+            'min_level': "f.level >= :min_level",
+            'max_level': "f.level <= :max_level",
+            'min_days_inactive': f"{DAYS_INACTIVE} >= :min_days_inactive",
+            'max_days_inactive': f"{DAYS_INACTIVE} <= :max_days_inactive"
+        }
+        params = {k: v for k, v in filters.items() if k in conditions and v is not None}
+        where = " AND ".join(conditions[k] for k in params) or "TRUE"
+        
+        query = text(f"""
+            SELECT f.user_id
+            FROM ml_user_features f
+            JOIN "User" u ON u.id = f.user_id
+            WHERE {where}
+            ORDER BY f.user_id
+        """)
+        
+        with db.engine.connect() as conn:
+            return [row[0] for row in conn.execute(query, params)]
+
+
+def load_training_data() -> pd.DataFrame:
+    """
+    Training frame for the model training scripts
+    
+    Reads from the feature store when it is enabled and populated, and
+    falls back to the full extract (and its snapshot cache) otherwise.
+    Both aggregate recent XP and active days over settings.feature_window_days.
+    """
+    if settings.feature_store_enabled:
+        try:
+            df = feature_store.get_training_data()
+            if not df.empty:
+                logger.info(f"Loaded {len(df)} user records from feature store")
+                return df
+            logger.warning("Feature store is empty, falling back to full extract")
+        except Exception as e:
+            logger.warning(f"Feature store unavailable ({e}), falling back to full extract")
+    
+    return db.get_training_data(days=settings.feature_window_days)
+
+
+# Global feature store instance
+feature_store = FeatureStore()
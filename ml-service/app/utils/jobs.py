@@ -0,0 +1,366 @@
+"""Asynchronous cohort scoring jobs run in a separate process pool"""
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import settings
+from app.models.anomaly import AnomalyDetectionModel
+from app.models.churn import ChurnPredictionModel
+from app.models.clustering import StudentClusteringModel
+from app.models.features import FeatureFrame
+from app.utils.feature_store import feature_store
+from app.utils.scoring import predict_all
+
+logger = logging.getLogger(__name__)
+
+
+STATUS_FILE = "status.json"
+CANCEL_FILE = "cancel"
+HEARTBEAT_FILE = "heartbeat"
+FINISHED = ("completed", "failed", "cancelled")
+
+# Models loaded once per worker process by _init_worker
+_worker_models = None
+
+
+def _write_json(path: Path, data):
+    """Write JSON atomically so readers in other processes never see a partial file"""
+    # Unique per writer: the API process and a worker may write the same status at once
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    tmp_path.replace(path)
+
+
+def _mark_failed(status_path: Path, status: Dict, error: str) -> Dict:
+    """Persist a failed status for a job that cannot report it itself"""
+    status['status'] = 'failed'
+    status['error'] = error
+    status['finished_at'] = datetime.now().isoformat()
+    _write_json(status_path, status)
+    return status
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _heartbeat(path: Path, stop: threading.Event):
+    """Touch the heartbeat file until stopped, so a killed worker goes stale"""
+    while True:
+        path.touch()
+        if stop.wait(settings.job_heartbeat_interval):
+            return
+
+
+def _init_worker():
+    global _worker_models
+    
+    # Job work yields the CPU to interactive requests in the API process
+    os.nice(settings.job_worker_nice)
+    
+    models = (StudentClusteringModel(), ChurnPredictionModel(), AnomalyDetectionModel())
+    for model in models:
+        model.load()
+    _worker_models = models
+
+
+def run_job(job_id: str, spec: Dict, root: str, chunk_size: int):
+    """
+    Score a cohort chunk by chunk inside a worker process
+    
+    Each chunk's predictions go to their own part file and progress is
+    written to the job's status file after every chunk. A cancel marker is
+    checked between chunks. While the job runs, a thread touches its
+    heartbeat file, and the worker's PID is kept in the status.
+    """
+    job_dir = Path(root) / job_id
+    status_path = job_dir / STATUS_FILE
+    status = json.loads(status_path.read_text())
+    
+    def cancelled() -> bool:
+        if not (job_dir / CANCEL_FILE).exists():
+            return False
+        status['status'] = 'cancelled'
+        status['finished_at'] = datetime.now().isoformat()
+        _write_json(status_path, status)
+        return True
+    
+    if cancelled():
+        return
+    
+    status['status'] = 'running'
+    status['started_at'] = datetime.now().isoformat()
+    status['worker_pid'] = os.getpid()
+    _write_json(status_path, status)
+    
+    stop_heartbeat = threading.Event()
+    threading.Thread(
+        target=_heartbeat, args=(job_dir / HEARTBEAT_FILE, stop_heartbeat),
+        name=f"job-heartbeat-{job_id}", daemon=True
+    ).start()
+    
+    try:
+        user_ids = spec.get('user_ids')
+        if user_ids is None:
+            user_ids = feature_store.cohort_user_ids(spec.get('filter') or {})
+        user_ids = list(dict.fromkeys(user_ids))
+        
+        status['total'] = len(user_ids)
+        _write_json(status_path, status)
+        
+        for index, start in enumerate(range(0, len(user_ids), chunk_size)):
+            if cancelled():
+                return
+            
+            chunk_ids = user_ids[start:start + chunk_size]
+            df = feature_store.get_features(chunk_ids)
+            found = df['user_id'].astype(str).tolist()
+            results = predict_all(found, FeatureFrame(df), *_worker_models)
+            
+            _write_json(job_dir / f"part-{index:05d}.json", results)
+            status['parts'].append(len(results))
+            status['processed'] += len(chunk_ids)
+            status['missing'] += len(chunk_ids) - len(results)
+            _write_json(status_path, status)
+        
+        status['status'] = 'completed'
+        
+    except Exception as e:
+        logger.error("Job %s failed: %s", job_id, e, exc_info=True)
+        status['status'] = 'failed'
+        status['error'] = str(e)
+    finally:
+        stop_heartbeat.set()
+    
+    status['finished_at'] = datetime.now().isoformat()
+    _write_json(status_path, status)
+
+
+class JobManager:
+    """
+    Submits cohort scoring jobs to a process pool and reads their state
+    
+    Job state and results live on disk under ``job_dir``, one directory per
+    job, so the API process only ever touches small files and never runs
+    scoring work on its event loop.
+    """
+    
+    def __init__(self, root: str = None, workers: int = None):
+        self.root = Path(root or settings.job_dir)
+        self.workers = workers or settings.job_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process with live DB/Redis connections and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+    
+    def _job_dir(self, job_id: str) -> Optional[Path]:
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        job_dir = self.root / job_id
+        return job_dir if (job_dir / STATUS_FILE).exists() else None
+    
+    def submit(self, user_ids: Optional[List[str]] = None, filters: Optional[Dict] = None) -> Dict:
+        """
+        Queue a cohort scoring job
+        
+        Args:
+            user_ids: Explicit cohort; takes precedence over filters
+            filters: Cohort filter for FeatureStore.cohort_user_ids
+            
+        Returns:
+            Initial job status
+        """
+        self.prune()
+        
+        job_id = uuid.uuid4().hex
+        job_dir = self.root / job_id
+        job_dir.mkdir(parents=True)
+        
+        status = {
+            'job_id': job_id,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'owner_pid': os.getpid(),
+            'filter': filters if user_ids is None else None,
+            'total': len(set(user_ids)) if user_ids is not None else None,
+            'processed': 0,
+            'missing': 0,
+            'parts': []
+        }
+        _write_json(job_dir / STATUS_FILE, status)
+        
+        spec = {'user_ids': user_ids, 'filter': filters}
+        future = self.executor.submit(run_job, job_id, spec, str(self.root), settings.job_chunk_size)
+        self._futures[job_id] = future
+        future.add_done_callback(lambda done: self._on_done(job_id, done))
+        
+        logger.info("Submitted scoring job %s", job_id)
+        return status
+    
+    def _on_done(self, job_id: str, future: Future):
+        """Record jobs whose worker died before it could report the failure itself"""
+        self._futures.pop(job_id, None)
+        if future.cancelled() or future.exception() is None:
+            return
+        
+        error = future.exception()
+        logger.error("Job %s worker failed: %s", job_id, error)
+        if isinstance(error, BrokenProcessPool):
+            self._executor = None
+        
+        status_path = self.root / job_id / STATUS_FILE
+        status = json.loads(status_path.read_text())
+        if status['status'] not in FINISHED:
+            _mark_failed(status_path, status, str(error))
+    
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        Current job status, or None for unknown jobs
+        
+        A job whose worker died (broken pool, exited PID or a stale
+        heartbeat) is marked failed here, since it can no longer do so
+        itself. So is a job still queued by an API process that has
+        restarted or exited and can no longer run it.
+        """
+        job_dir = self._job_dir(job_id)
+        if job_dir is None:
+            return None
+        
+        status_path = job_dir / STATUS_FILE
+        status = json.loads(status_path.read_text())
+        if status['status'] in FINISHED:
+            return status
+        
+        error = self._worker_failure(job_id, job_dir, status)
+        if error is not None:
+            logger.error("Job %s failed: %s", job_id, error)
+            return _mark_failed(status_path, status, error)
+        
+        if (job_dir / CANCEL_FILE).exists():
+            status['status'] = 'cancelling'
+        return status
+    
+    def _worker_failure(self, job_id: str, job_dir: Path, status: Dict) -> Optional[str]:
+        """Why an unfinished job's worker is gone, or None while it may still be working"""
+        future = self._futures.get(job_id)
+        if future is not None and future.done() and not future.cancelled():
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                return f"Worker process died: {error}"
+        
+        if status['status'] == 'queued':
+            # Futures live in the submitting API process; a restart loses them
+            if future is not None:
+                return None
+            age = time.time() - datetime.fromisoformat(status['created_at']).timestamp()
+            owner = status.get('owner_pid')
+            if age > settings.job_heartbeat_timeout and (owner in (None, os.getpid()) or not _pid_alive(owner)):
+                return "Job was lost while queued: the API process that submitted it restarted"
+            return None
+        
+        if status['status'] != 'running':
+            return None
+        
+        pid = status.get('worker_pid')
+        if pid is not None and not _pid_alive(pid):
+            return f"Worker process {pid} exited while the job was running"
+        
+        heartbeat = job_dir / HEARTBEAT_FILE
+        last_beat = heartbeat.stat().st_mtime if heartbeat.exists() else (job_dir / STATUS_FILE).stat().st_mtime
+        if time.time() - last_beat > settings.job_heartbeat_timeout:
+            return f"No worker heartbeat for {settings.job_heartbeat_timeout:g} s"
+        return None
+    
+    def results(self, job_id: str, offset: int, limit: int) -> List[Dict]:
+        """
+        One page of finished predictions
+        
+        Part sizes are kept in the status, so only the part files that
+        overlap the page are read.
+        """
+        status = self.status(job_id)
+        if status is None:
+            return []
+        
+        page = []
+        part_start = 0
+        for index, size in enumerate(status['parts']):
+            part_end = part_start + size
+            if part_end > offset and part_start < offset + limit:
+                records = json.loads((self.root / job_id / f"part-{index:05d}.json").read_text())
+                page.extend(records[max(offset - part_start, 0):offset + limit - part_start])
+            if part_end >= offset + limit:
+                break
+            part_start = part_end
+        
+        return page
+    
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Cancel a job
+        
+        Queued jobs are dropped from the pool; running jobs stop before
+        their next chunk.
+        """
+        status = self.status(job_id)
+        if status is None or status['status'] in FINISHED:
+            return status
+        
+        (self.root / job_id / CANCEL_FILE).touch()
+        
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            status['status'] = 'cancelled'
+            status['finished_at'] = datetime.now().isoformat()
+            _write_json(self.root / job_id / STATUS_FILE, status)
+        else:
+            status['status'] = 'cancelling'
+        
+        logger.info("Cancel requested for job %s", job_id)
+        return status
+    
+    def prune(self):
+        """Delete finished jobs older than the retention period"""
+        if not self.root.exists():
+            return
+        
+        cutoff = time.time() - settings.job_retention_hours * 3600
+        for status_path in self.root.glob(f"*/{STATUS_FILE}"):
+            if status_path.stat().st_mtime >= cutoff:
+                continue
+            if json.loads(status_path.read_text())['status'] in FINISHED:
+                shutil.rmtree(status_path.parent, ignore_errors=True)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global job manager instance
+jobs = JobManager()
@@ -0,0 +1,181 @@
+"""Non-blocking structured logging for the API process"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+from app.config import settings
+
+
+# LogRecord attributes that are not user supplied ``extra`` fields
+RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+access_logger = logging.getLogger("app.access")
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any ``extra`` fields at the top level"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most ``burst`` warnings or errors per call site per window
+    
+    A Redis outage would otherwise log one error per request. The first
+    record let through after a suppressed run carries the number of
+    dropped records in ``suppressed``.
+    """
+    
+    def __init__(self, burst: int = None, window: float = None):
+        super().__init__()
+        self.burst = burst or settings.log_error_burst
+        self.window = window or settings.log_error_window
+        self._sites: Dict[Tuple[str, int], list] = {}  # site -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get((record.pathname, record.lineno))
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site else 0
+                self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            
+            site[2] += 1
+            return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without ever blocking the caller
+    
+    The message is merged with its arguments here, so later mutation of
+    the arguments cannot change it; everything else, including JSON
+    encoding and tracebacks, is done by the listener. Records are dropped
+    and counted when the queue is full.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging():
+    """
+    Route all logging through a bounded queue to a single writer thread
+    
+    Handlers on the root logger are replaced. Uvicorn's loggers propagate
+    to the root; its access log is switched off when ours is enabled.
+    """
+    global _listener
+    
+    if _listener is not None:
+        return
+    
+    if settings.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+    
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    queue_handler.addFilter(RateLimitFilter())
+    
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, settings.log_level))
+    
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    logging.getLogger("uvicorn.access").disabled = settings.access_log_enabled
+    
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware writing one structured access record per request
+    
+    Only the record is created on the request path; its formatting and
+    writing happen on the listener thread.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status = [500]
+        
+        async def logged_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, logged_send)
+        finally:
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %d", scope["method"], scope["path"], status[0],
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status[0],
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3)
+                    }
+                )
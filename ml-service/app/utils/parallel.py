@@ -0,0 +1,202 @@
+"""Sharded batch inference across a persistent process pool"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.models.features import FeatureFrame
+from app.utils.scoring import predict_all
+
+logger = logging.getLogger(__name__)
+
+
+# Shared memory offsets are aligned so arrays mapped from them stay SIMD friendly
+ALIGNMENT = 64
+
+# Per-worker state set by _init_worker
+_models = None
+_model_memory = None
+
+
+def share_objects(obj) -> Tuple[bytes, shared_memory.SharedMemory, List[Tuple[int, int]]]:
+    """
+    Pickle an object graph with its NumPy arrays placed in shared memory
+    
+    Uses pickle protocol 5 out-of-band buffers: the pickle itself stays
+    small and every contiguous array is copied once into a single shared
+    segment that workers map instead of unpickling their own copy.
+    
+    Returns:
+        Pickle payload, shared segment and (offset, size) of each buffer
+    """
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    
+    layout = []
+    offset = 0
+    for raw in raws:
+        layout.append((offset, raw.nbytes))
+        offset += -(-raw.nbytes // ALIGNMENT) * ALIGNMENT
+    
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for raw, (start, size) in zip(raws, layout):
+        block.buf[start:start + size] = raw
+    
+    return payload, block, layout
+
+
+def _init_worker(payload: bytes, name: str, layout: List[Tuple[int, int]]):
+    global _models, _model_memory
+    
+    # Keep the segment open for the worker's lifetime; model arrays are views into it
+    _model_memory = shared_memory.SharedMemory(name=name)
+    buffers = [_model_memory.buf[start:start + size] for start, size in layout]
+    _models = pickle.loads(payload, buffers=buffers)
+
+
+def _score_shard(name: str, shape: Tuple[int, int], start: int, stop: int, user_ids: List[str]) -> str:
+    """
+    Score rows [start, stop) of a feature buffer held in shared memory
+    
+    Returns the records as a JSON array: passing text back is far cheaper
+    than unpickling thousands of nested dicts in the parent.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    buffer = None
+    try:
+        buffer = np.ndarray(shape, dtype=np.float32, buffer=block.buf)
+        return json.dumps(predict_all(user_ids, FeatureFrame.wrap(buffer[:, start:stop]), *_models))
+    finally:
+        # Views must be released before the segment can be closed
+        buffer = None
+        try:
+            block.close()
+        except BufferError:
+            # A traceback still holds views; the mapping goes when it is collected
+            pass
+
+
+class ShardedScorer:
+    """
+    Scores large batches in shards across worker processes
+    
+    Models are shipped to each worker once, when the pool starts, with
+    their arrays in shared memory. Per request the feature frame is copied
+    into a shared segment, each worker scores and serialises a contiguous
+    row range of it, and the shard results are concatenated in row order.
+    If a worker dies, the batch is scored in-process and the pool is
+    restarted in the background from the same models.
+    """
+    
+    def __init__(self, workers: int = None, min_shard_rows: int = None):
+        self.workers = workers or settings.inference_workers
+        self.min_shard_rows = min_shard_rows or settings.inference_min_shard_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._model_memory: Optional[shared_memory.SharedMemory] = None
+        self._models: Optional[Tuple] = None
+        self._restart_lock = threading.Lock()
+    
+    @property
+    def active(self) -> bool:
+        return self._executor is not None
+    
+    def start(self, clustering_model, churn_model, anomaly_model):
+        """Start the pool with the given fitted models"""
+        self.shutdown()
+        
+        self._models = (clustering_model, churn_model, anomaly_model)
+        payload, self._model_memory, layout = share_objects(
+            (clustering_model, churn_model, anomaly_model)
+        )
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(payload, self._model_memory.name, layout)
+        )
+        
+        # Start every worker now rather than on the first request
+        list(self._executor.map(abs, range(self.workers)))
+        logger.info(
+            "Sharded inference pool started (%d workers, %.1f MB of shared model arrays)",
+            self.workers, self._model_memory.size / 1e6
+        )
+    
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken pool, unless another request already did"""
+        if not self._restart_lock.acquire(blocking=False):
+            return
+        try:
+            if self._executor is broken:
+                self.start(*self._models)
+        except Exception as e:
+            logger.error("Restarting the inference pool failed: %s", e)
+            self.shutdown()
+        finally:
+            self._restart_lock.release()
+    
+    def shards(self, n_rows: int) -> List[Tuple[int, int]]:
+        """Contiguous row ranges, at most one per worker"""
+        n_shards = max(1, min(self.workers, n_rows // self.min_shard_rows))
+        bounds = np.linspace(0, n_rows, n_shards + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+    
+    async def predict_json(self, user_ids: List[str], frame: FeatureFrame) -> str:
+        """
+        Run all models over a frame, sharded across the pool
+        
+        Args:
+            user_ids: Ids in frame row order
+            frame: Shared feature frame for the batch
+            
+        Returns:
+            JSON array of predict_all records in the same order as ``user_ids``
+        """
+        source = frame.buffer
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        block = shared_memory.SharedMemory(create=True, size=max(source.nbytes, 1))
+        try:
+            # Copying a large batch would stall the event loop
+            target = np.ndarray(source.shape, dtype=np.float32, buffer=block.buf)
+            await loop.run_in_executor(None, np.copyto, target, source)
+            del target
+            
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(
+                    executor, _score_shard,
+                    block.name, source.shape, int(start), int(stop), user_ids[start:stop]
+                )
+                for start, stop in self.shards(len(user_ids))
+            ))
+        except BrokenProcessPool as e:
+            logger.error("Inference pool broke (%s); scoring in-process and restarting it", e)
+            loop.run_in_executor(None, self._restart, executor)
+            records = await loop.run_in_executor(None, predict_all, user_ids, frame, *self._models)
+            return json.dumps(records)
+        finally:
+            block.close()
+            block.unlink()
+        
+        return "[" + ",".join(part[1:-1] for part in parts if part != "[]") + "]"
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._model_memory is not None:
+            self._model_memory.close()
+            self._model_memory.unlink()
+            self._model_memory = None
+
+
+# Global sharded scorer instance
+sharded_scorer = ShardedScorer()
@@ -0,0 +1,123 @@
+"""Bulk write-back of batch predictions to Postgres"""
+import io
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+import pandas as pd
+from app.config import settings
+from app.utils.database import db
+from app.utils.scoring import SCORE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_STATEMENT = """
+    CREATE TABLE IF NOT EXISTS ml_predictions (
+        user_id TEXT PRIMARY KEY,
+        cluster_id INTEGER NOT NULL,
+        cluster_name TEXT NOT NULL,
+        churn_probability DOUBLE PRECISION NOT NULL,
+        churn_risk_level TEXT NOT NULL,
+        is_anomaly BOOLEAN NOT NULL,
+        anomaly_score DOUBLE PRECISION NOT NULL,
+        model_version TEXT NOT NULL,
+        scored_at TIMESTAMP NOT NULL
+    )
+"""
+
+TABLE_COLUMNS = SCORE_COLUMNS + ['model_version', 'scored_at']
+
+
+def artifact_version(model_names: Iterable[str] = ('clustering', 'churn', 'anomaly')) -> str:
+    """Version tag for the deployed models, from the newest artifact timestamp"""
+    mtimes = [
+        path.stat().st_mtime
+        for name in model_names
+        for path in (Path(settings.model_path) / name).glob("*.pkl")
+    ]
+    
+    if not mtimes:
+        return "unknown"
+    
+    return datetime.fromtimestamp(max(mtimes)).strftime("%Y%m%d%H%M%S")
+
+
+class PredictionWriter:
+    """
+    Writes scored students to the ml_predictions table
+    
+    Rows are streamed into a temporary staging table with COPY in chunks,
+    then merged into ml_predictions with one set-based upsert, so
+    dashboards never see a half-written batch.
+    """
+    
+    def write(
+        self,
+        scores: pd.DataFrame,
+        model_version: str,
+        scored_at: datetime = None,
+        chunk_size: int = None
+    ) -> int:
+        """
+        Upsert predictions
+        
+        Args:
+            scores: Output of score_frame
+            model_version: Version tag stored with every row
+            scored_at: Scoring timestamp (default now)
+            chunk_size: Rows per COPY chunk
+            
+        Returns:
+            Number of rows written
+        """
+        if scores.empty:
+            return 0
+        
+        scored_at = scored_at or datetime.now()
+        chunk_size = chunk_size or settings.prediction_write_chunk_size
+        columns = ", ".join(TABLE_COLUMNS)
+        updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in TABLE_COLUMNS[1:])
+        
+        raw = db.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute(SCHEMA_STATEMENT)
+            cursor.execute(
+                "CREATE TEMP TABLE ml_predictions_stage "
+                "(LIKE ml_predictions INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            
+            for start in range(0, len(scores), chunk_size):
+                chunk = scores.iloc[start:start + chunk_size][SCORE_COLUMNS].copy()
+                chunk['model_version'] = model_version
+                chunk['scored_at'] = scored_at
+                
+                buffer = io.StringIO()
+                chunk.to_csv(buffer, header=False, index=False)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY ml_predictions_stage ({columns}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            
+            cursor.execute(f"""
+                INSERT INTO ml_predictions ({columns})
+                SELECT {columns} FROM ml_predictions_stage
+                ON CONFLICT (user_id) DO UPDATE SET {updates}
+            """)
+            written = cursor.rowcount
+            
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+        
+        logger.info(f"Wrote {written} predictions (model version {model_version})")
+        return written
+
+
+# Global prediction writer
+prediction_writer = PredictionWriter()
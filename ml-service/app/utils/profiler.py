@@ -0,0 +1,128 @@
+"""In-process statistical stack sampler for on-demand CPU profiles"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Tuple
+from app.config import settings
+
+
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of threads that are blocked rather than using CPU
+IDLE_FRAMES = {
+    "threading:Condition.wait",
+    "threading:Event.wait",
+    "threading:Thread.join",
+    "queue:Queue.get",
+    "selectors:EpollSelector.select",
+    "selectors:PollSelector.select",
+    "selectors:SelectSelector.select",
+    "selectors:KqueueSelector.select"
+}
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads at a fixed interval
+    
+    Each sample walks ``sys._current_frames()`` from the sampling thread,
+    so the profiled code is never interrupted or instrumented. The sampler
+    backs off when taking samples would use more than ``max_overhead`` of
+    one CPU, and only one session runs at a time.
+    """
+    
+    def __init__(self, max_overhead: float = None):
+        self.max_overhead = max_overhead or settings.profiler_max_overhead
+        self._lock = threading.Lock()
+        self._labels: Dict[object, str] = {}
+    
+    def _label(self, frame) -> str:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get("__name__", "?")
+            label = self._labels[code] = f"{module}:{code.co_qualname}"
+        return label
+    
+    def _stack(self, frame) -> Tuple[str, ...]:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+    
+    def profile(self, seconds: float, interval: float, include_idle: bool = False) -> Dict:
+        """
+        Sample all other threads for a number of seconds
+        
+        Args:
+            seconds: Session length
+            interval: Target time between samples
+            include_idle: Keep stacks of threads blocked in waits and selects
+            
+        Returns:
+            Stack counts (root first, thread name as the root frame) and
+            session statistics
+            
+        Raises:
+            ProfilerBusy: Another session is running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        
+        try:
+            own_id = threading.get_ident()
+            stacks: Counter = Counter()
+            n_samples = 0
+            sampling_time = 0.0
+            
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                sample_start = time.perf_counter()
+                
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    stack = self._stack(frame)
+                    if not include_idle and stack and stack[-1] in IDLE_FRAMES:
+                        continue
+                    stacks[(names.get(thread_id, str(thread_id)),) + stack] += 1
+                frame = None  # don't keep the last sampled frame alive
+                
+                cost = time.perf_counter() - sample_start
+                sampling_time += cost
+                n_samples += 1
+                
+                # Sleep at least long enough to keep sampling under the overhead budget
+                time.sleep(max(interval - cost, cost / self.max_overhead - cost, 0))
+            
+            elapsed = time.perf_counter() - start
+        finally:
+            self._lock.release()
+        
+        return {
+            "stacks": stacks,
+            "samples": n_samples,
+            "duration_seconds": elapsed,
+            "overhead": sampling_time / elapsed if elapsed else 0.0
+        }
+    
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Render stack counts as collapsed stacks for flamegraph.pl and speedscope"""
+        return "".join(
+            f"{';'.join(frame.replace(';', ':') for frame in stack)} {count}\n"
+            for stack, count in stacks.most_common()
+        )
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
@@ -0,0 +1,70 @@
+"""Vectorized scoring of many students across models"""
+import pandas as pd
+from typing import Dict, List
+from app.models.features import FeatureFrame
+
+SCORE_COLUMNS = [
+    'user_id',
+    'cluster_id',
+    'cluster_name',
+    'churn_probability',
+    'churn_risk_level',
+    'is_anomaly',
+    'anomaly_score'
+]
+
+
+def score_frame(df: pd.DataFrame, clustering_model, churn_model, anomaly_model) -> pd.DataFrame:
+    """
+    Score a feature frame for the ml_predictions table
+    
+    Goes through predict_all, so stored predictions come from the same
+    code path as the API responses and the cache.
+    
+    Args:
+        df: Features in the get_training_data layout
+        
+    Returns:
+        DataFrame with one row per input row and SCORE_COLUMNS
+    """
+    user_ids = df['user_id'].astype(str).tolist()
+    records = predict_all(user_ids, FeatureFrame(df), clustering_model, churn_model, anomaly_model)
+    
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'cluster_id': [r['cluster']['cluster_id'] for r in records],
+        'cluster_name': [r['cluster']['cluster_name'] for r in records],
+        'churn_probability': [r['churn']['churn_probability'] for r in records],
+        'churn_risk_level': [r['churn']['risk_level'] for r in records],
+        'is_anomaly': [r['anomaly']['is_anomaly'] for r in records],
+        'anomaly_score': [r['anomaly']['anomaly_score'] for r in records]
+    }, columns=SCORE_COLUMNS)
+
+
+def predict_all(user_ids: List[str], frame, clustering_model, churn_model, anomaly_model) -> List[Dict]:
+    """
+    Run cluster, churn and anomaly predictions over one shared feature frame
+    
+    Args:
+        user_ids: Ids in frame row order
+        frame: FeatureFrame with the users' features
+        
+    Returns:
+        One ``{user_id, cluster, churn, anomaly}`` record per user
+    """
+    if not user_ids:
+        return []
+    
+    clusters = clustering_model.predict_records(frame)
+    churns = churn_model.predict_records(frame)
+    anomalies = anomaly_model.predict_records(frame)
+    
+    return [
+        {
+            "user_id": user_id,
+            "cluster": cluster,
+            "churn": churn,
+            "anomaly": anomaly
+        }
+        for user_id, cluster, churn, anomaly in zip(user_ids, clusters, churns, anomalies)
+    ]
@@ -0,0 +1,134 @@
+"""Local columnar snapshots of database extracts"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+import pandas as pd
+from app.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    ipc = None
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    Versioned Arrow IPC snapshots of training extracts
+    
+    Each extract lives in its own directory keyed by query text and
+    parameters. A snapshot version is keyed by the source watermark, so a
+    snapshot is only reused while the source tables are unchanged. Files are
+    memory-mapped on read, so numeric columns are loaded without copying.
+    """
+    
+    MANIFEST = "manifest.json"
+    
+    def __init__(self, root: str = None):
+        self.root = Path(root) if root else Path(settings.model_path) / "snapshots"
+    
+    @property
+    def enabled(self) -> bool:
+        return pa is not None and settings.snapshot_enabled
+    
+    @staticmethod
+    def key(name: str, query: str, params: Dict[str, Any]) -> str:
+        """Stable key for an extract: name plus a hash of query and params"""
+        payload = json.dumps(
+            {'query': query, 'params': params},
+            sort_keys=True,
+            default=str
+        )
+        digest = hashlib.sha1(payload.encode()).hexdigest()[:16]
+        return f"{name}-{digest}"
+    
+    @staticmethod
+    def _version(watermark: Any) -> str:
+        payload = json.dumps(watermark, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:16]
+    
+    def _read_manifest(self, key: str) -> Dict:
+        path = self.root / key / self.MANIFEST
+        if not path.exists():
+            return {'versions': []}
+        return json.loads(path.read_text())
+    
+    def load(self, key: str, watermark: Any = None) -> Optional[pd.DataFrame]:
+        """
+        Load a snapshot
+        
+        Args:
+            key: Extract key from ``key()``
+            watermark: Current source watermark; ``None`` loads the newest
+                snapshot regardless of freshness (offline mode)
+                
+        Returns:
+            DataFrame, or None when no matching snapshot exists
+        """
+        if not self.enabled:
+            return None
+        
+        versions = self._read_manifest(key)['versions']
+        if watermark is not None:
+            wanted = self._version(watermark)
+            versions = [v for v in versions if v['version'] == wanted]
+        
+        if not versions:
+            return None
+        
+        entry = versions[-1]
+        path = self.root / key / entry['file']
+        if not path.exists():
+            return None
+        
+        with pa.memory_map(str(path), 'r') as source:
+            table = ipc.open_file(source).read_all()
+        
+        logger.info(f"Loaded snapshot {key}/{entry['file']} ({table.num_rows} rows)")
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
+    def save(self, key: str, watermark: Any, df: pd.DataFrame):
+        """Write a new snapshot version and prune old ones"""
+        if not self.enabled or df.empty:
+            return
+        
+        directory = self.root / key
+        directory.mkdir(parents=True, exist_ok=True)
+        
+        version = self._version(watermark)
+        filename = f"{version}.arrow"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        
+        # Write to a temp file first so readers never see a partial snapshot
+        tmp_path = directory / f"{filename}.tmp"
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        tmp_path.replace(directory / filename)
+        
+        manifest = self._read_manifest(key)
+        versions = [v for v in manifest['versions'] if v['version'] != version]
+        versions.append({
+            'version': version,
+            'file': filename,
+            'watermark': json.loads(json.dumps(watermark, default=str)),
+            'rows': len(df),
+            'created_at': datetime.now().isoformat()
+        })
+        
+        for stale in versions[:-settings.snapshot_keep]:
+            (directory / stale['file']).unlink(missing_ok=True)
+        manifest['versions'] = versions[-settings.snapshot_keep:]
+        
+        (directory / self.MANIFEST).write_text(json.dumps(manifest, indent=2))
+        logger.info(f"Saved snapshot {key}/{filename} ({len(df)} rows)")
+
+
+# Global snapshot store
+snapshots = SnapshotStore()
@@ -0,0 +1,224 @@
+"""Per-stage request timing for API routes"""
+import asyncio
+import functools
+import random
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from fastapi.routing import APIRoute
+from app.config import settings
+
+
+# Requests that send this header get their stage timings back in Server-Timing
+TIMING_REQUEST_HEADER = b"x-debug-timing"
+PERCENTILES = (50, 95, 99)
+
+
+class RequestTimer:
+    """Accumulated seconds per stage for one request"""
+    
+    __slots__ = ("start", "route", "stages", "handler_start", "endpoint_end")
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.route: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.handler_start = self.start
+        self.endpoint_end = self.start
+    
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def header(self, total: float) -> bytes:
+        """Server-Timing value, durations in milliseconds"""
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries).encode()
+
+
+_current: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "timer", "start")
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self):
+        self.timer = _current.get()
+        if self.timer is not None:
+            self.start = time.perf_counter()
+    
+    def __exit__(self, *exc_info):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.start)
+
+
+def stage(name: str) -> _Stage:
+    """Time a block as a stage of the current request; a no-op outside requests"""
+    return _Stage(name)
+
+
+def add_stage(name: str, seconds: float):
+    """Record an already measured stage of the current request"""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+class Reservoir:
+    """Fixed-size uniform sample of a stream of durations (Algorithm R)"""
+    
+    __slots__ = ("size", "samples", "count", "max")
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.samples: List[float] = []
+        self.count = 0
+        self.max = 0.0
+    
+    def add(self, value: float):
+        self.count += 1
+        if value > self.max:
+            self.max = value
+        
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            j = random.randrange(self.count)
+            if j < self.size:
+                self.samples[j] = value
+    
+    def summary(self) -> Dict:
+        """Count, percentiles and max in milliseconds"""
+        values = np.percentile(self.samples, PERCENTILES) * 1000
+        result = {"count": self.count}
+        result.update({f"p{q}": round(float(v), 3) for q, v in zip(PERCENTILES, values)})
+        result["max"] = round(self.max * 1000, 3)
+        return result
+
+
+class TimingStats:
+    """
+    Stage duration reservoirs per route
+    
+    Memory is bounded by routes x stages x ``reservoir_size``. Only touched
+    from the event loop, so no locking is needed.
+    """
+    
+    def __init__(self, reservoir_size: int = None):
+        self.reservoir_size = reservoir_size or settings.timing_reservoir_size
+        self.routes: Dict[str, Dict[str, Reservoir]] = {}
+    
+    def record(self, route: str, stages: Dict[str, float]):
+        reservoirs = self.routes.setdefault(route, {})
+        for name, seconds in stages.items():
+            reservoir = reservoirs.get(name)
+            if reservoir is None:
+                reservoir = reservoirs[name] = Reservoir(self.reservoir_size)
+            reservoir.add(seconds)
+    
+    def snapshot(self) -> Dict:
+        return {
+            route: {name: reservoir.summary() for name, reservoir in reservoirs.items()}
+            for route, reservoirs in sorted(self.routes.items())
+        }
+    
+    def reset(self):
+        self.routes = {}
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint so time before and after it can be attributed"""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timer = _current.get()
+        if timer is None:
+            return await endpoint(*args, **kwargs)
+        
+        # Body parsing, pydantic validation and dependencies ran before the call
+        start = time.perf_counter()
+        timer.add("validate", start - timer.handler_start)
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timer.endpoint_end = time.perf_counter()
+            timer.add("endpoint", timer.endpoint_end - start)
+    
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    API route that splits handling into validate, endpoint and encode stages
+    
+    Encode is the response model serialisation and JSON rendering FastAPI
+    does after the endpoint returns. Only async endpoints are wrapped.
+    """
+    
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+        
+        async def timed_handler(request):
+            timer = _current.get()
+            if timer is None:
+                return await handler(request)
+            
+            timer.route = path
+            timer.handler_start = time.perf_counter()
+            response = await handler(request)
+            timer.add("encode", time.perf_counter() - timer.endpoint_end)
+            return response
+        
+        return timed_handler
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing every ``/api/ml/*`` request
+    
+    Stage timings of finished requests go to the stats reservoirs. Requests
+    carrying an ``X-Debug-Timing`` header also get them back in a
+    ``Server-Timing`` response header; for streamed responses it covers
+    the work done before the first byte.
+    """
+    
+    def __init__(self, app, stats: TimingStats = None):
+        self.app = app
+        self.stats = stats or timing_stats
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/ml/"):
+            await self.app(scope, receive, send)
+            return
+        
+        timer = RequestTimer()
+        token = _current.set(timer)
+        wants_header = any(name == TIMING_REQUEST_HEADER for name, _ in scope["headers"])
+        
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.header(time.perf_counter() - timer.start)))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, timed_send if wants_header else send)
+        finally:
+            _current.reset(token)
+            if timer.route is not None:
+                timer.stages["total"] = time.perf_counter() - timer.start
+                self.stats.record(timer.route, timer.stages)
+
+
+# Global timing stats instance
+timing_stats = TimingStats()